@@ -1,6 +1,28 @@
 
 if "bpy" in locals():
+    # Modules are reloaded before the modules that import from them
     import importlib
+    if "util" in locals():
+        importlib.reload(util)
+    if "profiler" in locals():
+        importlib.reload(profiler) # type: ignore
+    if "asset_cache" in locals():
+        importlib.reload(asset_cache) # type: ignore
+    if "bone_math" in locals():
+        importlib.reload(bone_math) # type: ignore
+    if "mesh_math" in locals():
+        importlib.reload(mesh_math) # type: ignore
+    if "fcurve_math" in locals():
+        importlib.reload(fcurve_math) # type: ignore
+    if "ogre_codec" in locals():
+        for module in (ogre_codec.chunks, ogre_codec.types, ogre_codec.transforms, ogre_codec.mesh, # type: ignore
+                       ogre_codec.skeleton, ogre_codec.writer, ogre_codec.serializer): # type: ignore
+            importlib.reload(module)
+        importlib.reload(ogre_codec) # type: ignore
+    if "bake_worker" in locals():
+        importlib.reload(bake_worker) # type: ignore
+    if "bake_context" in locals():
+        importlib.reload(bake_context) # type: ignore
     if "ogre_importer" in locals():
         importlib.reload(ogre_importer) # type: ignore
     if "ogre_exporter" in locals():
@@ -9,16 +31,17 @@ if "bpy" in locals():
         importlib.reload(physx_exporter) # type: ignore
     if "physx_importer" in locals():
         importlib.reload(physx_importer) # type: ignore
-    if "util" in locals():
-        importlib.reload(util)
 
 import os
+import sys
+from math import radians
 
 import bpy
-from bpy.types import Operator, TOPBAR_MT_file_import, TOPBAR_MT_file_export, Scene
-from bpy.props import BoolProperty, StringProperty, EnumProperty, IntProperty
+from bpy.types import Operator, OperatorFileListElement, Panel, PropertyGroup, UIList, TOPBAR_MT_file_import, TOPBAR_MT_file_export, Scene, Object
+from bpy.props import BoolProperty, StringProperty, EnumProperty, IntProperty, FloatProperty, CollectionProperty, PointerProperty
 from bpy_extras.io_utils import ExportHelper, ImportHelper
 from bpy.utils import register_class, unregister_class, previews
+from bpy.app.handlers import persistent
 
 from .util import load_translate, code_page_list
 
@@ -88,14 +111,56 @@ Weightmaps can get mixed up if not selected''',
                ],
         default='DEFAULT',
         ) # type: ignore
+    load_on_demand: BoolProperty(
+        name='Load animations on demand',
+        description='Only list the animations on the armature.\nActions are created when picked from the Kenshi Animations panel',
+        default=True,
+        ) # type: ignore
+    reuse_armature: BoolProperty(
+        name='Reuse imported armature',
+        description='Link with an armature in the scene that was imported from the same skeleton file instead of creating a new one',
+        default=True,
+        ) # type: ignore
+    search_subfolders: BoolProperty(
+        name='Search subfolders',
+        description='When a folder is selected, also import meshes in its subfolders',
+        default=False,
+        ) # type: ignore
+    submesh_filter: StringProperty(
+        name='Submeshes',
+        description='Only import submeshes whose name matches one of these comma separated patterns, e.g. body*, head.\nLeave empty to import all submeshes',
+        default='',
+        ) # type: ignore
+    files: CollectionProperty(
+        type=OperatorFileListElement,
+        options={'HIDDEN', 'SKIP_SAVE'},
+        ) # type: ignore
+    directory: StringProperty(
+        subtype='DIR_PATH',
+        options={'HIDDEN', 'SKIP_SAVE'},
+        ) # type: ignore
 
     def execute(self, context):
         from . import ogre_importer
-        keywords = self.as_keywords(ignore=('filter_glob',))
+        keywords = self.as_keywords(ignore=('filter_glob', 'files', 'directory', 'search_subfolders'))
         prefs = context.preferences.addons[__package__].preferences
         keywords['submesh_name_delimiter'] = prefs.submesh_name_delimiter
+        keywords['cache_size'] = prefs.cache_size
+        keywords['disk_cache_directory'] = bpy.path.abspath(prefs.disk_cache_directory) if prefs.disk_cache_directory else ''
+        keywords['disk_cache_size'] = prefs.disk_cache_size
+
+        filepaths = [os.path.join(self.directory, file.name) for file in self.files if file.name]
+        if not filepaths and self.directory and os.path.isdir(self.directory):
+            filepaths = ogre_importer.find_mesh_files(self.directory, self.search_subfolders)
+
         bpy.context.window.cursor_set('WAIT')
-        result = ogre_importer.load(self, context, **keywords)
+        if len(filepaths) > 1:
+            del keywords['filepath']
+            result = ogre_importer.load_files(self, context, filepaths=filepaths, import_workers=prefs.import_workers, **keywords)
+        else:
+            if filepaths:
+                keywords['filepath'] = filepaths[0]
+            result = ogre_importer.load(self, context, **keywords)
         bpy.context.window.cursor_set('DEFAULT')
         return result
 
@@ -111,17 +176,23 @@ Weightmaps can get mixed up if not selected''',
         mesh.prop(self, 'import_shapekeys')
         mesh.prop(self, 'create_materials')
         mesh.prop(self, 'use_filename')
+        mesh.prop(self, 'submesh_filter')
         mesh.label(text='Merge vertices')
         mesh.prop(self, 'cleanup_vertices', text='')
+        mesh.prop(self, 'search_subfolders')
 
         sleketon = layout.box()
         link = sleketon.column()
         link.enabled = True if context.active_object and context.active_object.type == 'ARMATURE' else False
         link.prop(self, 'use_selected_skeleton')
+        reuse = sleketon.column()
+        reuse.enabled = not link.enabled or not self.use_selected_skeleton
+        reuse.prop(self, 'reuse_armature')
         sleketon.prop(self, 'import_animations')
         rate = sleketon.column()
         rate.enabled = self.import_animations
         rate.prop(self, 'round_frames')
+        rate.prop(self, 'load_on_demand')
 
 
 class KENSHI_OT_ExportOgreObject(Operator, ExportHelper):
@@ -204,6 +275,28 @@ so it's a good idea to pre-bake the animation and uncheck this option''',
         description='Set scale keyframes in the animation',
         default=False,
         ) # type: ignore
+    reduce_keyframes: BoolProperty(
+        name='Reduce keyframes',
+        description='Remove keyframes that interpolation rebuilds within the tolerances below.\nTracks that stay at the rest pose are not exported',
+        default=False,
+        ) # type: ignore
+    reduce_position_tolerance: FloatProperty(
+        name='Position tolerance',
+        description='Largest position error allowed for a removed keyframe.\nAlso used for scale when scale keyframes are exported',
+        default=0.001,
+        min=0.0,
+        precision=4,
+        step=0.01,
+        ) # type: ignore
+    reduce_angle_tolerance: FloatProperty(
+        name='Angle tolerance',
+        description='Largest rotation error allowed for a removed keyframe',
+        subtype='ANGLE',
+        default=radians(0.05),
+        min=0.0,
+        precision=3,
+        step=0.1,
+        ) # type: ignore
     filter_glob: StringProperty(
         default='*.mesh;*.MESH',
         options={'HIDDEN'},
@@ -218,6 +311,7 @@ so it's a good idea to pre-bake the animation and uncheck this option''',
         keywords = self.as_keywords(ignore=('check_existing', 'filter_glob'))
         prefs = context.preferences.addons[__package__].preferences
         keywords['num_fake_pose'] = prefs.num_fake_pose
+        keywords['bake_workers'] = prefs.bake_workers
         bpy.context.window.cursor_set('WAIT')
         result = ogre_exporter.save(self, context, **keywords)
         bpy.context.window.cursor_set('DEFAULT')
@@ -245,6 +339,11 @@ so it's a good idea to pre-bake the animation and uncheck this option''',
         keying = skeleton.column()
         keying.prop(self, 'is_visual_keying')
         keying.prop(self, 'use_scale_keyframe')
+        keying.prop(self, 'reduce_keyframes')
+        tolerance = keying.column()
+        tolerance.enabled = self.reduce_keyframes
+        tolerance.prop(self, 'reduce_position_tolerance')
+        tolerance.prop(self, 'reduce_angle_tolerance')
         keying.enabled = self.export_animation
         skeleton.prop(self, 'export_all_bones')
 
@@ -271,6 +370,11 @@ class KENSHI_OT_ImportOgreSkeletonObject(Operator, ImportHelper):
         description='Link animation to selected armature object',
         default=False,
         ) # type: ignore
+    load_on_demand: BoolProperty(
+        name='Load animations on demand',
+        description='Only list the animations on the armature.\nActions are created when picked from the Kenshi Animations panel',
+        default=True,
+        ) # type: ignore
     filter_glob: StringProperty(
         default='*.skeleton;*.SKELETON',
         options={'HIDDEN'},
@@ -279,6 +383,8 @@ class KENSHI_OT_ImportOgreSkeletonObject(Operator, ImportHelper):
     def execute(self, context):
         from . import ogre_importer
         keywords = self.as_keywords(ignore=('filter_glob',))
+        prefs = context.preferences.addons[__package__].preferences
+        keywords['cache_size'] = prefs.cache_size
         bpy.context.window.cursor_set('WAIT')
         result = ogre_importer.load_skeleton(self, context, **keywords)
         bpy.context.window.cursor_set('DEFAULT')
@@ -295,6 +401,7 @@ class KENSHI_OT_ImportOgreSkeletonObject(Operator, ImportHelper):
         rate = sleketon.column()
         rate.enabled = self.import_animations
         rate.prop(self, 'round_frames')
+        rate.prop(self, 'load_on_demand')
 
 
 class KENSHI_OT_ExportOgreSkeletonObject(Operator, ExportHelper):
@@ -339,6 +446,28 @@ so it's a good idea to pre-bake the animation and uncheck this option''',
         description='Set scale keyframes in the animation',
         default=False,
         ) # type: ignore
+    reduce_keyframes: BoolProperty(
+        name='Reduce keyframes',
+        description='Remove keyframes that interpolation rebuilds within the tolerances below.\nTracks that stay at the rest pose are not exported',
+        default=False,
+        ) # type: ignore
+    reduce_position_tolerance: FloatProperty(
+        name='Position tolerance',
+        description='Largest position error allowed for a removed keyframe.\nAlso used for scale when scale keyframes are exported',
+        default=0.001,
+        min=0.0,
+        precision=4,
+        step=0.01,
+        ) # type: ignore
+    reduce_angle_tolerance: FloatProperty(
+        name='Angle tolerance',
+        description='Largest rotation error allowed for a removed keyframe',
+        subtype='ANGLE',
+        default=radians(0.05),
+        min=0.0,
+        precision=3,
+        step=0.1,
+        ) # type: ignore
     filter_glob: StringProperty(
         default='*.skeleton;*.SKELETON',
         options={'HIDDEN'},
@@ -351,6 +480,8 @@ so it's a good idea to pre-bake the animation and uncheck this option''',
     def execute(self, context):
         from . import ogre_exporter
         keywords = self.as_keywords(ignore=('check_existing', 'filter_glob'))
+        prefs = context.preferences.addons[__package__].preferences
+        keywords['bake_workers'] = prefs.bake_workers
         bpy.context.window.cursor_set('WAIT')
         result = ogre_exporter.save_skeleton(self, context, **keywords)
         bpy.context.window.cursor_set('DEFAULT')
@@ -369,6 +500,11 @@ so it's a good idea to pre-bake the animation and uncheck this option''',
         keying = skeleton.column()
         keying.prop(self, 'is_visual_keying')
         keying.prop(self, 'use_scale_keyframe')
+        keying.prop(self, 'reduce_keyframes')
+        tolerance = keying.column()
+        tolerance.enabled = self.reduce_keyframes
+        tolerance.prop(self, 'reduce_position_tolerance')
+        tolerance.prop(self, 'reduce_angle_tolerance')
         keying.enabled = self.export_animation
         skeleton.prop(self, 'export_all_bones')
 
@@ -466,6 +602,84 @@ class KENSHI_OT_ExportPhysXObject(Operator, ExportHelper):
         layout.label(text='PhysX Technology provided under license from NVIDIA Corporation. © 2002-2011 NVIDIA Corporation. All rights reserved.')
 
 
+class KENSHI_PG_Animation(PropertyGroup):
+    filepath: StringProperty(subtype='FILE_PATH') # type: ignore
+    length: FloatProperty(name='Length') # type: ignore
+    track_count: IntProperty(name='Tracks') # type: ignore
+    is_loaded: BoolProperty(name='Loaded') # type: ignore
+
+
+class KENSHI_PG_AnimationCatalog(PropertyGroup):
+    animations: CollectionProperty(type=KENSHI_PG_Animation) # type: ignore
+    active_index: IntProperty() # type: ignore
+    fps: FloatProperty(default=24.0) # type: ignore
+    round_frames: BoolProperty() # type: ignore
+
+
+class KENSHI_UL_Animations(UIList):
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        row = layout.row()
+        row.label(text=item.name, icon='ACTION' if item.is_loaded else 'BLANK1')
+        row.label(text=f'{item.length:.2f}s')
+        row.label(text=str(item.track_count) if item.is_loaded else '')
+
+
+class KENSHI_OT_LoadAnimation(Operator):
+    '''Create actions for the listed Kenshi animations'''
+    bl_idname = 'kenshi.load_animation'
+    bl_label = 'Load animation'
+    bl_options = {'UNDO'}
+
+    load_all: BoolProperty(
+        name='Load all',
+        default=False,
+        options={'SKIP_SAVE'},
+        ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.object
+        return obj and obj.type == 'ARMATURE' and len(obj.kenshi_animations.animations) > 0
+
+    def execute(self, context):
+        from . import ogre_importer
+        armature = context.object
+        catalog = armature.kenshi_animations
+        if self.load_all:
+            names = [item.name for item in catalog.animations if not item.is_loaded]
+        elif 0 <= catalog.active_index < len(catalog.animations):
+            names = [catalog.animations[catalog.active_index].name]
+        else:
+            self.report({'WARNING'}, 'No animation selected')
+            return {'CANCELLED'}
+
+        prefs = context.preferences.addons[__package__].preferences
+        bpy.context.window.cursor_set('WAIT')
+        result = ogre_importer.load_catalog_animations(self, context, armature=armature, names=names, cache_size=prefs.cache_size)
+        bpy.context.window.cursor_set('DEFAULT')
+        return result
+
+
+class KENSHI_PT_Animations(Panel):
+    bl_label = 'Kenshi Animations'
+    bl_space_type = 'PROPERTIES'
+    bl_region_type = 'WINDOW'
+    bl_context = 'data'
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.object
+        return obj and obj.type == 'ARMATURE' and len(obj.kenshi_animations.animations) > 0
+
+    def draw(self, context):
+        layout = self.layout
+        catalog = context.object.kenshi_animations
+        layout.template_list('KENSHI_UL_Animations', '', catalog, 'animations', catalog, 'active_index')
+        row = layout.row()
+        row.operator(KENSHI_OT_LoadAnimation.bl_idname, text='Load animation').load_all = False
+        row.operator(KENSHI_OT_LoadAnimation.bl_idname, text='Load all').load_all = True
+
+
 class KENSHI_IO_Preferences(bpy.types.AddonPreferences):
     bl_idname = __package__
 
@@ -488,6 +702,49 @@ class KENSHI_IO_Preferences(bpy.types.AddonPreferences):
                ],
         default='-',
     ) # type: ignore
+    cache_size: IntProperty(
+        name='cache size (MB)',
+        description='Parsed mesh and skeleton files are kept in memory up to this size.\nFiles are parsed again when they change on disk',
+        min=0,
+        default=512,
+    ) # type: ignore
+    import_workers: IntProperty(
+        name='import processes',
+        description='Number of processes that decode files when importing several meshes at once.\n0 uses every CPU core, 1 decodes in this Blender',
+        min=0,
+        max=64,
+        default=0,
+    ) # type: ignore
+    bake_workers: IntProperty(
+        name='bake processes',
+        description='Number of background Blender processes that bake actions when exporting with visual keying.\n0 or 1 bakes in this Blender',
+        min=0,
+        max=64,
+        default=0,
+    ) # type: ignore
+    disk_cache_directory: StringProperty(
+        name='mesh cache folder',
+        description='Keep imported meshes ready to use in this folder, so importing the same file with the same options again skips decoding it.\nLeave empty to disable',
+        subtype='DIR_PATH',
+        default='',
+    ) # type: ignore
+    disk_cache_size: IntProperty(
+        name='mesh cache size (MB)',
+        description='The least recently used meshes are deleted from the mesh cache folder above this size',
+        min=0,
+        default=2048,
+    ) # type: ignore
+    trace_directory: StringProperty(
+        name='trace output folder',
+        description='Write a Chrome trace (JSON) of every import and export to this folder.\nLeave empty to disable. The KENSHI_IO_TRACE environment variable takes priority',
+        subtype='DIR_PATH',
+        default='',
+    ) # type: ignore
+    print_profile: BoolProperty(
+        name='print timing table',
+        description='Print the time spent in each phase of every import and export to the system console',
+        default=False,
+    ) # type: ignore
 
     def draw(self, context):
         layout = self.layout
@@ -496,6 +753,13 @@ class KENSHI_IO_Preferences(bpy.types.AddonPreferences):
         col.prop(self, 'num_fake_pose')
         col.label(text='submesh name delimiter')
         col.prop(self, 'submesh_name_delimiter', text='')
+        col.prop(self, 'cache_size')
+        col.prop(self, 'import_workers')
+        col.prop(self, 'bake_workers')
+        col.prop(self, 'disk_cache_size')
+        col.prop(self, 'print_profile')
+        layout.prop(self, 'disk_cache_directory')
+        layout.prop(self, 'trace_directory')
 
 
 def menu_func_import(self, context):
@@ -534,11 +798,24 @@ classes = (KENSHI_OT_ImportOgreObject,
            KENSHI_OT_ExportOgreSkeletonObject,
            KENSHI_OT_ImportPhysXObject,
            KENSHI_OT_ExportPhysXObject,
+           KENSHI_PG_Animation,
+           KENSHI_PG_AnimationCatalog,
+           KENSHI_UL_Animations,
+           KENSHI_OT_LoadAnimation,
+           KENSHI_PT_Animations,
            KENSHI_IO_Preferences)
 
 preview_collections = {}
 
 
+@persistent
+def clear_bake_context(*args):
+    # Tracks baked by visual keying exports are not carried into another file
+    module = sys.modules.get(f'{__package__}.bake_context')
+    if module is not None:
+        module.bake_context.clear()
+
+
 def register():
     pcoll = previews.new()
     ui_images_dir = os.path.join(os.path.dirname(__file__), 'ui_images')
@@ -556,6 +833,8 @@ def register():
     for cls in classes:
         register_class(cls)
 
+    Object.kenshi_animations = PointerProperty(type=KENSHI_PG_AnimationCatalog)
+
     TOPBAR_MT_file_import.append(menu_func_import)
     TOPBAR_MT_file_export.append(menu_func_export)
     TOPBAR_MT_file_import.append(menu_func_import_skeleton)
@@ -563,16 +842,21 @@ def register():
     TOPBAR_MT_file_import.append(menu_func_import_collision)
     TOPBAR_MT_file_export.append(menu_func_export_collision)
 
+    bpy.app.handlers.load_pre.append(clear_bake_context)
+
     bpy.app.translations.register(__name__, load_translate())
 
 
 def unregister():
     bpy.app.translations.unregister(__name__)
+    bpy.app.handlers.load_pre.remove(clear_bake_context)
+    clear_bake_context()
     del Scene.physx_logo
     for pcoll in preview_collections.values():
         previews.remove(pcoll)
     preview_collections.clear()
 
+    del Object.kenshi_animations
     for cls in reversed(classes):
         unregister_class(cls)
 
@@ -0,0 +1,278 @@
+
+import hashlib
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class CacheKey(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    weight: int
+
+
+def file_key(filepath: str) -> CacheKey:
+    path = os.path.normcase(os.path.abspath(filepath))
+    stat = os.stat(path)
+    return CacheKey(path, stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=256)
+def _hash_file(key: CacheKey) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(key.path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_hash(filepath: str) -> str:
+    # Content hash, only recomputed when the file's size or mtime changes
+    return _hash_file(file_key(filepath))
+
+
+class AssetCache:
+    # LRU of parsed files. An entry is dropped as soon as its file changes size or mtime.
+    # The file size stands in for the memory used by the parsed data.
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Tuple[CacheKey, CacheEntry]]' = OrderedDict()
+        self._loading: Dict[CacheKey, Future] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, filepath: str) -> bool:
+        key = file_key(filepath)
+        with self._lock:
+            item = self._entries.get(key.path)
+            return item is not None and item[0] == key
+
+    def get(self, filepath: str, loader: Callable[[str], Any]) -> Any:
+        key = file_key(filepath)
+        with self._lock:
+            item = self._entries.get(key.path)
+            if item is not None:
+                if item[0] == key:
+                    self._entries.move_to_end(key.path)
+                    self.hits += 1
+                    return item[1].value
+                self._remove(key.path)
+            self.misses += 1
+
+            # Another thread is already parsing this file, wait for its result
+            pending = self._loading.get(key)
+            if pending is None:
+                future = self._loading[key] = Future()
+        if pending is not None:
+            return pending.result()
+
+        # Parse outside the lock so different files can load in parallel
+        try:
+            value = loader(key.path)
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            # Not kept when the cache was cleared while the file was parsed
+            if self._loading.pop(key, None) is future:
+                self._insert(key, CacheEntry(value, key.size))
+        future.set_result(value)
+        return value
+
+    def put(self, filepath: str, value: Any):
+        # For files parsed somewhere else, such as a decode process
+        key = file_key(filepath)
+        with self._lock:
+            self._insert(key, CacheEntry(value, key.size))
+
+    def set_limit(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def discard(self, filepath: str):
+        path = os.path.normcase(os.path.abspath(filepath))
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+
+    def clear(self):
+        # Threads already waiting on a parse still get its result
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'bytes': self.total_bytes,
+                    'max_bytes': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses}
+
+    def _insert(self, key: CacheKey, entry: CacheEntry):
+        if key.path in self._entries:
+            self._remove(key.path)
+        if entry.weight > self.max_bytes:
+            return
+        self._entries[key.path] = (key, entry)
+        self.total_bytes += entry.weight
+        self._evict()
+
+    def _remove(self, path: str):
+        _, entry = self._entries.pop(path)
+        self.total_bytes -= entry.weight
+
+    def _evict(self):
+        while self._entries and self.total_bytes > self.max_bytes:
+            _, (_, entry) = self._entries.popitem(last=False)
+            self.total_bytes -= entry.weight
+
+
+asset_cache = AssetCache()
+
+
+class DiskCache:
+    # Named arrays kept as compressed .npz files, one per key, shared between sessions.
+    # A hit touches the file's mtime, so the oldest mtime is the least recently used.
+    # File sizes are tracked in memory, the directory is only scanned again when they pass the limit.
+    def __init__(self, directory: str = '', max_bytes: int = 2048 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._sizes: Optional[Dict[str, int]] = None
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and self.max_bytes > 0
+
+    def configure(self, directory: str, max_bytes: int):
+        with self._lock:
+            if directory != self.directory:
+                self._sizes = None
+            self.directory = directory
+            self.max_bytes = max_bytes
+            if self.enabled:
+                self._scan()
+                if self.total_bytes > self.max_bytes:
+                    self._evict()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def load(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # Unreadable, e.g. left over from a crash. It is written again
+            self.misses += 1
+            self.discard(key)
+            return None
+        self.hits += 1
+        return arrays
+
+    def save(self, key: str, arrays: Dict[str, np.ndarray]):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+            size = f.tell()
+        os.replace(temp_path, path)
+        with self._lock:
+            self._scan()
+            self.total_bytes += size - self._sizes.get(path, 0)
+            self._sizes[path] = size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def discard(self, key: str):
+        path = self.path(key)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        with self._lock:
+            if self._sizes is not None and path in self._sizes:
+                self.total_bytes -= self._sizes.pop(path)
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries():
+                os.remove(entry.path)
+            self._sizes = {}
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._scan()
+            return {'entries': len(self._sizes),
+                    'bytes': self.total_bytes,
+                    'max_bytes': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses}
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [entry for entry in os.scandir(self.directory) if entry.is_file() and entry.name.endswith('.npz')]
+
+    def _scan(self) -> List[Tuple[int, int, str]]:
+        # (mtime, size, path) of every file, stat once each. Only rescans when the sizes are unknown
+        if self._sizes is not None:
+            return []
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        self._sizes = {path: size for _, size, path in entries}
+        self.total_bytes = sum(self._sizes.values())
+        return entries
+
+    def _evict(self):
+        # Other processes may share the directory, so the sizes are read again before removing files
+        self._sizes = None
+        entries = sorted(self._scan())
+        for _, size, path in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total_bytes -= size
+            del self._sizes[path]
+
+
+disk_cache = DiskCache()
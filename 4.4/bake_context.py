@@ -0,0 +1,264 @@
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import bpy
+from mathutils import Matrix
+
+from .bake_worker import BakeLayout, bake_layout
+try:
+    from kenshi_blender_tool import Matrix3
+except ImportError:
+    # The native wheel only exists for Windows
+    from .ogre_codec import Matrix3
+
+
+# Marks the scene and armature copy so an export interrupted by undo cannot leave them behind
+BAKE_CONTEXT_PROPERTY = 'kenshi_bake_context'
+TRACK_CACHE_BYTES = 256 * 1024 * 1024
+
+# locations (bones, frames, 3), rotations (bones, frames, 4), scales (bones, frames, 3)
+BakedTracks = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+KEYFRAME_PROPERTIES = (('co', 2, np.float32),
+                       ('handle_left', 2, np.float32),
+                       ('handle_right', 2, np.float32),
+                       ('interpolation', 1, np.int32),
+                       ('easing', 1, np.int32),
+                       ('back', 1, np.float32),
+                       ('amplitude', 1, np.float32),
+                       ('period', 1, np.float32))
+
+
+def rna_values(struct, depth: int = 3) -> list:
+    # Every property of an RNA struct, data blocks by name
+    values = []
+    for prop in struct.bl_rna.properties:
+        identifier = prop.identifier
+        if identifier == 'rna_type':
+            continue
+        value = getattr(struct, identifier, None)
+        if prop.type == 'POINTER':
+            if isinstance(value, bpy.types.ID):
+                value = value.name
+            elif value is not None and depth > 0:
+                value = rna_values(value, depth - 1)
+            else:
+                value = None
+        elif prop.type == 'COLLECTION':
+            value = [rna_values(item, depth - 1) for item in value] if depth > 0 else len(value)
+        elif getattr(prop, 'is_array', False):
+            value = np.asarray(value).ravel().tolist()
+        values.append((identifier, value))
+    return values
+
+
+def update_fcurve_hash(digest, fcurve: bpy.types.FCurve):
+    digest.update(f'{fcurve.data_path}[{fcurve.array_index}] {fcurve.extrapolation} {fcurve.mute}'.encode('utf-8'))
+    keyframe_points = fcurve.keyframe_points
+    key_count = len(keyframe_points)
+    for name, size, dtype in KEYFRAME_PROPERTIES:
+        values = np.empty(key_count * size, dtype=dtype)
+        keyframe_points.foreach_get(name, values)
+        digest.update(values.tobytes())
+    sampled_points = fcurve.sampled_points
+    values = np.empty(len(sampled_points) * 2, dtype=np.float32)
+    sampled_points.foreach_get('co', values)
+    digest.update(values.tobytes())
+    for modifier in fcurve.modifiers:
+        digest.update(repr(rna_values(modifier)).encode('utf-8'))
+    if fcurve.driver is not None:
+        digest.update(repr(rna_values(fcurve.driver)).encode('utf-8'))
+
+
+def action_fingerprint(action: bpy.types.Action, slot: Optional[bpy.types.ActionSlot], frame_step: int) -> str:
+    # Changes with the keyframes of the action, its frame range and the bake step
+    digest = hashlib.blake2b(digest_size=16)
+    start, end = action.frame_range
+    digest.update(f'{action.name} {slot.identifier if slot else ""} {int(start)} {int(end)} {frame_step}'.encode('utf-8'))
+    for layer in action.layers:
+        for strip in layer.strips:
+            for channelbag in strip.channelbags:
+                digest.update(channelbag.slot.identifier.encode('utf-8'))
+                for fcurve in channelbag.fcurves:
+                    update_fcurve_hash(digest, fcurve)
+    return digest.hexdigest()
+
+
+def armature_fingerprint(armature: bpy.types.Object, bone_names: List[str]) -> str:
+    # Changes with the rest pose, the bone settings, the constraints and the objects they target
+    digest = hashlib.blake2b(digest_size=16)
+    data_bones = armature.data.bones
+    rest_matrices = np.empty(len(data_bones) * 16, dtype=np.float32)
+    data_bones.foreach_get('matrix_local', rest_matrices)
+    digest.update(rest_matrices.tobytes())
+    digest.update(repr(bone_names).encode('utf-8'))
+    targets = {}
+    for bone in data_bones:
+        digest.update(f'{bone.name} {bone.parent.name if bone.parent else ""} {bone.use_inherit_rotation} '
+                      f'{bone.inherit_scale} {bone.use_local_location} {bone.use_relative_parent}'.encode('utf-8'))
+    for pbone in armature.pose.bones:
+        digest.update(f'{pbone.name} {pbone.rotation_mode}'.encode('utf-8'))
+        for constraint in pbone.constraints:
+            digest.update(repr(rna_values(constraint)).encode('utf-8'))
+            target = getattr(constraint, 'target', None)
+            if target is not None:
+                targets[target.name] = target
+    if armature.animation_data is not None:
+        for fcurve in armature.animation_data.drivers:
+            update_fcurve_hash(digest, fcurve)
+    for name, target in sorted(targets.items()):
+        digest.update(name.encode('utf-8'))
+        digest.update(np.array(target.matrix_world, dtype=np.float32).tobytes())
+        if target.animation_data is not None and target.animation_data.action is not None:
+            action = target.animation_data.action
+            digest.update(action_fingerprint(action, target.animation_data.action_slot, 1).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class BakeContext:
+    # Tracks baked by visual keying exports, kept in memory between exports.
+    # Keys include the armature fingerprint, so a change to the armature or its constraints bakes again.
+    # The bake scene and armature copy only exist while an export bakes, they never reach the saved file.
+    def __init__(self, max_track_bytes: int = TRACK_CACHE_BYTES):
+        self.scene: Optional[bpy.types.Scene] = None
+        self.armature: Optional[bpy.types.Object] = None
+        self.fingerprint = ''
+        self.fix_matrix: Dict[str, Matrix3] = {}
+        self.layout: Optional[BakeLayout] = None
+        self.max_track_bytes = max_track_bytes
+        self.track_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._tracks: 'OrderedDict[str, BakedTracks]' = OrderedDict()
+
+    def prepare(self, armature: bpy.types.Object, bone_names: List[str]) -> bool:
+        # True when the bone axes from an earlier export of the same armature still apply
+        fingerprint = armature_fingerprint(armature, bone_names)
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.fix_matrix = {}
+        return bool(self.fix_matrix)
+
+    def track_key(self, action_key: str) -> str:
+        return f'{self.fingerprint} {action_key}'
+
+    def build(self, context: bpy.types.Context, armature: bpy.types.Object, bone_names: List[str]):
+        self.release()
+        try:
+            self._build(context, armature, bone_names)
+        except BaseException:
+            self.release()
+            raise
+
+    def _build(self, context: bpy.types.Context, armature: bpy.types.Object, bone_names: List[str]):
+        scene_layer = context.view_layer
+        temp_armature: bpy.types.Object = armature.copy()
+        temp_armature[BAKE_CONTEXT_PROPERTY] = True
+        self.armature = temp_armature
+        temp_scene = context.blend_data.scenes.new('bake_work')
+        temp_scene[BAKE_CONTEXT_PROPERTY] = True
+        self.scene = temp_scene
+
+        temp_animdata = temp_armature.animation_data
+        for track in temp_animdata.nla_tracks:
+            temp_animdata.nla_tracks.remove(track)
+
+        # Edit bones are only available from the active view layer
+        context.scene.collection.objects.link(temp_armature)
+        hidden = temp_armature.hide_viewport
+        temp_armature.hide_viewport = False
+        prev = scene_layer.objects.active
+        scene_layer.objects.active = temp_armature
+        try:
+            bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+            bpy.ops.object.mode_set(mode='EDIT', toggle=False)
+
+            fix1 = Matrix([
+                (1, 0, 0),
+                (0, 0, 1),
+                (0, -1, 0)
+                ])
+            fix2 = Matrix([
+                (0, 1, 0),
+                (0, 0, 1),
+                (1, 0, 0)
+                ])
+            e_bones = temp_armature.data.edit_bones
+            for name in bone_names:
+                e_bone = e_bones[name]
+                m = fix2 @ e_bone.parent.matrix.to_3x3().transposed() @ e_bone.matrix.to_3x3() if e_bone.parent else fix1 @  e_bone.matrix.to_3x3()
+                self.fix_matrix[name] = Matrix3([
+                    [m[0][0], m[0][1], m[0][2]],
+                    [m[1][0], m[1][1], m[1][2]],
+                    [m[2][0], m[2][1], m[2][2]]
+                    ])
+            bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+        finally:
+            scene_layer.objects.active = prev
+            temp_armature.hide_viewport = hidden
+            context.scene.collection.objects.unlink(temp_armature)
+
+        self.layout = bake_layout(temp_armature, bone_names)
+        temp_scene.collection.objects.link(temp_armature)
+        for pbone in temp_armature.pose.bones:
+            for constraint in pbone.constraints:
+                target = getattr(constraint, 'target', None)
+                if target is not None and temp_scene.collection.objects.find(target.name) == -1:
+                    temp_scene.collection.objects.link(target)
+
+    def release(self):
+        for collection, item in ((bpy.data.scenes, self.scene), (bpy.data.objects, self.armature)):
+            try:
+                if item is not None:
+                    collection.remove(item)
+            except ReferenceError:
+                pass
+        # Copies whose references undo invalidated
+        for collection in (bpy.data.scenes, bpy.data.objects):
+            for item in [item for item in collection if item.get(BAKE_CONTEXT_PROPERTY)]:
+                collection.remove(item)
+        self.scene = None
+        self.armature = None
+        self.layout = None
+
+    def clear(self):
+        self.release()
+        self.fingerprint = ''
+        self.fix_matrix = {}
+        self.clear_tracks()
+
+    def get_tracks(self, key: str) -> Optional[BakedTracks]:
+        tracks = self._tracks.get(key)
+        if tracks is None:
+            self.misses += 1
+            return None
+        self._tracks.move_to_end(key)
+        self.hits += 1
+        return tracks
+
+    def put_tracks(self, key: str, tracks: BakedTracks):
+        if key in self._tracks:
+            self.track_bytes -= sum(array.nbytes for array in self._tracks.pop(key))
+        size = sum(array.nbytes for array in tracks)
+        if size > self.max_track_bytes:
+            return
+        self._tracks[key] = tracks
+        self.track_bytes += size
+        while self.track_bytes > self.max_track_bytes:
+            _, evicted = self._tracks.popitem(last=False)
+            self.track_bytes -= sum(array.nbytes for array in evicted)
+
+    def clear_tracks(self):
+        self._tracks.clear()
+        self.track_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'tracks': len(self._tracks),
+                'bytes': self.track_bytes,
+                'hits': self.hits,
+                'misses': self.misses}
+
+
+bake_context = BakeContext()
@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+try:
+    from .bone_math import BoneHierarchy, decompose_matrices
+except ImportError:
+    # Run by a background Blender process, where the add-on is not loaded
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bone_math import BoneHierarchy, decompose_matrices
+
+
+class BakeLayout(NamedTuple):
+    hierarchy: BoneHierarchy
+    rest_matrices: np.ndarray   # (all bones, 4, 4) armature space
+    bone_names: List[str]       # exported bones
+    bone_indices: np.ndarray    # exported bones -> all bones
+    converted_bones: Dict[str, object]
+
+
+def bake_layout(armature, bone_names: List[str]) -> BakeLayout:
+    data_bones = armature.data.bones
+    pose_bones = armature.pose.bones
+    hierarchy = BoneHierarchy.from_armature_bones(data_bones)
+    rest_matrices = np.empty(len(data_bones) * 16, dtype=np.float32)
+    data_bones.foreach_get('matrix_local', rest_matrices)
+    # foreach_get flattens matrices column by column
+    rest_matrices = rest_matrices.reshape(-1, 4, 4).transpose(0, 2, 1)
+    bone_indices = np.array([hierarchy.index[name] for name in bone_names], dtype=np.int32)
+    # Bones with other inheritance settings are left to convert_space
+    converted_bones = {name: pose_bones[name] for name in bone_names
+                       if not (data_bones[name].use_inherit_rotation
+                               and data_bones[name].inherit_scale == 'FULL'
+                               and data_bones[name].use_local_location
+                               and not data_bones[name].use_relative_parent)}
+    return BakeLayout(hierarchy, rest_matrices, list(bone_names), bone_indices, converted_bones)
+
+
+def reset_pose(armature):
+    pose_bones = armature.pose.bones
+    bone_count = len(pose_bones)
+    pose_bones.foreach_set('location', [0, 0, 0] * bone_count)
+    pose_bones.foreach_set('rotation_quaternion', [1, 0, 0, 0] * bone_count)
+    pose_bones.foreach_set('rotation_euler', [0, 0, 0] * bone_count)
+    pose_bones.foreach_set('scale', [1, 1, 1] * bone_count)
+
+
+def bake_frames(scene, armature, layout: BakeLayout, frames: np.ndarray) -> np.ndarray:
+    # Bone space matrices (frames, exported bones, 4, 4) of the evaluated pose at each frame
+    armature_convert_space = armature.convert_space
+    pose_bones_foreach_get = armature.pose.bones.foreach_get
+    pose_matrices = np.empty((len(frames), len(layout.rest_matrices) * 16), dtype=np.float32)
+    converted_matrices = {name: np.empty((len(frames), 4, 4), dtype=np.float32) for name in layout.converted_bones}
+    converted_items = [(pbone, converted_matrices[name]) for name, pbone in layout.converted_bones.items()]
+    scene_frame_set = scene.frame_set
+
+    for frame_index, frame in enumerate(frames.astype(np.int64).tolist()):
+        scene_frame_set(frame)
+        pose_bones_foreach_get('matrix', pose_matrices[frame_index])
+        for pbone, matrices in converted_items:
+            matrices[frame_index] = armature_convert_space(pose_bone=pbone,
+                                                           matrix=pbone.matrix,
+                                                           from_space='POSE',
+                                                           to_space='LOCAL')
+
+    pose_matrices = pose_matrices.reshape(len(frames), -1, 4, 4).transpose(0, 1, 3, 2)
+    local_matrices = layout.hierarchy.pose_to_local(pose_matrices, layout.rest_matrices)[:, layout.bone_indices]
+    for bone_index, name in enumerate(layout.bone_names):
+        if name in converted_matrices:
+            local_matrices[:, bone_index] = converted_matrices[name]
+    return local_matrices
+
+
+def main(argv: List[str]):
+    # blender -b bake.blend --python bake_worker.py -- job.json
+    import bpy
+
+    with open(argv[0], encoding='utf-8') as f:
+        job = json.load(f)
+    scene = bpy.data.scenes[job['scene']]
+    armature = bpy.data.objects[job['armature']]
+    animdata = armature.animation_data
+    view_layer = scene.view_layers[0]
+    layout = bake_layout(armature, job['bones'])
+
+    for item in job['actions']:
+        action = bpy.data.actions[item['action']]
+        reset_pose(armature)
+        animdata.action = action
+        animdata.action_slot = action.slots[item['slot']]
+        view_layer.update()
+
+        frames = np.arange(item['start'], item['end'], job['step'], dtype=np.float64)
+        locations, rotations, scales = decompose_matrices(bake_frames(scene, armature, layout, frames).transpose(1, 0, 2, 3))
+        np.savez(os.path.join(job['output'], f"{item['index']}.npz"),
+                 locations=locations.astype(np.float32),
+                 rotations=rotations.astype(np.float32),
+                 scales=scales.astype(np.float32))
+        print(f"Baked {action.name}, {len(frames)} frames", flush=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[sys.argv.index('--') + 1:])
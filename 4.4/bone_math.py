@@ -0,0 +1,330 @@
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def quaternion_to_matrix(quaternions: np.ndarray) -> np.ndarray:
+    # (n, 4) w, x, y, z -> (n, 3, 3)
+    q = np.array(quaternions, dtype=np.float64).reshape(-1, 4)
+    norm = np.linalg.norm(q, axis=1)
+    q[norm == 0] = (1.0, 0.0, 0.0, 0.0)
+    q /= np.where(norm == 0, 1.0, norm)[:, np.newaxis]
+    w, x, y, z = q.T
+
+    m = np.empty((len(q), 3, 3), dtype=np.float64)
+    m[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    m[:, 0, 1] = 2 * (x * y - w * z)
+    m[:, 0, 2] = 2 * (x * z + w * y)
+    m[:, 1, 0] = 2 * (x * y + w * z)
+    m[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    m[:, 1, 2] = 2 * (y * z - w * x)
+    m[:, 2, 0] = 2 * (x * z - w * y)
+    m[:, 2, 1] = 2 * (y * z + w * x)
+    m[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return m
+
+
+def matrix_to_quaternion(matrices: np.ndarray) -> np.ndarray:
+    # (n, 3, 3) or (n, 4, 4) -> (n, 4) w, x, y, z with w >= 0
+    m = np.array(matrices, dtype=np.float64)[:, :3, :3]
+    length = np.linalg.norm(m, axis=1, keepdims=True)
+    m /= np.where(length == 0, 1.0, length)
+
+    m00, m01, m02 = m[:, 0, 0], m[:, 0, 1], m[:, 0, 2]
+    m10, m11, m12 = m[:, 1, 0], m[:, 1, 1], m[:, 1, 2]
+    m20, m21, m22 = m[:, 2, 0], m[:, 2, 1], m[:, 2, 2]
+
+    # Shepperd's method, pick the largest diagonal term for stability
+    candidates = np.stack([1 + m00 + m11 + m22,
+                           1 + m00 - m11 - m22,
+                           1 - m00 + m11 - m22,
+                           1 - m00 - m11 + m22], axis=1)
+    case = np.argmax(candidates, axis=1)
+    s = 2.0 * np.sqrt(np.maximum(candidates[np.arange(len(m)), case], 1e-12))
+
+    q = np.empty((len(m), 4), dtype=np.float64)
+    c = case == 0
+    q[c] = np.stack([0.25 * s[c],
+                     (m21[c] - m12[c]) / s[c],
+                     (m02[c] - m20[c]) / s[c],
+                     (m10[c] - m01[c]) / s[c]], axis=1)
+    c = case == 1
+    q[c] = np.stack([(m21[c] - m12[c]) / s[c],
+                     0.25 * s[c],
+                     (m01[c] + m10[c]) / s[c],
+                     (m02[c] + m20[c]) / s[c]], axis=1)
+    c = case == 2
+    q[c] = np.stack([(m02[c] - m20[c]) / s[c],
+                     (m01[c] + m10[c]) / s[c],
+                     0.25 * s[c],
+                     (m12[c] + m21[c]) / s[c]], axis=1)
+    c = case == 3
+    q[c] = np.stack([(m10[c] - m01[c]) / s[c],
+                     (m02[c] + m20[c]) / s[c],
+                     (m12[c] + m21[c]) / s[c],
+                     0.25 * s[c]], axis=1)
+
+    q[q[:, 0] < 0] *= -1
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return q
+
+
+class BoneHierarchy:
+    def __init__(self, names: Sequence[str], parent_names: Sequence[str]):
+        self.names: List[str] = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        index_get = self.index.get
+        self.parents = np.array([index_get(name, -1) for name in parent_names], dtype=np.int32).reshape(-1)
+        self.levels: List[np.ndarray] = self._sort_levels()
+
+    @classmethod
+    def from_bone_data(cls, bones) -> 'BoneHierarchy':
+        return cls([bone.name for bone in bones],
+                   [bone.parent_name for bone in bones])
+
+    @classmethod
+    def from_armature_bones(cls, bones) -> 'BoneHierarchy':
+        return cls([bone.name for bone in bones],
+                   [bone.parent.name if bone.parent else '' for bone in bones])
+
+    def __len__(self):
+        return len(self.names)
+
+    def _sort_levels(self) -> List[np.ndarray]:
+        count = len(self.names)
+        parents = self.parents
+        children: List[List[int]] = [[] for _ in range(count)]
+        for i, parent in enumerate(parents.tolist()):
+            if parent == i:
+                parents[i] = -1
+            elif parent >= 0:
+                children[parent].append(i)
+
+        levels: List[List[int]] = []
+        visited = [False] * count
+        frontier = [i for i in range(count) if parents[i] < 0]
+        search_start = 0
+        while True:
+            depth = 0
+            while frontier:
+                for i in frontier:
+                    visited[i] = True
+                if depth == len(levels):
+                    levels.append([])
+                levels[depth].extend(frontier)
+                frontier = [c for i in frontier for c in children[i] if not visited[c]]
+                depth += 1
+
+            # Bones left over are caught in a parent cycle, cut it at the first one
+            while search_start < count and visited[search_start]:
+                search_start += 1
+            if search_start == count:
+                break
+            parents[search_start] = -1
+            frontier = [search_start]
+
+        return [np.array(level, dtype=np.int32) for level in levels]
+
+    def forward_kinematics(
+            self,
+            positions: np.ndarray,
+            rotations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Local (parent space) positions (n, 3) and quaternions (n, 4) -> armature space heads (n, 3) and rotations (n, 3, 3)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        local_rotations = quaternion_to_matrix(rotations)
+        heads = np.empty_like(positions)
+        world_rotations = np.empty_like(local_rotations)
+        if len(self.levels) == 0:
+            return heads, world_rotations
+
+        roots = self.levels[0]
+        heads[roots] = positions[roots]
+        world_rotations[roots] = local_rotations[roots]
+        for level in self.levels[1:]:
+            parent_rotations = world_rotations[self.parents[level]]
+            heads[level] = heads[self.parents[level]] + np.einsum('nij,nj->ni', parent_rotations, positions[level])
+            world_rotations[level] = parent_rotations @ local_rotations[level]
+
+        return heads, world_rotations
+
+    def nearest_ancestors(self, mask: np.ndarray) -> np.ndarray:
+        # Parent index that skips bones where mask is False, -1 if no such ancestor
+        ancestors = np.full(len(self.names), -1, dtype=np.int32)
+        for level in self.levels[1:]:
+            parents = self.parents[level]
+            ancestors[level] = np.where(mask[parents], parents, ancestors[parents])
+        return ancestors
+
+    def to_local(self, matrices: np.ndarray) -> np.ndarray:
+        # Armature space (n, 4, 4) -> parent space (n, 4, 4), roots are left as they are
+        matrices = np.asarray(matrices, dtype=np.float64)
+        local = matrices.copy()
+        has_parent = self.parents >= 0
+        local[has_parent] = np.linalg.inv(matrices[self.parents[has_parent]]) @ matrices[has_parent]
+        return local
+
+    def pose_to_local(self, pose_matrices: np.ndarray, rest_matrices: np.ndarray) -> np.ndarray:
+        # Pose space (frames, n, 4, 4) with armature space rests (n, 4, 4) -> bone space (frames, n, 4, 4),
+        # as convert_space from POSE to LOCAL for bones that fully inherit rotation and scale
+        pose_matrices = np.asarray(pose_matrices, dtype=np.float64)
+        rest_matrices = np.asarray(rest_matrices, dtype=np.float64)
+        has_parent = self.parents >= 0
+        parents = self.parents[has_parent]
+        offsets = np.linalg.inv(rest_matrices)
+        offsets[has_parent] = offsets[has_parent] @ rest_matrices[parents]
+        local = offsets @ pose_matrices
+        local[:, has_parent] = offsets[has_parent] @ np.linalg.inv(pose_matrices[:, parents]) @ pose_matrices[:, has_parent]
+        return local
+
+
+def split_keyframes(nd_track: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # (channels, 2k) interleaved frame, value -> frames (k,) and values (channels, k)
+    pairs = np.asarray(nd_track, dtype=np.float64)
+    pairs = pairs.reshape(pairs.shape[0], -1, 2)
+    return pairs[0, :, 0], pairs[:, :, 1]
+
+
+def resample_linear(frames: np.ndarray, values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    # (channels, k) keyed at frames -> (channels, len(grid))
+    if len(frames) == 0:
+        return np.zeros((len(values), len(grid)), dtype=np.float64)
+    return np.stack([np.interp(grid, frames, channel) for channel in values])
+
+
+def resample_quaternions(frames: np.ndarray, quaternions: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    # (4, k) w, x, y, z keyed at frames -> (4, len(grid)) with shortest path slerp
+    q = np.asarray(quaternions, dtype=np.float64).T
+    if len(q) == 0:
+        return np.tile(np.array([[1.0], [0.0], [0.0], [0.0]]), (1, len(grid)))
+    if len(q) == 1:
+        return np.repeat(q.T, len(grid), axis=1)
+
+    start = np.clip(np.searchsorted(frames, grid, side='right') - 1, 0, len(frames) - 2)
+    span = frames[start + 1] - frames[start]
+    t = np.clip((grid - frames[start]) / np.where(span == 0, 1.0, span), 0.0, 1.0)
+    return slerp(q[start], q[start + 1], t).T
+
+
+def slerp(q0: np.ndarray, q1: np.ndarray, t: np.ndarray) -> np.ndarray:
+    # (..., 4) w, x, y, z and factors (...) -> (..., 4) along the shortest path
+    t = t[..., np.newaxis]
+    dot = np.einsum('...i,...i->...', q0, q1)[..., np.newaxis]
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # Nearly identical rotations fall back to lerp
+    close = sin_theta < 1e-6
+    safe_sin = np.where(close, 1.0, sin_theta)
+    w0 = np.where(close, 1.0 - t, np.sin((1.0 - t) * theta) / safe_sin)
+    w1 = np.where(close, t, np.sin(t * theta) / safe_sin)
+    result = w0 * q0 + w1 * q1
+    result /= np.linalg.norm(result, axis=-1, keepdims=True)
+    return result
+
+
+def nlerp(q0: np.ndarray, q1: np.ndarray, t: np.ndarray) -> np.ndarray:
+    # (..., 4) w, x, y, z and factors (...) -> (..., 4) along the shortest path, as OGRE's RIM_LINEAR plays rotations
+    t = t[..., np.newaxis]
+    dot = np.einsum('...i,...i->...', q0, q1)[..., np.newaxis]
+    q1 = np.where(dot < 0, -q1, q1)
+    result = (1.0 - t) * q0 + t * q1
+    result /= np.linalg.norm(result, axis=-1, keepdims=True)
+    return result
+
+
+def rotation_angles(q0: np.ndarray, q1: np.ndarray) -> np.ndarray:
+    # (..., 4) unit quaternions -> (...) angle in radians between the rotations
+    dot = np.abs(np.einsum('...i,...i->...', q0, q1))
+    return 2.0 * np.arccos(np.clip(dot, 0.0, 1.0))
+
+
+def decompose_matrices(matrices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (bones, frames, 4, 4) -> locations (bones, frames, 3), quaternions (bones, frames, 4), scales (bones, frames, 3)
+    matrices = np.asarray(matrices, dtype=np.float64)
+    bone_count, frame_count = matrices.shape[:2]
+    locations = matrices[..., :3, 3]
+    scales = np.linalg.norm(matrices[..., :3, :3], axis=-2)
+    rotations = matrix_to_quaternion(matrices.reshape(-1, 4, 4)).reshape(bone_count, frame_count, 4)
+    # Keep neighbouring keys in the same hemisphere
+    if frame_count > 1:
+        flips = np.einsum('bfi,bfi->bf', rotations[:, 1:], rotations[:, :-1]) < 0
+        rotations[:, 1:] *= np.where(np.cumsum(flips, axis=1) % 2 == 1, -1.0, 1.0)[..., np.newaxis]
+    return locations, rotations, scales
+
+
+def rest_tracks(
+        locations: np.ndarray,
+        rotations: np.ndarray,
+        scales: np.ndarray,
+        position_tolerance: float,
+        angle_tolerance: float,
+        scale_tolerance: float) -> np.ndarray:
+    # (bones, frames, channels) -> (bones,) True where every frame is within tolerance of the rest pose
+    identity = np.array([1.0, 0.0, 0.0, 0.0])
+    return (np.all(np.linalg.norm(locations, axis=-1) <= position_tolerance, axis=1)
+            & np.all(rotation_angles(rotations, identity) <= angle_tolerance, axis=1)
+            & np.all(np.abs(scales - 1.0) <= scale_tolerance, axis=(1, 2)))
+
+
+def select_keyframes(
+        times: np.ndarray,
+        locations: np.ndarray,
+        rotations: np.ndarray,
+        scales: np.ndarray,
+        position_tolerance: float,
+        angle_tolerance: float,
+        scale_tolerance: float) -> np.ndarray:
+    # Keys at times (frames,) with (bones, frames, channels) values -> (bones, frames) mask of keys to keep.
+    # Dropped keys are rebuilt from their neighbours with lerp and nlerp as OGRE plays them back,
+    # the error is checked at every original key so it never adds up over several passes.
+    times = np.asarray(times, dtype=np.float64)
+    bone_count, frame_count = locations.shape[:2]
+    keep = np.ones((bone_count, frame_count), dtype=bool)
+    if frame_count <= 2 or bone_count == 0:
+        return keep
+
+    frame_index = np.arange(frame_count)
+    bone_index = np.arange(bone_count)[:, np.newaxis]
+    parity = 1
+    idle_passes = 0
+    while idle_passes < 2:
+        # Every other kept key is a candidate, so no two candidates share a span between anchors
+        rank = np.cumsum(keep, axis=1) - 1
+        candidates = keep & (rank % 2 == parity) & (rank > 0) & (rank < rank[:, -1:])
+        parity ^= 1
+        if not np.any(candidates):
+            idle_passes += 1
+            continue
+
+        anchors = keep & ~candidates
+        previous = np.maximum.accumulate(np.where(anchors, frame_index, -1), axis=1)
+        following = np.minimum.accumulate(np.where(anchors, frame_index, frame_count)[:, ::-1], axis=1)[:, ::-1]
+        span = times[following] - times[previous]
+        t = np.where(span > 0, (times - times[previous]) / np.where(span > 0, span, 1.0), 0.0)
+        t_channels = t[..., np.newaxis]
+
+        start = locations[bone_index, previous]
+        position_error = np.linalg.norm(start + (locations[bone_index, following] - start) * t_channels - locations, axis=-1)
+        start = scales[bone_index, previous]
+        scale_error = np.max(np.abs(start + (scales[bone_index, following] - start) * t_channels - scales), axis=-1)
+        angle_error = rotation_angles(nlerp(rotations[bone_index, previous], rotations[bone_index, following], t), rotations)
+        failed = (position_error > position_tolerance) | (angle_error > angle_tolerance) | (scale_error > scale_tolerance)
+
+        # A candidate goes when every key between its anchors is rebuilt within tolerance
+        failed_spans = np.bincount((bone_index * frame_count + previous)[failed], minlength=bone_count * frame_count)
+        removed = candidates & (failed_spans.reshape(bone_count, frame_count)[bone_index, previous] == 0)
+        if np.any(removed):
+            keep &= ~removed
+            idle_passes = 0
+        else:
+            idle_passes += 1
+    return keep
+
+
+def bone_data_transforms(bones) -> Tuple[np.ndarray, np.ndarray]:
+    positions = np.array([(bone.position.x, bone.position.y, bone.position.z) for bone in bones], dtype=np.float64).reshape(-1, 3)
+    rotations = np.array([(bone.rotate.w, bone.rotate.x, bone.rotate.y, bone.rotate.z) for bone in bones], dtype=np.float64).reshape(-1, 4)
+    return positions, rotations
@@ -0,0 +1,25 @@
+import os
+import sys
+from typing import Any, Dict, Tuple
+
+try:
+    from .ogre_codec import KenshiObjectSerializer
+except ImportError:
+    # Run by a decode process, where the add-on is not loaded
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from ogre_codec import KenshiObjectSerializer
+
+
+def decode_mesh_file(filepath: str) -> Dict[str, Tuple[KenshiObjectSerializer, Any]]:
+    # asset_cache entries for the mesh and the skeleton next to it.
+    # Submeshes are decoded up front, lazily read ones keep the file open and cannot be sent back.
+    folder, mesh_file = os.path.split(filepath)
+    serializer = KenshiObjectSerializer(lazy=False)
+    serializer.add_resource_location(folder)
+    mesh_data = serializer.load_mesh(mesh_file)
+    entries = {filepath: (serializer, mesh_data)}
+    skeleton_name = mesh_data.get_linked_skeleton_name()
+    skeleton_path = os.path.join(folder, skeleton_name)
+    if skeleton_name and os.path.isfile(skeleton_path):
+        entries[skeleton_path] = (serializer, serializer.load_skeleton(skeleton_path))
+    return entries
@@ -0,0 +1,199 @@
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+# Keyframe interpolation as foreach_get returns it
+CONSTANT = 0
+LINEAR = 1
+BEZIER = 2
+
+BISECTION_STEPS = 40
+
+
+class Cycles(NamedTuple):
+    before_mode: str
+    before_cycles: int
+    after_mode: str
+    after_cycles: int
+
+
+class KeyframeCurve(NamedTuple):
+    co: np.ndarray              # (keys, 2) frame and value
+    handle_left: np.ndarray     # (keys, 2)
+    handle_right: np.ndarray    # (keys, 2)
+    interpolation: np.ndarray   # (keys,) CONSTANT, LINEAR or BEZIER
+    linear_extrapolation: bool
+    cycles: Optional[Cycles]
+
+
+def read_fcurve(fcurve) -> Optional[KeyframeCurve]:
+    # Keyframes of an FCurve with one foreach_get per property.
+    # None when the curve uses something evaluate_keyframes does not reproduce.
+    if len(fcurve.sampled_points) > 0:
+        return None
+    keyframe_points = fcurve.keyframe_points
+    key_count = len(keyframe_points)
+    if key_count == 0:
+        return None
+
+    cycles = None
+    modifiers = [modifier for modifier in fcurve.modifiers if not modifier.mute]
+    if modifiers:
+        # Blender only applies a Cycles modifier that is first in the stack
+        modifier = modifiers[0]
+        if (len(modifiers) > 1
+                or modifier != fcurve.modifiers[0]
+                or modifier.type != 'CYCLES'
+                or modifier.use_restricted_range
+                or modifier.use_influence):
+            return None
+        cycles = Cycles(modifier.mode_before, modifier.cycles_before, modifier.mode_after, modifier.cycles_after)
+
+    co = np.empty(key_count * 2, dtype=np.float32)
+    handle_left = np.empty(key_count * 2, dtype=np.float32)
+    handle_right = np.empty(key_count * 2, dtype=np.float32)
+    interpolation = np.empty(key_count, dtype=np.int32)
+    keyframe_points.foreach_get('co', co)
+    keyframe_points.foreach_get('handle_left', handle_left)
+    keyframe_points.foreach_get('handle_right', handle_right)
+    keyframe_points.foreach_get('interpolation', interpolation)
+    if np.any(interpolation > BEZIER):
+        # Easing interpolations (sine, bounce, ...)
+        return None
+
+    return KeyframeCurve(co=co.reshape(-1, 2).astype(np.float64),
+                         handle_left=handle_left.reshape(-1, 2).astype(np.float64),
+                         handle_right=handle_right.reshape(-1, 2).astype(np.float64),
+                         interpolation=interpolation,
+                         linear_extrapolation=fcurve.extrapolation == 'LINEAR',
+                         cycles=cycles)
+
+
+def bezier(p0: np.ndarray, p1: np.ndarray, p2: np.ndarray, p3: np.ndarray, u: np.ndarray) -> np.ndarray:
+    v = 1.0 - u
+    return v * v * v * p0 + 3.0 * v * v * u * p1 + 3.0 * v * u * u * p2 + u * u * u * p3
+
+
+def evaluate_segments(curve: KeyframeCurve, segments: np.ndarray, frames: np.ndarray) -> np.ndarray:
+    # Frames inside segments[i] .. segments[i] + 1, with the interpolation of the segment's first key
+    start = curve.co[segments]
+    end = curve.co[segments + 1]
+    interpolation = curve.interpolation[segments]
+    values = start[:, 1].copy()
+
+    width = end[:, 0] - start[:, 0]
+    linear = (interpolation == LINEAR) & (width > 0.0)
+    factor = (frames[linear] - start[linear, 0]) / width[linear]
+    values[linear] = start[linear, 1] + factor * (end[linear, 1] - start[linear, 1])
+
+    smooth = np.flatnonzero(interpolation == BEZIER)
+    if len(smooth) > 0:
+        p0 = start[smooth]
+        p3 = end[smooth]
+        p1 = curve.handle_right[segments[smooth]].copy()
+        p2 = curve.handle_left[segments[smooth] + 1].copy()
+
+        # Handles longer than the segment are scaled down, as BKE_fcurve_correct_bezpart does
+        h1 = p0 - p1
+        h2 = p3 - p2
+        length = p3[:, 0] - p0[:, 0]
+        handle_length = np.abs(h1[:, 0]) + np.abs(h2[:, 0])
+        too_long = handle_length > length
+        fac = np.ones(len(smooth))
+        fac[too_long] = length[too_long] / handle_length[too_long]
+        p1 = p0 - fac[:, np.newaxis] * h1
+        p2 = p3 - fac[:, np.newaxis] * h2
+
+        # The corrected curve is monotonic in x, bisection finds the parameter of each frame
+        target = frames[smooth]
+        low = np.zeros(len(smooth))
+        high = np.ones(len(smooth))
+        for _ in range(BISECTION_STEPS):
+            middle = (low + high) * 0.5
+            below = bezier(p0[:, 0], p1[:, 0], p2[:, 0], p3[:, 0], middle) < target
+            low = np.where(below, middle, low)
+            high = np.where(below, high, middle)
+        values[smooth] = bezier(p0[:, 1], p1[:, 1], p2[:, 1], p3[:, 1], (low + high) * 0.5)
+    return values
+
+
+def extrapolate(curve: KeyframeCurve, endpoint: int, neighbor: int, handle: np.ndarray, frames: np.ndarray) -> np.ndarray:
+    # Outside the keyframes, as fcurve_eval_keyframes_extrapolate does
+    x, y = curve.co[endpoint]
+    interpolation = curve.interpolation[endpoint]
+    if not curve.linear_extrapolation or interpolation == CONSTANT:
+        return np.full(len(frames), y)
+    if interpolation == LINEAR:
+        if len(curve.co) == 1:
+            return np.full(len(frames), y)
+        dx = curve.co[neighbor, 0] - x
+        slope = (curve.co[neighbor, 1] - y) / dx if dx != 0.0 else 0.0
+    else:
+        dx = x - handle[endpoint, 0]
+        slope = (y - handle[endpoint, 1]) / dx if dx != 0.0 else 0.0
+    return y - slope * (x - frames)
+
+
+def cycle_frames(curve: KeyframeCurve, frames: np.ndarray):
+    # Frames mapped into the keyframe range and the value offset of each, as fcm_cycles_time does
+    offsets = np.zeros(len(frames))
+    cycles = curve.cycles
+    if cycles is None:
+        return frames, offsets
+    first_x, first_y = curve.co[0]
+    last_x, last_y = curve.co[-1]
+    width = last_x - first_x
+    if width == 0.0:
+        return frames, offsets
+
+    frames = frames.copy()
+    for side, mode, count, origin in ((-1, cycles.before_mode, cycles.before_cycles, first_x),
+                                      (1, cycles.after_mode, cycles.after_cycles, last_x)):
+        if mode == 'NONE':
+            continue
+        selected = frames < first_x if side < 0 else frames > last_x
+        time = frames[selected] - origin
+        cycle = side * time / width
+        inside = cycle < count if count > 0 else np.ones(len(time), dtype=bool)
+        remainder = np.fmod(time, width)
+
+        mapped = first_x + remainder
+        if mode == 'MIRROR':
+            mirrored = (np.trunc(cycle + 1).astype(np.int64) % 2) == 1
+            mapped = np.where(mirrored, (first_x if side < 0 else last_x) - remainder, mapped)
+        on_key = remainder == 0.0
+        if np.any(on_key):
+            at_key = np.full(len(time), last_x if side > 0 else first_x)
+            if mode == 'MIRROR':
+                at_key = np.where(np.trunc(cycle).astype(np.int64) % 2 == 1, first_x if side > 0 else last_x, at_key)
+            mapped = np.where(on_key, at_key, mapped)
+        mapped = np.where(mapped < first_x, mapped + width, mapped)
+
+        mapped_frames = frames[selected]
+        mapped_frames[inside] = mapped[inside]
+        frames[selected] = mapped_frames
+        if mode == 'REPEAT_OFFSET':
+            steps = np.floor(time / width) if side < 0 else np.ceil(time / width)
+            mapped_offsets = offsets[selected]
+            mapped_offsets[inside] = steps[inside] * (last_y - first_y)
+            offsets[selected] = mapped_offsets
+    return frames, offsets
+
+
+def evaluate_keyframes(curve: KeyframeCurve, frames: np.ndarray) -> np.ndarray:
+    # FCurve.evaluate for every frame at once
+    frames, offsets = cycle_frames(curve, np.asarray(frames, dtype=np.float64))
+    key_frames = curve.co[:, 0]
+    values = np.empty(len(frames))
+
+    before = frames <= key_frames[0]
+    after = frames >= key_frames[-1]
+    inside = ~(before | after)
+    values[before] = extrapolate(curve, 0, min(1, len(key_frames) - 1), curve.handle_left, frames[before])
+    values[after & ~before] = extrapolate(curve, len(key_frames) - 1, max(0, len(key_frames) - 2), curve.handle_right, frames[after & ~before])
+    if np.any(inside):
+        segments = np.searchsorted(key_frames, frames[inside], side='right') - 1
+        values[inside] = evaluate_segments(curve, segments, frames[inside])
+    return values + offsets
@@ -0,0 +1,251 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from .ogre_codec.mesh import VES_POSITION, read_mesh
+    from .ogre_codec.serializer import read_file
+    from .ogre_codec.skeleton import SkeletonReader
+except ImportError:
+    # Run as a script. The add-on package imports bpy, so ogre_codec is imported on its own
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from ogre_codec.mesh import VES_POSITION, read_mesh
+    from ogre_codec.serializer import read_file
+    from ogre_codec.skeleton import SkeletonReader
+
+
+EXTENSIONS = ('.mesh', '.skeleton', '.xml')
+
+# Skeleton file names found by the scan, lower case name -> path. Set in each worker process
+_skeleton_index: Dict[str, str] = {}
+
+
+def find_files(paths: Iterable[str]) -> List[str]:
+    filepaths = []
+    for path in paths:
+        if os.path.isfile(path):
+            filepaths.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            filepaths.extend(os.path.join(root, file) for file in sorted(files) if file.lower().endswith(EXTENSIONS))
+    return filepaths
+
+
+def init_worker(skeleton_index: Dict[str, str]):
+    global _skeleton_index
+    _skeleton_index = skeleton_index
+
+
+@lru_cache(maxsize=1024)
+def list_folder(folder: str) -> Dict[str, str]:
+    return {filename.lower(): filename for filename in os.listdir(folder)}
+
+
+def find_skeleton(mesh_path: str, skeleton_name: str) -> Optional[str]:
+    # Next to the mesh first, as the importer does, then anywhere in the scanned folders.
+    # Names are matched without case, as OGRE does on Windows.
+    folder = os.path.dirname(os.path.abspath(mesh_path))
+    filename = list_folder(folder).get(os.path.basename(skeleton_name).lower())
+    if filename is not None:
+        return os.path.join(folder, filename)
+    return _skeleton_index.get(os.path.basename(skeleton_name).lower())
+
+
+@lru_cache(maxsize=64)
+def skeleton_handles(filepath: str) -> FrozenSet[int]:
+    return frozenset(bone.id for bone in SkeletonReader(read_file(filepath)).read().bones)
+
+
+def new_record(filepath: str, kind: str) -> Dict[str, Any]:
+    return {'path': filepath, 'type': kind, 'size': os.path.getsize(filepath), 'error': ''}
+
+
+def inspect_mesh(filepath: str) -> Dict[str, Any]:
+    record = new_record(filepath, 'mesh')
+    mesh = read_mesh(read_file(filepath), os.path.basename(filepath), lazy=True)
+    summary = mesh.summary()
+    submeshes = mesh.get_submeshes()
+
+    shared_vertices = mesh.shared_geometry.vertex_count if mesh.shared_geometry is not None else 0
+    record['version'] = summary['version']
+    record['submeshes'] = len(submeshes)
+    record['vertices'] = shared_vertices + sum(item['vertex_count'] for item in summary['submeshes'] if not item['use_shared_vertices'])
+    record['faces'] = sum(submesh.face_count for submesh in submeshes)
+    record['index_32bit_submeshes'] = sum(item['use_32bit_indexes'] for item in summary['submeshes'])
+    record['materials'] = ';'.join(sorted({item['material'] for item in summary['submeshes']}))
+
+    bounds = mesh.bounds
+    if bounds is None:
+        positions = [submesh.geometry.read_element(submesh.geometry.find_elements(VES_POSITION)[0])[:, :3]
+                     for submesh in submeshes
+                     if submesh.geometry.vertex_count > 0 and submesh.geometry.has_positions]
+        if positions:
+            positions = np.concatenate(positions)
+            bounds = (positions.min(axis=0).tolist(), positions.max(axis=0).tolist(), 0.0)
+    if bounds is not None:
+        for axis, value in zip('xyz', bounds[0]):
+            record[f'min_{axis}'] = value
+        for axis, value in zip('xyz', bounds[1]):
+            record[f'max_{axis}'] = value
+
+    # Shared assignments are counted once, not once per submesh using them
+    assignments = [mesh.shared_bone_assignments['bone']]
+    assignments.extend(submesh.bone_assignment_array['bone'] for submesh in submeshes if not submesh.use_shared_vertices)
+    bones = np.concatenate(assignments)
+    record['bone_assignments'] = len(bones)
+
+    skeleton_name = summary['skeleton']
+    record['skeleton'] = skeleton_name
+    record['skeleton_missing'] = False
+    record['invalid_bone_references'] = 0
+    if skeleton_name:
+        skeleton_path = find_skeleton(filepath, skeleton_name)
+        record['skeleton_missing'] = skeleton_path is None
+        if skeleton_path is not None:
+            handles = np.fromiter(skeleton_handles(skeleton_path), dtype=np.int64)
+            record['invalid_bone_references'] = int(np.count_nonzero(~np.isin(bones, handles)))
+    else:
+        # Weights without a skeleton have nothing to refer to
+        record['invalid_bone_references'] = len(bones)
+    return record
+
+
+def inspect_skeleton(filepath: str) -> Dict[str, Any]:
+    record = new_record(filepath, 'skeleton')
+    reader = SkeletonReader(read_file(filepath), os.path.basename(filepath))
+    skeleton = reader.read()
+    record['version'] = skeleton.version.name
+    record['bones'] = len(skeleton.bones)
+    record['animations'] = len(skeleton.animations)
+    record['tracks'] = sum(len(animation.tracks) for animation in skeleton.animations)
+    record['keyframes'] = sum(len(keys) for animation in skeleton.animations for keys in animation.tracks.values())
+    record['animation_length'] = max((animation.length for animation in skeleton.animations), default=0.0)
+    record['invalid_bone_references'] = len(reader.unknown_handles)
+    return record
+
+
+def read_collision(filepath: str) -> ET.Element:
+    # Same fix up of stray ampersands as physx_importer.open_file
+    with open(filepath, encoding='utf-8', errors='replace') as f:
+        xml_text = f.read()
+    return ET.fromstring(re.sub(r'&(?!amp;)', '&amp;', xml_text))
+
+
+def inspect_collision(filepath: str) -> Dict[str, Any]:
+    record = new_record(filepath, 'collision')
+    root = read_collision(filepath)
+    physics = root.find('NxuPhysicsCollection')
+    scene = root.find('NxuPhysicsCollection/NxSceneDesc')
+    if physics is None or scene is None:
+        record['error'] = 'Not a PhysX collision file'
+        return record
+
+    actors = scene.findall('NxActorDesc')
+    shapes = {'box': 'NxBoxShapeDesc', 'sphere': 'NxSphereShapeDesc', 'capsule': 'NxCapsuleShapeDesc',
+              'convex': 'NxConvexShapeDesc', 'triangle_mesh': 'NxTriangleMeshShapeDesc'}
+    record['actors'] = len(actors)
+    for name, tag in shapes.items():
+        record[f'{name}_shapes'] = sum(len(actor.findall(tag)) for actor in actors)
+
+    # Mesh shapes refer to mesh descriptions by id, cooked only meshes need PhysX to read
+    mesh_ids = {desc.get('id') for tag in ('NxConvexMeshDesc', 'NxTriangleMeshDesc') for desc in physics.findall(tag)}
+    references = [shape.get('meshData') for actor in actors for tag in ('NxConvexShapeDesc', 'NxTriangleMeshShapeDesc')
+                  for shape in actor.findall(tag)]
+    record['invalid_mesh_references'] = sum(reference not in mesh_ids for reference in references)
+
+    points = []
+    cooked = 0
+    for desc in physics.findall('NxConvexMeshDesc') + physics.findall('NxTriangleMeshDesc'):
+        xml_points = desc.find('points' if desc.tag == 'NxConvexMeshDesc' else 'NxSimpleTriangleMesh/points')
+        text = xml_points.text if xml_points is not None else None
+        if text and text.strip():
+            points.append(np.array(text.split(), dtype=np.float64).reshape(-1, 3))
+        elif desc.find('cookedData') is not None:
+            cooked += 1
+    record['cooked_meshes'] = cooked
+    record['vertices'] = sum(len(values) for values in points)
+    if points:
+        # Mesh local space, actor poses are not applied
+        points = np.concatenate(points)
+        for axis, value in zip('xyz', points.min(axis=0).tolist()):
+            record[f'min_{axis}'] = value
+        for axis, value in zip('xyz', points.max(axis=0).tolist()):
+            record[f'max_{axis}'] = value
+    return record
+
+
+def inspect_file(filepath: str) -> Dict[str, Any]:
+    extension = os.path.splitext(filepath)[1].lower()
+    inspect = {'.mesh': inspect_mesh, '.skeleton': inspect_skeleton, '.xml': inspect_collision}[extension]
+    try:
+        return inspect(filepath)
+    except Exception as e:
+        record = new_record(filepath, extension[1:])
+        record['error'] = f'{type(e).__name__}: {e}'
+        return record
+
+
+def has_issues(record: Dict[str, Any]) -> bool:
+    return bool(record['error']
+                or record.get('skeleton_missing')
+                or record.get('invalid_bone_references')
+                or record.get('invalid_mesh_references'))
+
+
+def write_json(records: List[Dict[str, Any]], stream):
+    json.dump(records, stream, indent=1, ensure_ascii=False)
+    stream.write('\n')
+
+
+def write_csv(records: List[Dict[str, Any]], stream):
+    # One table for every file type, columns a file type does not have are left empty
+    fieldnames = list(dict.fromkeys(key for record in records for key in record))
+    writer = csv.DictWriter(stream, fieldnames=fieldnames, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(records)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Inspect Kenshi .mesh, .skeleton and collision .xml files without Blender')
+    parser.add_argument('paths', nargs='+', help='files or folders, folders are searched recursively')
+    parser.add_argument('-f', '--format', choices=('json', 'csv'), default='json')
+    parser.add_argument('-o', '--output', help='write to this file instead of standard output')
+    parser.add_argument('-j', '--workers', type=int, default=0, help='worker processes, 0 uses every CPU core')
+    parser.add_argument('--issues-only', action='store_true', help='only list files with errors or invalid references')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    filepaths = find_files(args.paths)
+    skeleton_index = {os.path.basename(filepath).lower(): filepath for filepath in filepaths if filepath.lower().endswith('.skeleton')}
+    workers = args.workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(skeleton_index,)) as executor:
+        records = list(executor.map(inspect_file, filepaths, chunksize=max(1, min(64, len(filepaths) // (workers * 4)))))
+
+    failed = sum(bool(record['error']) for record in records)
+    issues = sum(has_issues(record) for record in records)
+    if args.issues_only:
+        records = [record for record in records if has_issues(record)]
+
+    write = write_json if args.format == 'json' else write_csv
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            write(records, f)
+    else:
+        write(records, sys.stdout)
+    print(f'{len(filepaths)} files, {issues} with issues, {failed} failed in {time.perf_counter() - start:.1f} s', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+
+from itertools import product
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class WeldResult(NamedTuple):
+    vertex_map: np.ndarray      # original vertex -> welded vertex
+    vertex_indices: np.ndarray  # welded vertex -> original vertex kept in its place
+    faces: np.ndarray           # (faces, 3) welded vertex indices of the kept faces
+    face_indices: np.ndarray    # kept face -> original face
+    loop_indices: np.ndarray    # kept loop -> original loop
+
+
+def no_weld(vertex_count: int, faces: np.ndarray) -> WeldResult:
+    faces = np.asarray(faces, dtype=np.int32).reshape(-1, 3)
+    return WeldResult(vertex_map=np.arange(vertex_count, dtype=np.int32),
+                      vertex_indices=np.arange(vertex_count, dtype=np.int32),
+                      faces=faces,
+                      face_indices=np.arange(len(faces), dtype=np.int32),
+                      loop_indices=np.arange(faces.size, dtype=np.int32))
+
+
+def close_pairs(positions: np.ndarray, threshold: float, groups: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    # Every pair (i < j) of vertices at most threshold apart, and in the same group.
+    # Vertices are hashed into cells of the threshold size, so a pair lies in the same or a neighbouring cell.
+    cells = np.floor(positions / threshold).astype(np.int64)
+    if groups is not None:
+        cells = np.column_stack([cells, groups])
+    low = cells.min(axis=0) - 1
+    spans = cells.max(axis=0) - low + 2
+    if np.prod(spans.astype(np.float64)) < 2 ** 62:
+        strides = np.cumprod(np.r_[spans[1:][::-1], 1])[::-1]
+        cell_key = lambda rows: (rows - low) @ strides
+    else:
+        # Too spread out for one integer key, rows are compared column by column
+        row_type = np.dtype([(f'f{column}', np.int64) for column in range(cells.shape[1])])
+        cell_key = lambda rows: np.ascontiguousarray(rows).view(row_type).reshape(-1)
+    keys = cell_key(cells)
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    cell_keys = sorted_keys[starts]
+    cell_rows = cells[order[starts]]
+    # Half of the 26 neighbours, the other half gives the same pairs the other way round
+    offsets = [offset for offset in product((-1, 0, 1), repeat=3) if offset > (0, 0, 0)] + [(0, 0, 0)]
+    first_pairs = []
+    second_pairs = []
+    for offset in offsets:
+        neighbour_keys = cell_key(cell_rows + np.array(offset + (0,) * (cells.shape[1] - 3)))
+        found = np.minimum(np.searchsorted(cell_keys, neighbour_keys), len(cell_keys) - 1)
+        cell_a = np.flatnonzero(cell_keys[found] == neighbour_keys)
+        cell_b = found[cell_a]
+        sizes = counts[cell_a] * counts[cell_b]
+        pair_cells = np.repeat(np.arange(len(cell_a)), sizes)
+        local = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        width = counts[cell_b][pair_cells]
+        first = order[starts[cell_a][pair_cells] + local // width]
+        second = order[starts[cell_b][pair_cells] + local % width]
+        keep = first < second if offset == offsets[-1] else first != second
+        first_pairs.append(np.minimum(first, second)[keep])
+        second_pairs.append(np.maximum(first, second)[keep])
+    first = np.concatenate(first_pairs)
+    second = np.concatenate(second_pairs)
+    close = ((positions[first] - positions[second]) ** 2).sum(axis=1) <= threshold * threshold
+    return first[close], second[close]
+
+
+def exact_duplicates(positions: np.ndarray, groups: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    # The lowest index of every distinct vertex in index order, and for each vertex the entry it duplicates.
+    columns = [positions[:, axis] for axis in range(3)] + ([groups] if groups is not None else [])
+    order = np.lexsort(columns[::-1])
+    rows = np.column_stack(columns)[order]
+    new_row = np.r_[True, (rows[1:] != rows[:-1]).any(axis=1)]
+    firsts = order[new_row]
+    distinct_order = np.argsort(firsts)
+    rank = np.empty(len(firsts), dtype=np.int64)
+    rank[distinct_order] = np.arange(len(firsts))
+    inverse = np.empty(len(positions), dtype=np.int64)
+    inverse[order] = rank[np.cumsum(new_row) - 1]
+    return firsts[distinct_order], inverse
+
+
+def keep_face_groups(positions: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    # Faces that share a centre with an earlier face are welded separately so double-sided faces survive.
+    # A vertex belongs to the group of the last face that uses it.
+    vertex_count = len(positions)
+    centers = np.round(positions[faces].mean(axis=1), 2)
+    is_first = np.zeros(len(faces), dtype=bool)
+    if len(faces) > 0:
+        _, first = np.unique(centers, axis=0, return_index=True)
+        is_first[first] = True
+
+    last_loop = np.full(vertex_count, -1, dtype=np.int64)
+    np.maximum.at(last_loop, faces.reshape(-1), np.arange(faces.size, dtype=np.int64))
+    used = last_loop >= 0
+    groups = np.ones(vertex_count, dtype=np.int64)
+    groups[used] = np.where(is_first[last_loop[used] // 3], 0, 1)
+    return groups
+
+
+def weld_vertices(
+        positions: np.ndarray,
+        faces: np.ndarray,
+        threshold: float = 0.0001,
+        groups: Optional[np.ndarray] = None) -> WeldResult:
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    faces = np.asarray(faces, dtype=np.int32).reshape(-1, 3)
+    vertex_count = len(positions)
+    if vertex_count == 0:
+        return no_weld(vertex_count, faces)
+
+    # As remove_doubles, in index order a vertex is kept unless a kept vertex lies within the threshold,
+    # then it merges into the first such vertex. Merges are not chained, a merged vertex attracts nothing.
+    # An exact duplicate ends up where its first copy does, so only distinct vertices are compared.
+    distinct, duplicate_of = exact_duplicates(positions, groups)
+    first, second = close_pairs(positions[distinct], threshold, None if groups is None else groups[distinct])
+    order = np.argsort(second * len(distinct) + first)
+    first = first[order]
+    second = second[order]
+    labels = np.arange(len(distinct), dtype=np.int64)
+    merged = np.zeros(len(distinct), dtype=bool)
+    unresolved = np.zeros(len(distinct), dtype=bool)
+    unresolved[second] = True
+    while unresolved.any():
+        # The lowest neighbour that has not merged decides: none left keeps the vertex, a kept one takes it,
+        # an undecided one makes it wait. A clique is decided in one pass.
+        pairs = unresolved[second] & ~merged[first]
+        first = first[pairs]
+        second = second[pairs]
+        lowest = np.diff(second, prepend=-1) != 0
+        candidate = first[lowest]
+        vertex = second[lowest]
+        has_candidate = np.zeros(len(distinct), dtype=bool)
+        has_candidate[vertex] = True
+        unresolved &= has_candidate
+        joins = ~unresolved[candidate]
+        labels[vertex[joins]] = candidate[joins]
+        merged[vertex[joins]] = True
+        unresolved[vertex[joins]] = False
+    labels = distinct[labels][duplicate_of]
+
+    vertex_indices = np.unique(labels)
+    vertex_map = np.searchsorted(vertex_indices, labels).astype(np.int32)
+
+    welded = vertex_map[faces]
+    degenerate = ((welded[:, 0] == welded[:, 1])
+                  | (welded[:, 1] == welded[:, 2])
+                  | (welded[:, 2] == welded[:, 0]))
+    candidates = np.flatnonzero(~degenerate)
+    face_indices = candidates
+    if len(candidates) > 0:
+        # Faces left with the same vertices are doubles, keep the first one
+        _, first = np.unique(np.sort(welded[candidates], axis=1), axis=0, return_index=True)
+        face_indices = np.sort(candidates[first])
+
+    loop_indices = (face_indices[:, np.newaxis] * 3 + np.arange(3)).reshape(-1)
+    return WeldResult(vertex_map=vertex_map,
+                      vertex_indices=vertex_indices.astype(np.int32),
+                      faces=welded[face_indices],
+                      face_indices=face_indices.astype(np.int32),
+                      loop_indices=loop_indices.astype(np.int32))
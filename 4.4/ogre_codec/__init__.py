@@ -0,0 +1,42 @@
+# Pure Python reader and writer for OGRE binary files, used where the kenshi_blender_tool wheel is not available
+
+from .chunks import OgreFormatError
+from .mesh import GeometryData, MeshData, SubMeshData, read_mesh
+from .serializer import KenshiObjectSerializer
+from .skeleton import AnimationData, BlenderAnimationTrack, SkeletonData, read_skeleton
+from .types import (
+    BoneAssignmentData,
+    BoneData,
+    Matrix3,
+    MeshVersion,
+    OgreQuaternion,
+    OperationType,
+    SkeletonVersion,
+    Vector3,
+    VertexGroupData,
+)
+from .writer import write_mesh, write_skeleton
+
+__all__ = [
+    'AnimationData',
+    'BlenderAnimationTrack',
+    'BoneAssignmentData',
+    'BoneData',
+    'GeometryData',
+    'KenshiObjectSerializer',
+    'Matrix3',
+    'MeshData',
+    'MeshVersion',
+    'OgreFormatError',
+    'OgreQuaternion',
+    'OperationType',
+    'SkeletonData',
+    'SkeletonVersion',
+    'SubMeshData',
+    'Vector3',
+    'VertexGroupData',
+    'read_mesh',
+    'read_skeleton',
+    'write_mesh',
+    'write_skeleton',
+]
@@ -0,0 +1,148 @@
+
+import struct
+from typing import Tuple
+
+import numpy as np
+
+
+M_HEADER = 0x1000
+M_MESH = 0x3000
+M_SUBMESH = 0x4000
+M_SUBMESH_OPERATION = 0x4010
+M_SUBMESH_BONE_ASSIGNMENT = 0x4100
+M_SUBMESH_TEXTURE_ALIAS = 0x4200
+M_GEOMETRY = 0x5000
+M_GEOMETRY_VERTEX_DECLARATION = 0x5100
+M_GEOMETRY_VERTEX_ELEMENT = 0x5110
+M_GEOMETRY_VERTEX_BUFFER = 0x5200
+M_GEOMETRY_VERTEX_BUFFER_DATA = 0x5210
+M_MESH_SKELETON_LINK = 0x6000
+M_MESH_BONE_ASSIGNMENT = 0x7000
+M_MESH_LOD = 0x8000
+M_MESH_BOUNDS = 0x9000
+M_SUBMESH_NAME_TABLE = 0xA000
+M_SUBMESH_NAME_TABLE_ELEMENT = 0xA100
+M_EDGE_LISTS = 0xB000
+M_POSES = 0xC000
+M_POSE = 0xC100
+M_POSE_VERTEX = 0xC111
+M_ANIMATIONS = 0xD000
+M_TABLE_EXTREMES = 0xE000
+
+SKELETON_HEADER = 0x1000
+SKELETON_BLENDMODE = 0x1010
+SKELETON_BONE = 0x2000
+SKELETON_BONE_PARENT = 0x3000
+SKELETON_ANIMATION = 0x4000
+SKELETON_ANIMATION_BASEINFO = 0x4010
+SKELETON_ANIMATION_TRACK = 0x4100
+SKELETON_ANIMATION_TRACK_KEYFRAME = 0x4110
+SKELETON_ANIMATION_LINK = 0x5000
+
+CHUNK_HEADER_SIZE = 6
+
+_uint16 = struct.Struct('<H')
+_uint32 = struct.Struct('<I')
+_float = struct.Struct('<f')
+_chunk_header = struct.Struct('<HI')
+
+
+class OgreFormatError(Exception):
+    pass
+
+
+class ChunkReader:
+    # Little endian OGRE chunk stream over any buffer (bytes, mmap, memoryview)
+    def __init__(self, buffer, position: int = 0, end: int = None):
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.position = position
+        self.end = len(self.view) if end is None else end
+
+    def eof(self) -> bool:
+        return self.position >= self.end
+
+    def remaining(self) -> int:
+        return self.end - self.position
+
+    def read_chunk(self) -> Tuple[int, int]:
+        # Chunk id and length, the length includes the 6 byte header
+        chunk_id, length = _chunk_header.unpack_from(self.view, self.position)
+        self.position += CHUNK_HEADER_SIZE
+        return chunk_id, length
+
+    def backpedal_chunk_header(self):
+        self.position -= CHUNK_HEADER_SIZE
+
+    def skip(self, size: int):
+        self.position += size
+
+    def read_string(self) -> bytes:
+        # Strings are terminated by a line feed
+        end = self.buffer.find(b'\n', self.position, self.end)
+        if end < 0:
+            end = self.end
+        value = bytes(self.view[self.position:end])
+        self.position = end + 1
+        return value
+
+    def read_bool(self) -> bool:
+        value = self.view[self.position] != 0
+        self.position += 1
+        return value
+
+    def read_uint16(self) -> int:
+        value, = _uint16.unpack_from(self.view, self.position)
+        self.position += 2
+        return value
+
+    def read_uint32(self) -> int:
+        value, = _uint32.unpack_from(self.view, self.position)
+        self.position += 4
+        return value
+
+    def read_float(self) -> float:
+        value, = _float.unpack_from(self.view, self.position)
+        self.position += 4
+        return value
+
+    def read_floats(self, count: int) -> Tuple[float, ...]:
+        values = struct.unpack_from(f'<{count}f', self.view, self.position)
+        self.position += 4 * count
+        return values
+
+    def read_array(self, dtype, count: int) -> np.ndarray:
+        # Read-only view into the buffer, no copy
+        dtype = np.dtype(dtype)
+        array = np.frombuffer(self.buffer, dtype=dtype, count=count, offset=self.position)
+        self.position += dtype.itemsize * count
+        return array
+
+    def peek_chunk(self) -> Tuple[int, int]:
+        if self.remaining() < CHUNK_HEADER_SIZE:
+            return -1, 0
+        return _chunk_header.unpack_from(self.view, self.position)
+
+    def read_chunk_run(self, chunk_id: int, record: np.dtype, check_length: bool = False) -> np.ndarray:
+        # Consecutive chunks of one id with a fixed size record, e.g. bone assignments.
+        # They are viewed as one structured array instead of being read one by one.
+        # check_length also ends the run at a chunk of another size.
+        dtype = np.dtype([('id', '<u2'), ('length', '<u4'), ('record', record)])
+        available = self.remaining() // dtype.itemsize
+        count = 0
+        window = 1024
+        while count < available:
+            size = min(window, available - count)
+            chunks = np.frombuffer(self.buffer, dtype=dtype, count=size, offset=self.position + count * dtype.itemsize)
+            different = chunks['id'] != chunk_id
+            if check_length:
+                different |= chunks['length'] != dtype.itemsize
+            mismatch = np.flatnonzero(different)
+            if len(mismatch) > 0:
+                count += int(mismatch[0])
+                break
+            count += size
+            window *= 2
+        records = np.frombuffer(self.buffer, dtype=dtype, count=count, offset=self.position)['record']
+        self.position += dtype.itemsize * count
+        return records
@@ -0,0 +1,845 @@
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .chunks import *
+from .types import BoneAssignmentData, BoneData, OperationType, VertexGroupData
+
+
+MESH_VERSIONS = {
+    b'[MeshSerializer_v1.100]': (1, 10),
+    b'[MeshSerializer_v1.8]': (1, 8),
+    b'[MeshSerializer_v1.41]': (1, 7),
+    b'[MeshSerializer_v1.40]': (1, 4),
+    b'[MeshSerializer_v1.30]': (1, 0),
+}
+
+# VertexElementSemantic
+VES_POSITION = 1
+VES_BLEND_WEIGHTS = 2
+VES_BLEND_INDICES = 3
+VES_NORMAL = 4
+VES_DIFFUSE = 5
+VES_SPECULAR = 6
+VES_TEXTURE_COORDINATES = 7
+VES_BINORMAL = 8
+VES_TANGENT = 9
+
+# VertexElementType -> (numpy type, component count)
+VERTEX_ELEMENT_TYPES = {
+    0: ('<f4', 1), 1: ('<f4', 2), 2: ('<f4', 3), 3: ('<f4', 4),
+    4: ('u1', 4),
+    5: ('<i2', 1), 6: ('<i2', 2), 7: ('<i2', 3), 8: ('<i2', 4),
+    9: ('u1', 4),
+    10: ('u1', 4), 11: ('u1', 4),
+    12: ('<f8', 1), 13: ('<f8', 2), 14: ('<f8', 3), 15: ('<f8', 4),
+    16: ('<u2', 1), 17: ('<u2', 2), 18: ('<u2', 3), 19: ('<u2', 4),
+    20: ('<i4', 1), 21: ('<i4', 2), 22: ('<i4', 3), 23: ('<i4', 4),
+    24: ('<u4', 1), 25: ('<u4', 2), 26: ('<u4', 3), 27: ('<u4', 4),
+}
+VET_COLOUR = 4
+VET_COLOUR_ARGB = 10
+VET_COLOUR_ABGR = 11
+
+BONE_ASSIGNMENT_RECORD = np.dtype([('vertex', '<u4'), ('bone', '<u2'), ('weight', '<f4')])
+POSE_VERTEX_RECORD = np.dtype([('vertex', '<u4'), ('offset', '<f4', 3)])
+POSE_VERTEX_NORMAL_RECORD = np.dtype([('vertex', '<u4'), ('offset', '<f4', 3), ('normal', '<f4', 3)])
+
+NO_BONE_ID = 0xFFFF
+
+MESH_CHILDREN = (M_GEOMETRY, M_SUBMESH, M_MESH_SKELETON_LINK, M_MESH_BONE_ASSIGNMENT, M_MESH_LOD, M_MESH_BOUNDS,
+                 M_SUBMESH_NAME_TABLE, M_EDGE_LISTS, M_POSES, M_ANIMATIONS, M_TABLE_EXTREMES)
+
+
+def to_blender_space(vectors: np.ndarray) -> np.ndarray:
+    # OGRE is Y up, Blender is Z up. Reads strided views straight into one new array.
+    vectors = np.asarray(vectors)
+    converted = np.empty((len(vectors), 3), dtype=np.float32)
+    converted[:, 0] = vectors[:, 0]
+    np.negative(vectors[:, 2], out=converted[:, 1], casting='unsafe')
+    converted[:, 2] = vectors[:, 1]
+    return converted
+
+
+def to_ogre_space(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, 3)
+    return np.column_stack((vectors[:, 0], vectors[:, 2], -vectors[:, 1]))
+
+
+class VertexElement:
+    __slots__ = ('source', 'type', 'semantic', 'offset', 'index')
+
+    def __init__(self, source: int, type: int, semantic: int, offset: int, index: int):
+        self.source = source
+        self.type = type
+        self.semantic = semantic
+        self.offset = offset
+        self.index = index
+
+
+class GeometryData:
+    # Vertex declaration and buffers of one vertex data block.
+    # vertex_indices selects the vertices of a submesh that uses the shared geometry.
+    def __init__(
+            self,
+            vertex_count: int = 0,
+            elements: List[VertexElement] = None,
+            buffers: Dict[int, Tuple[np.ndarray, int]] = None,
+            vertex_indices: Optional[np.ndarray] = None):
+        self._vertex_count = vertex_count
+        self.elements = elements if elements is not None else []
+        self.buffers = buffers if buffers is not None else {}
+        self.vertex_indices = vertex_indices
+
+    def select(self, vertex_indices: np.ndarray) -> 'GeometryData':
+        return GeometryData(self._vertex_count, self.elements, self.buffers, vertex_indices)
+
+    def find_elements(self, semantic: int) -> List[VertexElement]:
+        return sorted((element for element in self.elements if element.semantic == semantic),
+                      key=lambda element: element.index)
+
+    def read_element(self, element: VertexElement) -> np.ndarray:
+        # Strided view over the interleaved buffer, (vertices, components)
+        buffer, vertex_size = self.buffers[element.source]
+        base_type, components = VERTEX_ELEMENT_TYPES[element.type]
+        dtype = np.dtype({'names': ['value'],
+                          'formats': [(base_type, (components,))],
+                          'offsets': [element.offset],
+                          'itemsize': vertex_size})
+        values = np.frombuffer(buffer, dtype=dtype, count=self._vertex_count)['value']
+        if self.vertex_indices is not None:
+            values = values[self.vertex_indices]
+        return values
+
+    def read_vectors(self, semantic: int) -> Optional[np.ndarray]:
+        elements = self.find_elements(semantic)
+        if len(elements) == 0:
+            return None
+        return to_blender_space(self.read_element(elements[0])[:, :3])
+
+    def read_colors(self) -> Optional[np.ndarray]:
+        # RGBA in 0-1
+        elements = self.find_elements(VES_DIFFUSE)
+        if len(elements) == 0:
+            return None
+        element = elements[0]
+        values = self.read_element(element)
+        if element.type == VET_COLOUR_ABGR:
+            rgba = values
+        else:
+            rgba = values[:, [2, 1, 0, 3]]
+        return rgba.astype(np.float32) / 255.0
+
+    @property
+    def has_positions(self) -> bool:
+        return len(self.find_elements(VES_POSITION)) > 0
+
+    @property
+    def has_normals(self) -> bool:
+        return len(self.find_elements(VES_NORMAL)) > 0
+
+    @property
+    def has_colors(self) -> bool:
+        return len(self.find_elements(VES_DIFFUSE)) > 0
+
+    @property
+    def has_texture_coord(self) -> bool:
+        return len(self.find_elements(VES_TEXTURE_COORDINATES)) > 0
+
+    @property
+    def has_tangents(self) -> bool:
+        return len(self.find_elements(VES_TANGENT)) > 0
+
+    @property
+    def has_binormals(self) -> bool:
+        return len(self.find_elements(VES_BINORMAL)) > 0
+
+    @property
+    def has_shared_geometry(self) -> bool:
+        return self.vertex_indices is not None
+
+    @property
+    def tangent_dimensions(self) -> int:
+        elements = self.find_elements(VES_TANGENT)
+        return VERTEX_ELEMENT_TYPES[elements[0].type][1] if elements else 0
+
+    @property
+    def texcoords_size(self) -> int:
+        return len(self.find_elements(VES_TEXTURE_COORDINATES))
+
+    @property
+    def vertex_count(self) -> int:
+        if self.vertex_indices is not None:
+            return len(self.vertex_indices)
+        return self._vertex_count
+
+
+class Pose:
+    __slots__ = ('name', 'target', 'vertices', 'offsets')
+
+    def __init__(self, name: str, target: int, vertices: np.ndarray, offsets: np.ndarray):
+        self.name = name
+        self.target = target
+        self.vertices = vertices
+        self.offsets = offsets
+
+
+def mapping_from(bone_mapping: Union[List[BoneData], Dict[int, str]]) -> Dict[int, str]:
+    if isinstance(bone_mapping, dict):
+        return dict(bone_mapping)
+    return {bone.id: bone.name for bone in bone_mapping}
+
+
+class SubMeshData:
+    def __init__(self):
+        self.index = 0
+        self.submesh_name = ''
+        self.material = ''
+        self.use_32bit_indexes = False
+        self.use_shared_vertices = False
+        self._operation_type = OperationType.triangle_list
+        self._indices = np.empty(0, dtype=np.int32)
+        self._faces: Optional[np.ndarray] = None
+        self._bone_assignment_array = np.empty(0, dtype=BONE_ASSIGNMENT_RECORD)
+        self._poses: List[Pose] = []
+        # Set by a lazy MeshReader, decodes the rest of the submesh on first use
+        self._loader: Optional[Callable[['SubMeshData'], None]] = None
+        self.bone_mapping: Dict[int, str] = {}
+        self.vertex_sources = np.empty(0, dtype=np.int32)
+        self._name = b''
+        self._material = b''
+        self._geometry = GeometryData()
+
+    @property
+    def encorded_name(self) -> bytes:
+        return self._name or self.submesh_name.encode('utf-8')
+
+    @property
+    def encorded_material(self) -> bytes:
+        return self._material or self.material.encode('utf-8')
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loader is None
+
+    def load(self):
+        loader = self._loader
+        if loader is not None:
+            loader(self)
+
+    @property
+    def geometry(self) -> GeometryData:
+        self.load()
+        return self._geometry
+
+    @property
+    def indices(self) -> np.ndarray:
+        self.load()
+        return self._indices
+
+    @indices.setter
+    def indices(self, indices: np.ndarray):
+        self._indices = indices
+        self._faces = None
+
+    @property
+    def operation_type(self) -> int:
+        self.load()
+        return self._operation_type
+
+    @operation_type.setter
+    def operation_type(self, operation_type: int):
+        self._operation_type = operation_type
+        self._faces = None
+
+    @property
+    def bone_assignment_array(self) -> np.ndarray:
+        self.load()
+        return self._bone_assignment_array
+
+    @bone_assignment_array.setter
+    def bone_assignment_array(self, bone_assignment_array: np.ndarray):
+        self._bone_assignment_array = bone_assignment_array
+
+    @property
+    def poses(self) -> List[Pose]:
+        self.load()
+        return self._poses
+
+    @poses.setter
+    def poses(self, poses: List[Pose]):
+        self._poses = poses
+
+    @property
+    def faces(self) -> np.ndarray:
+        # Triangle list as int32, built once from the index buffer
+        if self._faces is None:
+            self._faces = triangulate(self.indices, self.operation_type)
+        return self._faces
+
+    @property
+    def face_count(self) -> int:
+        return len(self.faces) // 3
+
+    @property
+    def boneassignments(self) -> List[BoneAssignmentData]:
+        return [BoneAssignmentData(int(vertex), int(bone), float(weight))
+                for vertex, bone, weight in self.bone_assignment_array.tolist()]
+
+    def get_positions(self) -> np.ndarray:
+        positions = self.geometry.read_vectors(VES_POSITION)
+        if positions is None:
+            return np.zeros((self.geometry.vertex_count, 3), dtype=np.float32)
+        return positions
+
+    def get_normals(self) -> np.ndarray:
+        # Per loop, like the other corner attributes
+        normals = self.geometry.read_vectors(VES_NORMAL)
+        if normals is None:
+            return np.empty((0, 3), dtype=np.float32)
+        return normals[self.faces]
+
+    def get_texcoords(self) -> np.ndarray:
+        # (layers, loops, 2) with V flipped for Blender
+        faces = self.faces
+        elements = self.geometry.find_elements(VES_TEXTURE_COORDINATES)
+        texcoords = np.zeros((len(elements), len(faces), 2), dtype=np.float32)
+        for layer, element in enumerate(elements):
+            values = self.geometry.read_element(element)[:, :2]
+            texcoords[layer, :, :values.shape[1]] = values[faces]
+            np.subtract(1.0, texcoords[layer, :, 1], out=texcoords[layer, :, 1])
+        return texcoords
+
+    def get_colors(self, is_rgba: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        # Per loop colours and alphas, both RGBA so they can go to BYTE_COLOR attributes
+        faces = self.faces
+        rgba = self.geometry.read_colors()
+        if rgba is None:
+            rgba = np.ones((self.geometry.vertex_count, 4), dtype=np.float32)
+        rgba = rgba[faces]
+        if not is_rgba:
+            rgba = rgba[:, [2, 1, 0, 3]]
+        colors = rgba.copy()
+        colors[:, 3] = 1.0
+        alphas = np.ones_like(rgba)
+        alphas[:, :3] = rgba[:, 3:4]
+        return colors, alphas
+
+    def get_shapekeys(self) -> List[Tuple[str, np.ndarray]]:
+        # Absolute positions for each pose
+        if len(self.poses) == 0:
+            return []
+        positions = self.geometry.read_element(self.geometry.find_elements(VES_POSITION)[0])[:, :3]
+        shape_keys = []
+        for pose in self.poses:
+            shape = np.array(positions, dtype=np.float32)
+            shape[pose.vertices] += pose.offsets
+            shape_keys.append((pose.name, to_blender_space(shape)))
+        return shape_keys
+
+    def set_bone_mapping(self, bone_mapping: Union[List[BoneData], Dict[int, str]]):
+        self.bone_mapping = mapping_from(bone_mapping)
+
+    def get_vertex_groups(self) -> List[VertexGroupData]:
+        # One group per bone, its vertices bundled by equal weight
+        assignments = self.bone_assignment_array
+        if len(assignments) == 0:
+            return []
+        order = np.lexsort((assignments['weight'], assignments['bone']))
+        bones = assignments['bone'][order]
+        weights = assignments['weight'][order]
+        vertices = assignments['vertex'][order].astype(np.int32)
+        bone_starts = np.flatnonzero(np.r_[True, bones[1:] != bones[:-1]])
+        weight_starts = np.flatnonzero(np.r_[True, (bones[1:] != bones[:-1]) | (weights[1:] != weights[:-1])])
+        weight_ends = np.r_[weight_starts[1:], len(order)]
+
+        vertex_groups = []
+        for bone_start, bone_end in zip(bone_starts.tolist(), np.r_[bone_starts[1:], len(order)].tolist()):
+            bone = int(bones[bone_start])
+            first, last = np.searchsorted(weight_starts, [bone_start, bone_end])
+            group = [(vertices[start:end].tolist(), float(weights[start]))
+                     for start, end in zip(weight_starts[first:last].tolist(), weight_ends[first:last].tolist())]
+            vertex_groups.append(VertexGroupData(self.bone_mapping.get(bone, str(bone)), group))
+        return vertex_groups
+
+    def set_vertex(
+            self,
+            nd_vert_indices: np.ndarray,
+            nd_loop_indices: np.ndarray,
+            nd_positions: np.ndarray,
+            nd_normals: np.ndarray,
+            nd_tangents: np.ndarray,
+            nd_bitangent_signs: np.ndarray,
+            nd_bitangents: np.ndarray,
+            nd_texcoords: np.ndarray,
+            nd_colors: np.ndarray,
+            nd_alphas: np.ndarray,
+            tangent_dimensions: int = 3,
+            optimize: bool = False) -> np.ndarray:
+        # Builds the vertex buffers from triangulated loops. Attributes whose array is not
+        # one entry per loop are left out. Returns the Blender vertex of each output vertex.
+        loops = np.asarray(nd_loop_indices, dtype=np.int64)
+        loop_count = len(loops)
+        vert_indices = np.asarray(nd_vert_indices, dtype=np.int32)[loops]
+
+        def per_loop(values: np.ndarray, width: int) -> Optional[np.ndarray]:
+            values = np.asarray(values, dtype=np.float32).reshape(-1)
+            if values.size != loop_count * width or loop_count == 0:
+                return None
+            return values.reshape(-1, width)[loops]
+
+        normals = per_loop(nd_normals, 3)
+        tangents = per_loop(nd_tangents, 3)
+        bitangent_signs = per_loop(nd_bitangent_signs, 1)
+        bitangents = per_loop(nd_bitangents, 3)
+        texcoords = per_loop(nd_texcoords, 2)
+        colors = per_loop(nd_colors, 4)
+        alphas = per_loop(nd_alphas, 4)
+
+        # (semantic, type, values) in OGRE's preferred order, position and normal go to their own buffer
+        attributes = [(VES_POSITION, 2, to_ogre_space(np.asarray(nd_positions, dtype=np.float32).reshape(-1, 3)[vert_indices]))]
+        if normals is not None:
+            attributes.append((VES_NORMAL, 2, to_ogre_space(normals)))
+        if colors is not None or alphas is not None:
+            rgba = np.ones((loop_count, 4), dtype=np.float32)
+            if colors is not None:
+                rgba[:, :3] = colors[:, :3]
+            if alphas is not None:
+                rgba[:, 3] = alphas[:, 0]
+            bgra = np.clip(np.rint(rgba[:, [2, 1, 0, 3]] * 255.0), 0, 255).astype(np.uint8)
+            attributes.append((VES_DIFFUSE, VET_COLOUR_ARGB, bgra))
+        if texcoords is not None:
+            uv = texcoords.copy()
+            uv[:, 1] = 1.0 - uv[:, 1]
+            attributes.append((VES_TEXTURE_COORDINATES, 1, uv))
+        if bitangents is not None:
+            attributes.append((VES_BINORMAL, 2, to_ogre_space(bitangents)))
+        if tangents is not None:
+            if tangent_dimensions == 4:
+                signs = bitangent_signs if bitangent_signs is not None else np.ones((loop_count, 1), dtype=np.float32)
+                attributes.append((VES_TANGENT, 3, np.column_stack((to_ogre_space(tangents), signs))))
+            else:
+                attributes.append((VES_TANGENT, 2, to_ogre_space(tangents)))
+
+        record = np.dtype([(f'a{i}', VERTEX_ELEMENT_TYPES[element_type][0], (VERTEX_ELEMENT_TYPES[element_type][1],))
+                           for i, (_, element_type, _) in enumerate(attributes)])
+        records = np.empty(loop_count, dtype=record)
+        for i, (_, _, values) in enumerate(attributes):
+            records[f'a{i}'] = values
+
+        if optimize and loop_count > 0:
+            # Loops with identical attributes share one vertex, kept in order of first use
+            keys = records.view(np.dtype((np.void, record.itemsize)))
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            order = np.argsort(first)
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            indices = rank[inverse.reshape(-1)]
+            kept = first[order]
+            records = records[kept]
+            vertex_sources = vert_indices[kept]
+        else:
+            indices = np.arange(loop_count)
+            vertex_sources = vert_indices
+
+        vertex_count = len(records)
+        elements = []
+        buffers = {}
+        is_first_buffer = [semantic in (VES_POSITION, VES_NORMAL) for semantic, _, _ in attributes]
+        for in_first_buffer in (True, False):
+            fields = [i for i, is_first in enumerate(is_first_buffer) if is_first == in_first_buffer]
+            if len(fields) == 0:
+                continue
+            buffer = np.empty(vertex_count, dtype=np.dtype([(f'a{i}', record.fields[f'a{i}'][0]) for i in fields]))
+            offset = 0
+            for i in fields:
+                semantic, element_type, _ = attributes[i]
+                buffer[f'a{i}'] = records[f'a{i}']
+                elements.append(VertexElement(len(buffers), element_type, semantic, offset, 0))
+                offset += record.fields[f'a{i}'][0].itemsize
+            buffers[len(buffers)] = (np.frombuffer(buffer.tobytes(), dtype=np.uint8), buffer.dtype.itemsize)
+
+        self._geometry = GeometryData(vertex_count, elements, buffers)
+        self.indices = indices.astype(np.int32)
+        self.operation_type = OperationType.triangle_list
+        self.use_32bit_indexes = vertex_count > 0xFFFF
+        self.use_shared_vertices = False
+        self.vertex_sources = vertex_sources.astype(np.int32)
+        return self.vertex_sources
+
+    def append_shapekey(self, name: str, nd_offsets: np.ndarray, nd_vertex_sources: np.ndarray):
+        # Offsets are per Blender vertex, the pose keeps the output vertices that move
+        offsets = to_ogre_space(np.asarray(nd_offsets, dtype=np.float32).reshape(-1, 3)[nd_vertex_sources])
+        vertices = np.flatnonzero(np.any(offsets != 0.0, axis=1))
+        self.poses.append(Pose(name, self.index + 1, vertices, offsets[vertices]))
+
+    def set_bone_assignments(self, bone_assignments: List[BoneAssignmentData], nd_vertex_sources: np.ndarray):
+        vertices = np.fromiter((ba.vertex_index for ba in bone_assignments), dtype=np.int64, count=len(bone_assignments))
+        bones = np.fromiter((ba.bone_index for ba in bone_assignments), dtype=np.int64, count=len(bone_assignments))
+        weights = np.fromiter((ba.weight for ba in bone_assignments), dtype=np.float32, count=len(bone_assignments))
+        self.set_bone_assignment_arrays(vertices, bones, weights, nd_vertex_sources)
+
+    def set_bone_assignment_arrays(
+            self,
+            nd_vertices: np.ndarray,
+            nd_bones: np.ndarray,
+            nd_weights: np.ndarray,
+            nd_vertex_sources: np.ndarray):
+        # Same as set_bone_assignments with one array per field instead of a list of objects
+        self.bone_assignment_array = expand_bone_assignments(np.asarray(nd_vertices, dtype=np.int64),
+                                                             np.asarray(nd_bones, dtype=np.int64),
+                                                             np.asarray(nd_weights, dtype=np.float32),
+                                                             nd_vertex_sources)
+
+
+def expand_bone_assignments(
+        vertices: np.ndarray,
+        bones: np.ndarray,
+        weights: np.ndarray,
+        vertex_sources: np.ndarray) -> np.ndarray:
+    # Copies each Blender vertex's assignments to every output vertex made from it.
+    # Assignments to unknown bones are dropped.
+    valid = (bones >= 0) & (bones < NO_BONE_ID)
+    vertices, bones, weights = vertices[valid], bones[valid], weights[valid]
+    order = np.argsort(vertices, kind='stable')
+    vertices, bones, weights = vertices[order], bones[order], weights[order]
+
+    vertex_sources = np.asarray(vertex_sources, dtype=np.int64)
+    starts = np.searchsorted(vertices, vertex_sources, side='left')
+    lengths = np.searchsorted(vertices, vertex_sources, side='right') - starts
+    total = int(lengths.sum())
+    outputs = np.repeat(np.arange(len(vertex_sources)), lengths)
+    rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+    assignments = np.empty(total, dtype=BONE_ASSIGNMENT_RECORD)
+    assignments['vertex'] = outputs
+    assignments['bone'] = bones[rows]
+    assignments['weight'] = weights[rows]
+    return assignments
+
+
+def triangulate(indices: np.ndarray, operation_type: int) -> np.ndarray:
+    indices = np.asarray(indices, dtype=np.int32)
+    if operation_type == OperationType.triangle_list:
+        return indices[:len(indices) - len(indices) % 3]
+    if len(indices) < 3:
+        return np.empty(0, dtype=np.int32)
+    count = len(indices) - 2
+    if operation_type == OperationType.triangle_strip:
+        # Every other triangle is wound the other way
+        faces = np.column_stack((indices[:-2], indices[1:-1], indices[2:]))
+        faces[1::2, [0, 1]] = faces[1::2, [1, 0]]
+    elif operation_type == OperationType.triangle_fan:
+        faces = np.column_stack((np.full(count, indices[0]), indices[1:-1], indices[2:]))
+    else:
+        return np.empty(0, dtype=np.int32)
+    # Strips are joined with degenerate triangles
+    degenerate = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 2] == faces[:, 0])
+    return faces[~degenerate].ravel()
+
+
+class MeshData:
+    def __init__(self, name: str = '', skeleton_loader: Callable[[str], object] = None):
+        self.name = name
+        self.version = (1, 10)
+        self.skeletally_animated = False
+        self.skeleton_name = b''
+        self.shared_geometry: Optional[GeometryData] = None
+        self.shared_bone_assignments = np.empty(0, dtype=BONE_ASSIGNMENT_RECORD)
+        self.submeshes: List[SubMeshData] = []
+        self.bone_mapping: Dict[int, str] = {}
+        self.bone_ids: Dict[str, int] = {}
+        # (minimum, maximum, radius) from the bounds chunk, in OGRE space
+        self.bounds: Optional[Tuple[Tuple[float, ...], Tuple[float, ...], float]] = None
+        self._skeleton_loader = skeleton_loader
+
+    def get_submeshes(self) -> List[SubMeshData]:
+        return list(self.submeshes)
+
+    def set_submeshes(self, submeshes: List[SubMeshData]):
+        self.submeshes = list(submeshes)
+
+    def get_linked_skeleton_name(self) -> str:
+        return self.skeleton_name.decode('utf-8', errors='replace')
+
+    def set_linked_skeleton_name(self, filename: str):
+        self.skeleton_name = filename.encode('utf-8')
+
+    def get_linked_skeleton(self):
+        if not self.skeleton_name or self._skeleton_loader is None:
+            return None
+        return self._skeleton_loader(self.get_linked_skeleton_name())
+
+    def set_bone_mapping(self, bone_mapping: Union[List[BoneData], Dict[int, str]]):
+        self.bone_mapping = mapping_from(bone_mapping)
+        self.bone_ids = {name: bone_id for bone_id, name in self.bone_mapping.items()}
+
+    def get_bone_id(self, bone_name: str) -> int:
+        return self.bone_ids.get(bone_name, NO_BONE_ID)
+
+    def summary(self) -> Dict[str, Any]:
+        # Only uses what a lazy read already has, no submesh is decoded.
+        # Submeshes on shared geometry report the shared vertex count.
+        submeshes = []
+        for submesh in self.submeshes:
+            geometry = submesh._geometry
+            if submesh.use_shared_vertices and not submesh.is_loaded and self.shared_geometry is not None:
+                geometry = self.shared_geometry
+            submeshes.append({
+                'name': submesh.submesh_name,
+                'material': submesh.material,
+                'vertex_count': geometry.vertex_count,
+                'index_count': len(submesh._indices),
+                'use_32bit_indexes': submesh.use_32bit_indexes,
+                'use_shared_vertices': submesh.use_shared_vertices,
+                'texcoord_count': len(geometry.find_elements(VES_TEXTURE_COORDINATES)),
+                'has_normals': geometry.has_normals,
+                'has_colors': geometry.has_colors,
+            })
+        return {
+            'name': self.name,
+            'version': '.'.join(str(number) for number in self.version),
+            'skeleton': self.get_linked_skeleton_name(),
+            'bounds': self.bounds,
+            'submeshes': submeshes,
+        }
+
+
+class MeshReader:
+    # Follows the chunk order of OGRE's MeshSerializerImpl, reading children until an unknown id shows up.
+    # A lazy reader only walks the headers and leaves each submesh's operation, bone assignments, poses
+    # and shared vertex compaction to the first access of its data.
+    def __init__(self, buffer, name: str = '', lazy: bool = False):
+        self.stream = ChunkReader(buffer)
+        self.mesh = MeshData(name)
+        self.lazy = lazy
+        self.version = (1, 10)
+        self.submesh_names: Dict[int, bytes] = {}
+        self.submesh_tails: Dict[int, Tuple[int, int]] = {}
+        self.pose_range: Optional[Tuple[int, int]] = None
+        self._poses: Optional[List[Pose]] = None
+        self._lock = threading.RLock()
+
+    def read(self) -> MeshData:
+        stream = self.stream
+        if stream.read_uint16() != M_HEADER:
+            raise OgreFormatError('Not an OGRE mesh file')
+        version = stream.read_string()
+        if version not in MESH_VERSIONS:
+            raise OgreFormatError(f'Unsupported mesh version {version.decode("ascii", errors="replace")}')
+        self.version = self.mesh.version = MESH_VERSIONS[version]
+
+        while not stream.eof():
+            chunk_id, length = stream.read_chunk()
+            if chunk_id == M_MESH:
+                self.read_mesh()
+            else:
+                stream.skip(length - CHUNK_HEADER_SIZE)
+
+        self.finish()
+        return self.mesh
+
+    def read_mesh(self):
+        stream = self.stream
+        mesh = self.mesh
+        mesh.skeletally_animated = stream.read_bool()
+        bone_assignments = []
+        while not stream.eof():
+            chunk_id, length = stream.read_chunk()
+            if chunk_id == M_GEOMETRY:
+                mesh.shared_geometry = self.read_geometry()
+            elif chunk_id == M_SUBMESH:
+                self.read_submesh(stream.position + length - CHUNK_HEADER_SIZE)
+            elif chunk_id == M_MESH_SKELETON_LINK:
+                mesh.skeleton_name = stream.read_string()
+            elif chunk_id == M_MESH_BONE_ASSIGNMENT:
+                stream.backpedal_chunk_header()
+                bone_assignments.append(stream.read_chunk_run(M_MESH_BONE_ASSIGNMENT, BONE_ASSIGNMENT_RECORD))
+            elif chunk_id == M_MESH_BOUNDS:
+                values = stream.read_floats(7)
+                mesh.bounds = (values[0:3], values[3:6], values[6])
+            elif chunk_id == M_SUBMESH_NAME_TABLE:
+                self.read_submesh_name_table(length)
+            elif chunk_id == M_POSES:
+                end = stream.position + length - CHUNK_HEADER_SIZE
+                if self.lazy and self.is_mesh_child(end):
+                    self.pose_range = (stream.position, end)
+                    stream.position = end
+                else:
+                    self._poses = self.read_poses(stream)
+            elif chunk_id in (M_MESH_LOD, M_EDGE_LISTS, M_ANIMATIONS, M_TABLE_EXTREMES):
+                stream.skip(length - CHUNK_HEADER_SIZE)
+            else:
+                stream.backpedal_chunk_header()
+                break
+        if bone_assignments:
+            mesh.shared_bone_assignments = np.concatenate(bone_assignments)
+
+    def read_submesh(self, end: int):
+        stream = self.stream
+        submesh = SubMeshData()
+        submesh.index = len(self.mesh.submeshes)
+        submesh._material = stream.read_string()
+        submesh.material = submesh._material.decode('utf-8', errors='replace')
+        submesh.use_shared_vertices = stream.read_bool()
+        index_count = stream.read_uint32()
+        submesh.use_32bit_indexes = stream.read_bool()
+        index_type = '<u4' if submesh.use_32bit_indexes else '<u2'
+        # Kept as a view of the file, triangulate makes the one int32 copy
+        submesh.indices = stream.read_array(index_type, index_count)
+
+        if not submesh.use_shared_vertices:
+            chunk_id, _ = stream.read_chunk()
+            if chunk_id != M_GEOMETRY:
+                raise OgreFormatError('Missing geometry on a submesh without shared vertices')
+            submesh._geometry = self.read_geometry()
+
+        # The length is only trusted when it lands on the next chunk, otherwise the tail is read now
+        if self.lazy and self.is_mesh_child(end):
+            self.submesh_tails[submesh.index] = (stream.position, end)
+            stream.position = end
+        else:
+            self.read_submesh_tail(submesh, stream)
+        self.mesh.submeshes.append(submesh)
+
+    def read_submesh_tail(self, submesh: SubMeshData, stream: ChunkReader):
+        bone_assignments = []
+        while not stream.eof():
+            chunk_id, length = stream.read_chunk()
+            if chunk_id == M_SUBMESH_OPERATION:
+                submesh._operation_type = stream.read_uint16()
+            elif chunk_id == M_SUBMESH_BONE_ASSIGNMENT:
+                stream.backpedal_chunk_header()
+                bone_assignments.append(stream.read_chunk_run(M_SUBMESH_BONE_ASSIGNMENT, BONE_ASSIGNMENT_RECORD))
+            elif chunk_id == M_SUBMESH_TEXTURE_ALIAS:
+                stream.skip(length - CHUNK_HEADER_SIZE)
+            else:
+                stream.backpedal_chunk_header()
+                break
+        if bone_assignments:
+            submesh._bone_assignment_array = np.concatenate(bone_assignments)
+
+    def is_mesh_child(self, position: int) -> bool:
+        stream = self.stream
+        if position == stream.end:
+            return True
+        if position > stream.end - CHUNK_HEADER_SIZE:
+            return False
+        chunk_id, _ = ChunkReader(stream.buffer, position).peek_chunk()
+        return chunk_id in MESH_CHILDREN
+
+    def read_geometry(self) -> GeometryData:
+        stream = self.stream
+        geometry = GeometryData(stream.read_uint32())
+        while not stream.eof():
+            chunk_id, _ = stream.read_chunk()
+            if chunk_id == M_GEOMETRY_VERTEX_DECLARATION:
+                while not stream.eof():
+                    chunk_id, _ = stream.read_chunk()
+                    if chunk_id != M_GEOMETRY_VERTEX_ELEMENT:
+                        stream.backpedal_chunk_header()
+                        break
+                    source, element_type, semantic, offset, index = (stream.read_uint16() for _ in range(5))
+                    geometry.elements.append(VertexElement(source, element_type, semantic, offset, index))
+            elif chunk_id == M_GEOMETRY_VERTEX_BUFFER:
+                bind_index = stream.read_uint16()
+                vertex_size = stream.read_uint16()
+                chunk_id, _ = stream.read_chunk()
+                if chunk_id != M_GEOMETRY_VERTEX_BUFFER_DATA:
+                    raise OgreFormatError('Missing vertex buffer data')
+                data = stream.read_array(np.uint8, geometry._vertex_count * vertex_size)
+                geometry.buffers[bind_index] = (data, vertex_size)
+            else:
+                stream.backpedal_chunk_header()
+                break
+        return geometry
+
+    def read_submesh_name_table(self, length: int):
+        stream = self.stream
+        end = stream.position + length - CHUNK_HEADER_SIZE
+        while stream.position < end:
+            chunk_id, _ = stream.read_chunk()
+            if chunk_id != M_SUBMESH_NAME_TABLE_ELEMENT:
+                stream.backpedal_chunk_header()
+                break
+            index = stream.read_uint16()
+            self.submesh_names[index] = stream.read_string()
+
+    @property
+    def poses(self) -> List[Pose]:
+        # Every pose of the mesh, read once for all submeshes
+        if self._poses is None:
+            self._poses = self.read_poses(ChunkReader(self.stream.buffer, *self.pose_range)) if self.pose_range else []
+        return self._poses
+
+    def read_poses(self, stream: ChunkReader) -> List[Pose]:
+        poses = []
+        while not stream.eof():
+            chunk_id, _ = stream.read_chunk()
+            if chunk_id != M_POSE:
+                stream.backpedal_chunk_header()
+                break
+            name = stream.read_string().decode('utf-8', errors='replace')
+            target = stream.read_uint16()
+            # Pose normals were added with the 1.10 format
+            includes_normals = stream.read_bool() if self.version >= (1, 10) else False
+            pose_record = POSE_VERTEX_NORMAL_RECORD if includes_normals else POSE_VERTEX_RECORD
+            vertices = stream.read_chunk_run(M_POSE_VERTEX, pose_record)
+            poses.append(Pose(name, target, vertices['vertex'].astype(np.int64), vertices['offset']))
+        return poses
+
+    def finish(self):
+        for submesh in self.mesh.submeshes:
+            submesh._name = self.submesh_names.get(submesh.index, f'SubMesh{submesh.index}'.encode('ascii'))
+            submesh.submesh_name = submesh._name.decode('utf-8', errors='replace')
+            if self.lazy:
+                submesh._loader = self.load_submesh
+            else:
+                self.complete(submesh)
+
+    def load_submesh(self, submesh: SubMeshData):
+        # Submeshes of a cached mesh may be touched from several threads
+        with self._lock:
+            if submesh._loader is not None:
+                self.complete(submesh)
+                submesh._loader = None
+
+    def complete(self, submesh: SubMeshData):
+        if submesh.index in self.submesh_tails:
+            self.read_submesh_tail(submesh, ChunkReader(self.stream.buffer, *self.submesh_tails.pop(submesh.index)))
+        submesh._poses = [pose for pose in self.poses if pose.target == submesh.index + 1]
+        if submesh.use_shared_vertices and self.mesh.shared_geometry is not None:
+            self.compact_shared(submesh)
+
+    def compact_shared(self, submesh: SubMeshData):
+        # Give the submesh its own copy of the shared vertices it uses, renumbered from zero
+        mesh = self.mesh
+        vertex_indices, indices = np.unique(submesh._indices, return_inverse=True)
+        submesh.indices = indices.astype(np.int32).reshape(-1)
+        submesh._geometry = mesh.shared_geometry.select(vertex_indices)
+
+        lookup = np.full(mesh.shared_geometry.vertex_count, -1, dtype=np.int64)
+        lookup[vertex_indices] = np.arange(len(vertex_indices))
+
+        assignments = mesh.shared_bone_assignments
+        if len(assignments) > 0:
+            remapped = lookup[assignments['vertex']]
+            used = remapped >= 0
+            bone_assignment_array = np.empty(np.count_nonzero(used), dtype=BONE_ASSIGNMENT_RECORD)
+            bone_assignment_array['vertex'] = remapped[used]
+            bone_assignment_array['bone'] = assignments['bone'][used]
+            bone_assignment_array['weight'] = assignments['weight'][used]
+            submesh._bone_assignment_array = bone_assignment_array
+
+        for pose in self.poses:
+            if pose.target != 0:
+                continue
+            remapped = lookup[pose.vertices]
+            used = remapped >= 0
+            submesh._poses.append(Pose(pose.name, submesh.index + 1, remapped[used], pose.offsets[used]))
+
+
+def read_mesh(buffer, name: str = '', lazy: bool = False) -> MeshData:
+    return MeshReader(buffer, name, lazy).read()
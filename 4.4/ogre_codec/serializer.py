@@ -0,0 +1,95 @@
+
+import logging
+import mmap
+import os
+from typing import List, Optional
+
+from .mesh import MeshData, read_mesh
+from .skeleton import SkeletonData, read_skeleton
+from .types import MeshVersion, SkeletonVersion
+from .writer import write_mesh, write_skeleton
+
+
+logger = logging.getLogger(__name__)
+
+# Files at least this large are memory mapped instead of read into memory
+MMAP_THRESHOLD = 32 * 1024 * 1024
+
+
+def read_file(filepath: str, mmap_threshold: int = MMAP_THRESHOLD):
+    # A mapped file stays open for as long as arrays viewing it are alive
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if 0 < size and mmap_threshold <= size:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return f.read()
+
+
+def write_file(filepath: str, data: bytes):
+    # Replace rather than overwrite, a mapped copy of the old file may still be in use
+    temp_path = f'{filepath}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, filepath)
+
+
+class KenshiObjectSerializer:
+    # Same surface as kenshi_blender_tool.KenshiObjectSerializer, without OgreMain.
+    # Meshes are read lazily by default, each submesh is decoded when its data is first used.
+    def __init__(self, logfile: str = 'Kenshi_io_OGRE.log', mmap_threshold: int = MMAP_THRESHOLD, lazy: bool = True):
+        self.logfile = logfile
+        self.mmap_threshold = mmap_threshold
+        self.lazy = lazy
+        self.resource_locations: List[str] = []
+
+    def add_resource_location(self, folder: str):
+        if folder not in self.resource_locations:
+            self.resource_locations.append(folder)
+
+    def find_resource(self, name: str) -> Optional[str]:
+        if os.path.isabs(name):
+            return name if os.path.isfile(name) else None
+        # Resource names are matched without case, as OGRE does on Windows
+        lower_name = name.lower()
+        for folder in self.resource_locations:
+            filepath = os.path.join(folder, name)
+            if os.path.isfile(filepath):
+                return filepath
+            if os.path.isdir(folder):
+                for filename in os.listdir(folder):
+                    if filename.lower() == lower_name:
+                        return os.path.join(folder, filename)
+        return None
+
+    def load_mesh(self, name: str) -> Optional[MeshData]:
+        filepath = self.find_resource(name)
+        if filepath is None:
+            logger.error('Mesh %s not found', name)
+            return None
+        mesh = read_mesh(read_file(filepath, self.mmap_threshold), name, self.lazy)
+        mesh._skeleton_loader = self.load_skeleton
+        logger.info('Loaded mesh %s', filepath)
+        return mesh
+
+    def create_mesh(self, name: str) -> MeshData:
+        return MeshData(name, skeleton_loader=self.load_skeleton)
+
+    def create_skeleton(self, name: str) -> SkeletonData:
+        return SkeletonData(name)
+
+    def save_mesh(self, mesh: MeshData, filepath: str, version: MeshVersion = MeshVersion.V_Latest):
+        write_file(filepath, write_mesh(mesh, version))
+        logger.info('Saved mesh %s', filepath)
+
+    def save_skeleton(self, skeleton: SkeletonData, filepath: str, version: SkeletonVersion = SkeletonVersion.V_Latest):
+        write_file(filepath, write_skeleton(skeleton, version))
+        logger.info('Saved skeleton %s', filepath)
+
+    def load_skeleton(self, name: str) -> Optional[SkeletonData]:
+        filepath = self.find_resource(name)
+        if filepath is None:
+            logger.error('Skeleton %s not found', name)
+            return None
+        skeleton = read_skeleton(read_file(filepath, self.mmap_threshold), name)
+        logger.info('Loaded skeleton %s', filepath)
+        return skeleton
@@ -0,0 +1,307 @@
+
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .chunks import *
+from .transforms import make_continuous, matrix_to_quaternion, quaternion_to_matrix
+from .types import BoneData, Matrix3, OgreQuaternion, SkeletonVersion, Vector3
+
+
+SKELETON_VERSIONS = {
+    b'[Serializer_v1.10]': SkeletonVersion.V_1_0,
+    b'[Serializer_v1.80]': SkeletonVersion.V_1_8,
+}
+
+# Keyframe columns: time, translate xyz, rotate wxyz, scale xyz
+KEY_TIME = 0
+KEY_TRANSLATE = slice(1, 4)
+KEY_ROTATE = slice(4, 8)
+KEY_SCALE = slice(8, 11)
+KEY_COLUMNS = 11
+
+KEYFRAME_RECORD = np.dtype([('time', '<f4'), ('rotate', '<f4', 4), ('translate', '<f4', 3)])
+KEYFRAME_SCALE_RECORD = np.dtype([('time', '<f4'), ('rotate', '<f4', 4), ('translate', '<f4', 3), ('scale', '<f4', 3)])
+
+
+def to_keys(records: np.ndarray) -> np.ndarray:
+    # Keyframe chunk records -> (keys, 11) float32
+    keys = np.ones((len(records), KEY_COLUMNS), dtype=np.float32)
+    keys[:, KEY_TIME] = records['time']
+    keys[:, KEY_TRANSLATE] = records['translate']
+    keys[:, KEY_ROTATE] = records['rotate'][:, [3, 0, 1, 2]]
+    if 'scale' in records.dtype.names:
+        keys[:, KEY_SCALE] = records['scale']
+    return keys
+
+
+def interleave(frames: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # frames (k,), values (channels, k) -> (channels, 2k) of frame, value pairs
+    pairs = np.empty((len(values), len(frames), 2), dtype=np.float32)
+    pairs[:, :, 0] = frames
+    pairs[:, :, 1] = values
+    return pairs.reshape(len(values), -1)
+
+
+def matrix_array(matrix: Matrix3) -> np.ndarray:
+    return np.array([matrix[row] for row in range(3)], dtype=np.float64)
+
+
+class BlenderAnimationTrack:
+    def __init__(
+            self,
+            name: str,
+            nd_locations: np.ndarray,
+            nd_rotations: np.ndarray,
+            nd_scales: np.ndarray,
+            has_scale: bool):
+        self.name = name
+        self.nd_locations = nd_locations
+        self.nd_rotations = nd_rotations
+        self.nd_scales = nd_scales
+        self.has_scale = has_scale
+
+
+class AnimationData:
+    # Tracks are (keys, 11) float32 arrays in OGRE bone space, by bone name.
+    # Tracks appended from Blender are converted once the animation belongs to a skeleton,
+    # since that needs the bones' rest orientations.
+    def __init__(self):
+        self.name = ''
+        self.length = 0.0
+        self.tracks: Dict[str, np.ndarray] = {}
+        self.skeleton: Optional['SkeletonData'] = None
+        self._pending: List[tuple] = []
+
+    def get_animations(self, bone_matrix_map: Dict[str, Matrix3], fps: float, round_frame: bool) -> List[BlenderAnimationTrack]:
+        # bone_matrix_map maps OGRE translations into each Blender bone's rest space
+        rests = self.skeleton.rest_rotations() if self.skeleton else {}
+        tracks = []
+        for name, keys in self.tracks.items():
+            matrix = bone_matrix_map.get(name)
+            if matrix is None or len(keys) == 0:
+                continue
+            m = matrix_array(matrix)
+            rotation_axes = m @ rests.get(name, np.identity(3))
+
+            frames = keys[:, KEY_TIME].astype(np.float64) * fps
+            if round_frame:
+                frames = np.round(frames)
+            locations = m @ keys[:, KEY_TRANSLATE].T
+            rotations = np.empty((len(keys), 4), dtype=np.float64)
+            rotations[:, 0] = keys[:, KEY_ROTATE.start]
+            rotations[:, 1:] = keys[:, KEY_ROTATE.start + 1:KEY_ROTATE.stop] @ rotation_axes.T
+            rotations = make_continuous(rotations).T
+            scales = np.abs(rotation_axes) @ keys[:, KEY_SCALE].T
+
+            tracks.append(BlenderAnimationTrack(name,
+                                                interleave(frames, locations),
+                                                interleave(frames, rotations),
+                                                interleave(frames, scales),
+                                                not np.allclose(scales, 1.0, atol=1e-5)))
+        return tracks
+
+    def append_animation_track(
+            self,
+            bone_name: str,
+            bone_matrix: Matrix3,
+            nd_times: np.ndarray,
+            nd_locations: np.ndarray,
+            nd_rotations: np.ndarray,
+            nd_scales: np.ndarray,
+            use_scale: bool = False):
+        # Blender pose channels (channels, frames) with bone_matrix from Blender bone space to OGRE
+        self._pending.append((bone_name,
+                              matrix_array(bone_matrix),
+                              np.asarray(nd_times, dtype=np.float64).reshape(-1),
+                              np.asarray(nd_locations, dtype=np.float64).reshape(3, -1),
+                              np.asarray(nd_rotations, dtype=np.float64).reshape(4, -1),
+                              np.asarray(nd_scales, dtype=np.float64).reshape(3, -1),
+                              use_scale))
+        if self.skeleton:
+            self.resolve()
+
+    def set_animation_tracks(
+            self,
+            bone_matrix_map: Dict[str, Matrix3],
+            pose_matrix_map: Dict[str, List[List[List[float]]]],
+            time_array: List[float],
+            use_scale: bool = False):
+        # Local pose matrices per frame, split into location, rotation and scale
+        for name, matrices in pose_matrix_map.items():
+            bone_matrix = bone_matrix_map.get(name)
+            if bone_matrix is None:
+                continue
+            matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+            scales = np.linalg.norm(matrices[:, :3, :3], axis=1)
+            rotations = matrix_to_quaternion(matrices[:, :3, :3] / np.where(scales == 0, 1.0, scales)[:, np.newaxis, :])
+            self.append_animation_track(bone_name=name,
+                                        bone_matrix=bone_matrix,
+                                        nd_times=time_array,
+                                        nd_locations=matrices[:, :3, 3].T,
+                                        nd_rotations=make_continuous(rotations).T,
+                                        nd_scales=scales.T,
+                                        use_scale=use_scale)
+
+    def resolve(self):
+        rests = self.skeleton.rest_rotations()
+        for name, fix, times, locations, rotations, scales, use_scale in self._pending:
+            if name not in rests:
+                continue
+            rotation_axes = rests[name].T @ fix
+            keys = np.ones((len(times), KEY_COLUMNS), dtype=np.float32)
+            keys[:, KEY_TIME] = times
+            keys[:, KEY_TRANSLATE] = (fix @ locations).T
+            keys[:, KEY_ROTATE.start] = rotations[0]
+            keys[:, KEY_ROTATE.start + 1:KEY_ROTATE.stop] = (rotation_axes @ rotations[1:]).T
+            if use_scale:
+                keys[:, KEY_SCALE] = (np.abs(rotation_axes) @ scales).T
+            self.tracks[name] = keys
+        self._pending = []
+
+
+class SkeletonData:
+    def __init__(self, file: str = '', group: str = ''):
+        self.file = file
+        self.group = group
+        self.version = SkeletonVersion.V_Latest
+        self.blend_mode = 0
+        self.bones: List[BoneData] = []
+        self.animations: List[AnimationData] = []
+        self.animation_links: List[Tuple[bytes, float]] = []
+
+    def get_bones(self, has_helper: bool = True) -> List[BoneData]:
+        if has_helper:
+            return list(self.bones)
+        return [bone for bone in self.bones if not bone.name.startswith('Helper')]
+
+    def set_bones(self, bones: List[BoneData]):
+        self.bones = sorted(bones, key=lambda bone: bone.id)
+        children: Dict[str, List[str]] = {bone.name: [] for bone in self.bones}
+        for bone in self.bones:
+            if bone.parent_name in children:
+                children[bone.parent_name].append(bone.name)
+        for bone in self.bones:
+            bone.child_names = children[bone.name]
+        for animation in self.animations:
+            animation.resolve()
+
+    def rest_rotations(self) -> Dict[str, np.ndarray]:
+        rotations = quaternion_to_matrix([(bone.rotate.w, bone.rotate.x, bone.rotate.y, bone.rotate.z) for bone in self.bones])
+        return {bone.name: rotation for bone, rotation in zip(self.bones, rotations)}
+
+    def get_animations(self) -> List[AnimationData]:
+        return list(self.animations)
+
+    def add_animation(self, animation: AnimationData):
+        animation.skeleton = self
+        animation.resolve()
+        self.animations.append(animation)
+
+    def calc_animation_fps(self) -> float:
+        # Most animations are baked at a fixed rate, the median key spacing recovers it
+        spacings = [np.diff(keys[:, KEY_TIME]) for animation in self.animations for keys in animation.tracks.values()]
+        spacings = np.concatenate(spacings) if spacings else np.empty(0)
+        spacings = spacings[spacings > 1e-5]
+        if len(spacings) == 0:
+            return 24.0
+        return float(1.0 / np.median(spacings))
+
+
+class SkeletonReader:
+    # Follows OGRE's SkeletonSerializer::importSkeleton
+    def __init__(self, buffer, name: str = ''):
+        self.stream = ChunkReader(buffer)
+        self.skeleton = SkeletonData(name)
+        self.bones: Dict[int, BoneData] = {}
+        self.parents: Dict[int, int] = {}
+        # Handles used by parents and tracks without a bone, those references are dropped
+        self.unknown_handles: Set[int] = set()
+
+    def read(self) -> SkeletonData:
+        stream = self.stream
+        skeleton = self.skeleton
+        if stream.read_uint16() != SKELETON_HEADER:
+            raise OgreFormatError('Not an OGRE skeleton file')
+        version = stream.read_string()
+        if version not in SKELETON_VERSIONS:
+            raise OgreFormatError(f'Unsupported skeleton version {version.decode("ascii", errors="replace")}')
+        skeleton.version = SKELETON_VERSIONS[version]
+
+        while not stream.eof():
+            chunk_id, length = stream.read_chunk()
+            end = stream.position + length - CHUNK_HEADER_SIZE
+            if chunk_id == SKELETON_BLENDMODE:
+                skeleton.blend_mode = stream.read_uint16()
+            elif chunk_id == SKELETON_BONE:
+                self.read_bone(end)
+            elif chunk_id == SKELETON_BONE_PARENT:
+                handle = stream.read_uint16()
+                self.parents[handle] = stream.read_uint16()
+            elif chunk_id == SKELETON_ANIMATION:
+                self.read_animation()
+            elif chunk_id == SKELETON_ANIMATION_LINK:
+                skeleton.animation_links.append((stream.read_string(), stream.read_float()))
+            else:
+                stream.skip(length - CHUNK_HEADER_SIZE)
+
+        for handle, parent in self.parents.items():
+            if handle in self.bones and parent in self.bones:
+                self.bones[handle].parent_name = self.bones[parent].name
+            else:
+                self.unknown_handles.update(h for h in (handle, parent) if h not in self.bones)
+        skeleton.set_bones(list(self.bones.values()))
+        return skeleton
+
+    def read_bone(self, end: int):
+        stream = self.stream
+        name = stream.read_string().decode('utf-8', errors='replace')
+        handle = stream.read_uint16()
+        position = Vector3(*stream.read_floats(3))
+        x, y, z, w = stream.read_floats(4)
+        # Scale is only written when it is not one
+        scale = Vector3(*stream.read_floats(3)) if stream.position < end else Vector3(1.0, 1.0, 1.0)
+        self.bones[handle] = BoneData(handle, name, position, OgreQuaternion(w, x, y, z), scale, '', [])
+
+    def read_animation(self):
+        stream = self.stream
+        animation = AnimationData()
+        animation.name = stream.read_string().decode('utf-8', errors='replace')
+        animation.length = stream.read_float()
+        while not stream.eof():
+            chunk_id, _ = stream.read_chunk()
+            if chunk_id == SKELETON_ANIMATION_BASEINFO:
+                stream.read_string()
+                stream.read_float()
+            elif chunk_id == SKELETON_ANIMATION_TRACK:
+                handle = stream.read_uint16()
+                keys = self.read_keyframes()
+                if handle in self.bones:
+                    animation.tracks[self.bones[handle].name] = keys
+                else:
+                    self.unknown_handles.add(handle)
+            else:
+                stream.backpedal_chunk_header()
+                break
+        self.skeleton.add_animation(animation)
+
+    def read_keyframes(self) -> np.ndarray:
+        # Keys with and without scale can be mixed, each run of one size is read at once
+        stream = self.stream
+        runs = []
+        while True:
+            chunk_id, length = stream.peek_chunk()
+            if chunk_id != SKELETON_ANIMATION_TRACK_KEYFRAME:
+                break
+            record = KEYFRAME_SCALE_RECORD if length >= CHUNK_HEADER_SIZE + KEYFRAME_SCALE_RECORD.itemsize else KEYFRAME_RECORD
+            records = stream.read_chunk_run(SKELETON_ANIMATION_TRACK_KEYFRAME, record, check_length=True)
+            if len(records) == 0:
+                raise OgreFormatError(f'Unexpected keyframe size {length}')
+            runs.append(to_keys(records))
+        if not runs:
+            return np.empty((0, KEY_COLUMNS), dtype=np.float32)
+        return np.concatenate(runs)
+
+
+def read_skeleton(buffer, name: str = '') -> SkeletonData:
+    return SkeletonReader(buffer, name).read()
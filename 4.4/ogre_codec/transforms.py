@@ -0,0 +1,47 @@
+
+import numpy as np
+
+
+def quaternion_to_matrix(quaternions: np.ndarray) -> np.ndarray:
+    # (n, 4) w, x, y, z -> (n, 3, 3)
+    q = np.array(quaternions, dtype=np.float64).reshape(-1, 4)
+    norm = np.linalg.norm(q, axis=1)
+    q[norm == 0] = (1.0, 0.0, 0.0, 0.0)
+    q /= np.where(norm == 0, 1.0, norm)[:, np.newaxis]
+    w, x, y, z = q.T
+    return np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y),
+                     2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x),
+                     2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], axis=1).reshape(-1, 3, 3)
+
+
+def matrix_to_quaternion(matrices: np.ndarray) -> np.ndarray:
+    # (n, 3, 3) rotation matrices -> (n, 4) w, x, y, z, picking the largest term for stability
+    m = np.asarray(matrices, dtype=np.float64).reshape(-1, 3, 3)
+    trace = np.stack([m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2], m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]], axis=1)
+    case = np.argmax(trace, axis=1)
+    q = np.empty((len(m), 4), dtype=np.float64)
+
+    c = case == 0
+    s = 2.0 * np.sqrt(np.maximum(1.0 + trace[c, 0], 1e-12))
+    q[c] = np.stack([0.25 * s, (m[c, 2, 1] - m[c, 1, 2]) / s, (m[c, 0, 2] - m[c, 2, 0]) / s, (m[c, 1, 0] - m[c, 0, 1]) / s], axis=1)
+    for axis in range(3):
+        i, j, k = axis, (axis + 1) % 3, (axis + 2) % 3
+        c = case == axis + 1
+        s = 2.0 * np.sqrt(np.maximum(1.0 + m[c, i, i] - m[c, j, j] - m[c, k, k], 1e-12))
+        q[c, 0] = (m[c, k, j] - m[c, j, k]) / s
+        q[c, 1 + i] = 0.25 * s
+        q[c, 1 + j] = (m[c, j, i] + m[c, i, j]) / s
+        q[c, 1 + k] = (m[c, k, i] + m[c, i, k]) / s
+
+    q[q[:, 0] < 0] *= -1
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def make_continuous(quaternions: np.ndarray) -> np.ndarray:
+    # (n, 4) flip signs so neighbouring keys stay in the same hemisphere
+    q = np.array(quaternions, dtype=np.float64).reshape(-1, 4)
+    if len(q) > 1:
+        flips = np.einsum('ij,ij->i', q[1:], q[:-1]) < 0
+        signs = np.where(np.cumsum(flips) % 2 == 1, -1.0, 1.0)
+        q[1:] *= signs[:, np.newaxis]
+    return q
@@ -0,0 +1,106 @@
+
+from enum import IntEnum
+from typing import List, Tuple
+
+
+class MeshVersion(IntEnum):
+    V_Latest = 0
+    V_1_10 = 1
+    V_1_8 = 2
+    V_1_7 = 3
+    V_1_4 = 4
+    V_1_0 = 5
+    V_Legacy = 6
+
+
+class SkeletonVersion(IntEnum):
+    V_1_0 = 0
+    V_1_8 = 1
+    V_Latest = 100
+
+
+class OperationType(IntEnum):
+    point_list = 1
+    line_list = 2
+    line_strip = 3
+    triangle_list = 4
+    triangle_strip = 5
+    triangle_fan = 6
+
+
+class Vector3:
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x: float = 0.0, y: float = 0.0, z: float = 0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __repr__(self):
+        return f'Vector3({self.x}, {self.y}, {self.z})'
+
+
+class OgreQuaternion:
+    __slots__ = ('w', 'x', 'y', 'z')
+
+    def __init__(self, w: float = 1.0, x: float = 0.0, y: float = 0.0, z: float = 0.0):
+        self.w = w
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __repr__(self):
+        return f'OgreQuaternion({self.w}, {self.x}, {self.y}, {self.z})'
+
+
+class Matrix3:
+    __slots__ = ('rows',)
+
+    def __init__(self, rows: List[List[float]] = None):
+        if rows is None:
+            rows = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+        self.rows = [[float(value) for value in row] for row in rows]
+
+    def __getitem__(self, index: int) -> List[float]:
+        return self.rows[index]
+
+    def __eq__(self, other: 'Matrix3') -> bool:
+        return isinstance(other, Matrix3) and self.rows == other.rows
+
+    __hash__ = None
+
+
+class BoneData:
+    def __init__(
+            self,
+            id: int = 0,
+            name: str = '',
+            position: Vector3 = None,
+            rotate: OgreQuaternion = None,
+            scale: Vector3 = None,
+            parent_name: str = '',
+            child_names: List[str] = None):
+        self.id = id
+        self.name = name
+        self.position = position if position is not None else Vector3()
+        self.rotate = rotate if rotate is not None else OgreQuaternion()
+        self.scale = scale if scale is not None else Vector3(1.0, 1.0, 1.0)
+        self.parent_name = parent_name
+        self.child_names = child_names if child_names is not None else []
+
+
+class BoneAssignmentData:
+    __slots__ = ('vertex_index', 'bone_index', 'weight')
+
+    def __init__(self, vertex_index: int, bone_index: int, weight: float):
+        self.vertex_index = vertex_index
+        self.bone_index = bone_index
+        self.weight = weight
+
+
+class VertexGroupData:
+    __slots__ = ('name', 'group')
+
+    def __init__(self, name: str, group: List[Tuple[List[int], float]]):
+        self.name = name
+        self.group = group
@@ -0,0 +1,192 @@
+
+import struct
+from typing import List
+
+import numpy as np
+
+from .chunks import *
+from .mesh import BONE_ASSIGNMENT_RECORD, POSE_VERTEX_RECORD, VES_POSITION, GeometryData, MeshData, SubMeshData
+from .skeleton import KEY_ROTATE, KEY_SCALE, KEY_TIME, KEY_TRANSLATE, KEYFRAME_RECORD, KEYFRAME_SCALE_RECORD, SkeletonData
+from .types import MeshVersion, SkeletonVersion
+
+
+MESH_VERSION_STRINGS = {
+    MeshVersion.V_Latest: b'[MeshSerializer_v1.100]',
+    MeshVersion.V_1_10: b'[MeshSerializer_v1.100]',
+    MeshVersion.V_1_8: b'[MeshSerializer_v1.8]',
+    MeshVersion.V_1_7: b'[MeshSerializer_v1.41]',
+    MeshVersion.V_1_4: b'[MeshSerializer_v1.40]',
+    MeshVersion.V_1_0: b'[MeshSerializer_v1.30]',
+}
+
+SKELETON_VERSION_STRINGS = {
+    SkeletonVersion.V_1_0: b'[Serializer_v1.10]',
+    SkeletonVersion.V_1_8: b'[Serializer_v1.80]',
+    SkeletonVersion.V_Latest: b'[Serializer_v1.80]',
+}
+
+
+def chunk(chunk_id: int, *parts: bytes) -> bytes:
+    body = b''.join(parts)
+    return struct.pack('<HI', chunk_id, len(body) + CHUNK_HEADER_SIZE) + body
+
+
+def string(value: bytes) -> bytes:
+    return value + b'\n'
+
+
+def chunk_run(chunk_id: int, records: np.ndarray) -> bytes:
+    # Many small chunks of one id packed in a single buffer
+    dtype = np.dtype([('id', '<u2'), ('length', '<u4'), ('record', records.dtype)])
+    chunks = np.empty(len(records), dtype=dtype)
+    chunks['id'] = chunk_id
+    chunks['length'] = dtype.itemsize
+    chunks['record'] = records
+    return chunks.tobytes()
+
+
+class MeshWriter:
+    # Chunk order follows OGRE's MeshSerializerImpl::writeMesh.
+    # Submeshes read from shared geometry are written with their own copy of the vertices.
+    def __init__(self, mesh: MeshData, version: MeshVersion = MeshVersion.V_Latest):
+        if version not in MESH_VERSION_STRINGS:
+            raise OgreFormatError(f'Cannot write mesh version {MeshVersion(version).name}')
+        self.mesh = mesh
+        self.version = MeshVersion(version)
+
+    def write(self) -> bytes:
+        return struct.pack('<H', M_HEADER) + string(MESH_VERSION_STRINGS[self.version]) + self.write_mesh()
+
+    def write_mesh(self) -> bytes:
+        mesh = self.mesh
+        submeshes = mesh.get_submeshes()
+        parts = [struct.pack('<?', len(mesh.skeleton_name) > 0)]
+        parts.extend(self.write_submesh(submesh) for submesh in submeshes)
+        if mesh.skeleton_name:
+            parts.append(chunk(M_MESH_SKELETON_LINK, string(mesh.skeleton_name)))
+        parts.append(self.write_bounds(submeshes))
+        if submeshes:
+            parts.append(chunk(M_SUBMESH_NAME_TABLE,
+                               *(chunk(M_SUBMESH_NAME_TABLE_ELEMENT, struct.pack('<H', index), string(submesh.encorded_name))
+                                 for index, submesh in enumerate(submeshes))))
+        poses = [(index, pose) for index, submesh in enumerate(submeshes) for pose in submesh.poses]
+        if poses:
+            parts.append(self.write_poses(poses))
+        return chunk(M_MESH, *parts)
+
+    def write_submesh(self, submesh: SubMeshData) -> bytes:
+        indices = np.asarray(submesh.indices)
+        use_32bit_indexes = submesh.use_32bit_indexes or (len(indices) > 0 and int(indices.max()) > 0xFFFF)
+        parts = [string(submesh.encorded_material),
+                 struct.pack('<?I?', False, len(indices), use_32bit_indexes),
+                 indices.astype('<u4' if use_32bit_indexes else '<u2').tobytes(),
+                 self.write_geometry(submesh.geometry)]
+        parts.append(chunk(M_SUBMESH_OPERATION, struct.pack('<H', int(submesh.operation_type))))
+        if len(submesh.bone_assignment_array) > 0:
+            parts.append(chunk_run(M_SUBMESH_BONE_ASSIGNMENT, submesh.bone_assignment_array.astype(BONE_ASSIGNMENT_RECORD)))
+        return chunk(M_SUBMESH, *parts)
+
+    def write_geometry(self, geometry: GeometryData) -> bytes:
+        elements = b''.join(chunk(M_GEOMETRY_VERTEX_ELEMENT,
+                                  struct.pack('<5H', element.source, element.type, element.semantic, element.offset, element.index))
+                            for element in geometry.elements)
+        buffers = []
+        for bind_index, (data, vertex_size) in sorted(geometry.buffers.items()):
+            if geometry.vertex_indices is not None:
+                data = np.asarray(data).reshape(-1, vertex_size)[geometry.vertex_indices]
+            buffers.append(chunk(M_GEOMETRY_VERTEX_BUFFER,
+                                 struct.pack('<HH', bind_index, vertex_size),
+                                 chunk(M_GEOMETRY_VERTEX_BUFFER_DATA, np.ascontiguousarray(data).tobytes())))
+        return chunk(M_GEOMETRY,
+                     struct.pack('<I', geometry.vertex_count),
+                     chunk(M_GEOMETRY_VERTEX_DECLARATION, elements),
+                     *buffers)
+
+    def write_bounds(self, submeshes: List[SubMeshData]) -> bytes:
+        positions = [submesh.geometry.read_element(submesh.geometry.find_elements(VES_POSITION)[0])[:, :3]
+                     for submesh in submeshes
+                     if submesh.geometry.vertex_count > 0 and submesh.geometry.has_positions]
+        if positions:
+            positions = np.concatenate(positions).astype(np.float32)
+            minimum = positions.min(axis=0)
+            maximum = positions.max(axis=0)
+            radius = float(np.sqrt((positions.astype(np.float64) ** 2).sum(axis=1).max()))
+        else:
+            minimum = maximum = np.zeros(3, dtype=np.float32)
+            radius = 0.0
+        return chunk(M_MESH_BOUNDS, struct.pack('<7f', *minimum.tolist(), *maximum.tolist(), radius))
+
+    def write_poses(self, poses) -> bytes:
+        # Pose normals were added with the 1.10 format, they are never written
+        has_normal_flag = self.version in (MeshVersion.V_Latest, MeshVersion.V_1_10)
+        parts = []
+        for index, pose in poses:
+            vertices = np.empty(len(pose.vertices), dtype=POSE_VERTEX_RECORD)
+            vertices['vertex'] = pose.vertices
+            vertices['offset'] = pose.offsets
+            parts.append(chunk(M_POSE,
+                               string(pose.name.encode('utf-8')),
+                               struct.pack('<H', index + 1),
+                               struct.pack('<?', False) if has_normal_flag else b'',
+                               chunk_run(M_POSE_VERTEX, vertices)))
+        return chunk(M_POSES, *parts)
+
+
+def write_mesh(mesh: MeshData, version: MeshVersion = MeshVersion.V_Latest) -> bytes:
+    return MeshWriter(mesh, version).write()
+
+
+class SkeletonWriter:
+    # Chunk order follows OGRE's SkeletonSerializer::exportSkeleton
+    def __init__(self, skeleton: SkeletonData, version: SkeletonVersion = SkeletonVersion.V_Latest):
+        self.skeleton = skeleton
+        self.version = SkeletonVersion(version)
+
+    def write(self) -> bytes:
+        skeleton = self.skeleton
+        bones = sorted(skeleton.bones, key=lambda bone: bone.id)
+        handles = {bone.name: bone.id for bone in bones}
+        parts = [struct.pack('<H', SKELETON_HEADER), string(SKELETON_VERSION_STRINGS[self.version])]
+        if self.version != SkeletonVersion.V_1_0:
+            parts.append(chunk(SKELETON_BLENDMODE, struct.pack('<H', skeleton.blend_mode)))
+        for bone in bones:
+            scale = (bone.scale.x, bone.scale.y, bone.scale.z)
+            parts.append(chunk(SKELETON_BONE,
+                               string(bone.name.encode('utf-8')),
+                               struct.pack('<H3f4f', bone.id,
+                                           bone.position.x, bone.position.y, bone.position.z,
+                                           bone.rotate.x, bone.rotate.y, bone.rotate.z, bone.rotate.w),
+                               struct.pack('<3f', *scale) if scale != (1.0, 1.0, 1.0) else b''))
+        for bone in bones:
+            if bone.parent_name in handles:
+                parts.append(chunk(SKELETON_BONE_PARENT, struct.pack('<HH', bone.id, handles[bone.parent_name])))
+        for animation in skeleton.animations:
+            tracks = sorted((handles[name], keys) for name, keys in animation.tracks.items() if name in handles)
+            parts.append(chunk(SKELETON_ANIMATION,
+                               string(animation.name.encode('utf-8')),
+                               struct.pack('<f', animation.length),
+                               *(chunk(SKELETON_ANIMATION_TRACK, struct.pack('<H', handle), self.write_keyframes(keys))
+                                 for handle, keys in tracks)))
+        for name, scale in skeleton.animation_links:
+            parts.append(chunk(SKELETON_ANIMATION_LINK, string(name), struct.pack('<f', scale)))
+        return b''.join(parts)
+
+    def write_keyframes(self, keys: np.ndarray) -> bytes:
+        # As OGRE, scale is written only for keys whose scale is not one. Each run of one key size is packed at once
+        has_scale = np.any(keys[:, KEY_SCALE] != 1.0, axis=1)
+        starts = np.flatnonzero(np.diff(has_scale, prepend=~has_scale[:1]))
+        runs = []
+        for start, end in zip(starts, np.r_[starts[1:], len(keys)]):
+            run = keys[start:end]
+            records = np.empty(len(run), dtype=KEYFRAME_SCALE_RECORD if has_scale[start] else KEYFRAME_RECORD)
+            records['time'] = run[:, KEY_TIME]
+            records['rotate'] = run[:, KEY_ROTATE][:, [1, 2, 3, 0]]
+            records['translate'] = run[:, KEY_TRANSLATE]
+            if has_scale[start]:
+                records['scale'] = run[:, KEY_SCALE]
+            runs.append(chunk_run(SKELETON_ANIMATION_TRACK_KEYFRAME, records))
+        return b''.join(runs)
+
+
+def write_skeleton(skeleton: SkeletonData, version: SkeletonVersion = SkeletonVersion.V_Latest) -> bytes:
+    return SkeletonWriter(skeleton, version).write()
@@ -1,6 +1,10 @@
 
 import os
+import json
+from functools import partial
 from math import radians
+import subprocess
+import tempfile
 import traceback
 from typing import List, Dict, Tuple, Set
 
@@ -9,17 +13,28 @@ import bpy
 import bmesh
 from mathutils import Matrix
 
-from .util import func_timer
-from kenshi_blender_tool import *
+from .profiler import count, iter_spans, profile, span
+from .bone_math import BoneHierarchy, decompose_matrices, matrix_to_quaternion, rest_tracks, select_keyframes
+from .fcurve_math import read_fcurve, evaluate_keyframes
+from .bake_worker import BakeLayout, bake_frames, reset_pose
+from .bake_context import BakedTracks, action_fingerprint, bake_context
+try:
+    from kenshi_blender_tool import *
+except ImportError:
+    # The native wheel only exists for Windows
+    from .ogre_codec import *
 
 
-@func_timer
+@profile
 def collect_animations(
         context: bpy.types.Context, 
         export_info_log: List[str],
         skeleton_data: SkeletonData,
         armature: bpy.types.Object,
-        use_scale_keyframe: bool = False):
+        use_scale_keyframe: bool = False,
+        reduce_keyframes: bool = False,
+        reduce_position_tolerance: float = 0.001,
+        reduce_angle_tolerance: float = radians(0.05)):
     bones = skeleton_data.get_bones(has_helper=False)
     if len(bones) == 0:
         return
@@ -76,7 +91,7 @@ def collect_animations(
         fps = context.scene.render.fps
         frame_step = context.scene.frame_step
 
-        for act in sorted(actions, key=lambda action: action.name):
+        for act in iter_spans('action', sorted(actions, key=lambda action: action.name), lambda act: act.name):
             strip: bpy.types.ActionKeyframeStrip = act.layers[0].strips[0]
             target_channelbag: bpy.types.ActionChannelbag = strip.channelbags[0]
             for channelbag in strip.channelbags.values():
@@ -88,6 +103,7 @@ def collect_animations(
             animation = AnimationData()
             animation.name = act.name
             animation.length = (int(end) - int(start)) / fps
+            count(actions=1, frames=int(end) - int(start) + 1)
             collect_tracks(animation=animation,
                            fcurves=target_channelbag.fcurves, 
                            bone_path_map=bone_path_map,
@@ -96,7 +112,9 @@ def collect_animations(
                            frame_end=end,
                            step=frame_step,
                            fps=fps,
-                           use_scale_keyframe=use_scale_keyframe)
+                           use_scale_keyframe=use_scale_keyframe,
+                           reduce_tolerances=(reduce_position_tolerance, reduce_angle_tolerance) if reduce_keyframes else None,
+                           export_info_log=export_info_log)
             skeleton_data.add_animation(animation)
 
 
@@ -109,57 +127,102 @@ def collect_tracks(
         frame_end: float,
         step: int = 1,
         fps: int = 24,
-        use_scale_keyframe: bool = False):
+        use_scale_keyframe: bool = False,
+        reduce_tolerances: Tuple[float, float] = None,
+        export_info_log: List[str] = None):
     fcurves_find = fcurves.find
     start = int(frame_start)
     end = int(frame_end) + 1
-    frame_size = end - start
-
-    nd_array = np.arange(start, end, step, dtype=np.float32)
-    nd_times = (nd_array - start) / fps
-    nd_ones = np.ones(frame_size, dtype=np.float32)
-    nd_zeros = np.zeros(frame_size, dtype=np.float32)
-    for bone_name, path in bone_path_map.items():
-        fc_loc_x, fc_loc_y, fc_loc_z = [fcurves_find(data_path=path[0], index=i) for i in range(3)]
-        nd_loc_x = np.frompyfunc(fc_loc_x.evaluate, 1, 1)(nd_array) if fc_loc_x else nd_zeros
-        nd_loc_y = np.frompyfunc(fc_loc_y.evaluate, 1, 1)(nd_array) if fc_loc_y else nd_zeros
-        nd_loc_z = np.frompyfunc(fc_loc_z.evaluate, 1, 1)(nd_array) if fc_loc_z else nd_zeros
-
-        fc_rot_w, fc_rot_x, fc_rot_y, fc_rot_z = [fcurves_find(data_path=path[1], index=i) for i in range(4)]
-        nd_rot_w = np.frompyfunc(fc_rot_w.evaluate, 1, 1)(nd_array) if fc_rot_w else nd_ones
-        nd_rot_x = np.frompyfunc(fc_rot_x.evaluate, 1, 1)(nd_array) if fc_rot_x else nd_zeros
-        nd_rot_y = np.frompyfunc(fc_rot_y.evaluate, 1, 1)(nd_array) if fc_rot_y else nd_zeros
-        nd_rot_z = np.frompyfunc(fc_rot_z.evaluate, 1, 1)(nd_array) if fc_rot_z else nd_zeros
-
-        fc_scl_x, fc_scl_y, fc_scl_z = [fcurves_find(data_path=path[2], index=i) for i in range(3)]
-        nd_scl_x = np.frompyfunc(fc_scl_x.evaluate, 1, 1)(nd_array) if fc_scl_x else nd_ones
-        nd_scl_y = np.frompyfunc(fc_scl_y.evaluate, 1, 1)(nd_array) if fc_scl_y else nd_ones
-        nd_scl_z = np.frompyfunc(fc_scl_z.evaluate, 1, 1)(nd_array) if fc_scl_z else nd_ones
-
-        nd_locs = np.vstack([nd_loc_x, nd_loc_y, nd_loc_z])
-        nd_rots = np.vstack([nd_rot_w, nd_rot_x, nd_rot_y, nd_rot_z])
-        nd_scls = np.vstack([nd_scl_x, nd_scl_y, nd_scl_z])
+
+    nd_array = np.arange(start, end, step, dtype=np.float64)
+    nd_times = ((nd_array - start) / fps).astype(np.float32)
+
+    def sample(data_path: str, index: int, default: float) -> np.ndarray:
+        fcurve = fcurves_find(data_path=data_path, index=index)
+        if not fcurve:
+            return np.full(len(nd_array), default)
+        curve = read_fcurve(fcurve)
+        if curve is None:
+            # Modifiers or easing the NumPy sampler does not reproduce
+            count(evaluated_fcurves=1)
+            evaluate = fcurve.evaluate
+            return np.array([evaluate(frame) for frame in nd_array.tolist()])
+        count(sampled_fcurves=1)
+        return evaluate_keyframes(curve, nd_array)
+
+    bone_names = list(bone_path_map.keys())
+    paths = bone_path_map.values()
+    # (bones, frames, channels)
+    locations = np.array([[sample(path[0], i, 0.0) for i in range(3)] for path in paths]).reshape(-1, 3, len(nd_array)).transpose(0, 2, 1)
+    rotations = np.array([[sample(path[1], i, 1.0 if i == 0 else 0.0) for i in range(4)] for path in paths]).reshape(-1, 4, len(nd_array)).transpose(0, 2, 1)
+    scales = np.array([[sample(path[2], i, 1.0) for i in range(3)] for path in paths]).reshape(-1, 3, len(nd_array)).transpose(0, 2, 1)
+    append_tracks(animation=animation,
+                  bone_names=bone_names,
+                  fix_matrix=fix_matrix,
+                  nd_times=nd_times,
+                  locations=locations,
+                  rotations=rotations,
+                  scales=scales,
+                  use_scale_keyframe=use_scale_keyframe,
+                  reduce_tolerances=reduce_tolerances,
+                  export_info_log=export_info_log)
+
+
+def append_tracks(
+        animation: AnimationData,
+        bone_names: List[str],
+        fix_matrix: Dict[str, Matrix3],
+        nd_times: np.ndarray,
+        locations: np.ndarray,
+        rotations: np.ndarray,
+        scales: np.ndarray,
+        use_scale_keyframe: bool = False,
+        reduce_tolerances: Tuple[float, float] = None,
+        export_info_log: List[str] = None):
+    # Blender pose channels (bones, frames, channels), optionally without the keys OGRE can interpolate back
+    keep = np.ones(locations.shape[:2], dtype=bool)
+    if reduce_tolerances:
+        position_tolerance, angle_tolerance = reduce_tolerances
+        # Scale keys are only written with use_scale_keyframe
+        scale_tolerance = position_tolerance if use_scale_keyframe else np.inf
+        with span('reduce keyframes'):
+            keep = select_keyframes(nd_times, locations, rotations, scales, position_tolerance, angle_tolerance, scale_tolerance)
+            keep[rest_tracks(locations, rotations, scales, position_tolerance, angle_tolerance, scale_tolerance)] = False
+        keys_before = keep.size
+        keys_after = int(np.count_nonzero(keep))
+        count(keys_before=keys_before, keys_after=keys_after)
+        if export_info_log is not None:
+            export_info_log.append(f'Reduced {animation.name} keyframes from {keys_before} to {keys_after}, '
+                                   f'{int(np.count_nonzero(~keep.any(axis=1)))} of {len(bone_names)} tracks dropped')
+
+    for bone_index, bone_name in enumerate(bone_names):
+        frames = keep[bone_index]
+        if not frames.any():
+            continue
         animation.append_animation_track(bone_name=bone_name,
                                          bone_matrix=fix_matrix[bone_name],
-                                         nd_times=nd_times,
-                                         nd_locations=nd_locs,
-                                         nd_rotations=nd_rots,
-                                         nd_scales=nd_scls,
+                                         nd_times=nd_times[frames],
+                                         nd_locations=np.ascontiguousarray(locations[bone_index, frames].T, dtype=np.float32),
+                                         nd_rotations=np.ascontiguousarray(rotations[bone_index, frames].T, dtype=np.float32),
+                                         nd_scales=np.ascontiguousarray(scales[bone_index, frames].T, dtype=np.float32),
                                          use_scale=use_scale_keyframe)
 
 
-@func_timer
+@profile
 def collect_bake_animations(
         context: bpy.types.Context, 
         export_info_log: List[str],
         skeleton_data: SkeletonData,
         armature: bpy.types.Object,
-        use_scale_keyframe: bool = False):
+        use_scale_keyframe: bool = False,
+        reduce_keyframes: bool = False,
+        reduce_position_tolerance: float = 0.001,
+        reduce_angle_tolerance: float = radians(0.05),
+        bake_workers: int = 0):
     bones = skeleton_data.get_bones(has_helper=False)
     if len(bones) == 0:
         return
 
-    scene_layer = context.view_layer
     animdata = armature.animation_data
     if animdata:
         actions: Set[bpy.types.Action] = set()
@@ -169,142 +232,169 @@ def collect_bake_animations(
         if animdata.action:
             actions.add(animdata.action)
 
-        temp_armature: bpy.types.Object = armature.copy()
-        temp_scene = context.blend_data.scenes.new('bake_work')
+        bone_names = [bone.name for bone in bones]
+        with span('bake context'):
+            has_fix_matrix = bake_context.prepare(armature, bone_names)
+        fps = context.scene.render.fps
+        frame_step = context.scene.frame_step
+        sorted_actions = sorted(actions, key=lambda action: action.name)
+        slots = {act.name: act.slots.get(f'OB{armature.name}', default=act.slots[0]) for act in sorted_actions}
+        # Actions baked by an earlier export with the same armature, keyframes, frame range and step are not baked again
+        keys = {act.name: bake_context.track_key(action_fingerprint(act, slots[act.name], frame_step)) for act in sorted_actions}
+        baked_tracks: Dict[str, BakedTracks] = {}
+        for act in sorted_actions:
+            tracks = bake_context.get_tracks(keys[act.name])
+            if tracks is not None:
+                baked_tracks[act.name] = tracks
+        count(cached_actions=len(baked_tracks))
+
+        pending_actions = [act for act in sorted_actions if act.name not in baked_tracks]
         try:
-            temp_animdata = temp_armature.animation_data
-            for track in temp_animdata.nla_tracks:
-                temp_animdata.nla_tracks.remove(track)
-            context.scene.collection.objects.link(temp_armature)
-
-            hidden = temp_armature.hide_viewport
-            temp_armature.hide_viewport = False
-            prev = scene_layer.objects.active
-            scene_layer.objects.active = temp_armature
-            bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
-            bpy.ops.object.mode_set(mode='EDIT', toggle=False)
-
-            fix1 = Matrix([
-                (1, 0, 0),
-                (0, 0, 1),
-                (0, -1, 0)
-                ])
-            fix2 = Matrix([
-                (0, 1, 0),
-                (0, 0, 1),
-                (1, 0, 0)
-                ])
-            fix_matrix = {}
-            target_pose_bones = {}
-            p_bones = temp_armature.pose.bones
-            e_bones = temp_armature.data.edit_bones
-            for bone in bones:
-                p_bone = p_bones[bone.name]
-                e_bone = e_bones[bone.name]
-                m = fix2 @ e_bone.parent.matrix.to_3x3().transposed() @ e_bone.matrix.to_3x3() if e_bone.parent else fix1 @  e_bone.matrix.to_3x3()
-                fix_matrix[bone.name] = Matrix3([
-                    [m[0][0], m[0][1], m[0][2]],
-                    [m[1][0], m[1][1], m[1][2]],
-                    [m[2][0], m[2][1], m[2][2]]
-                    ])
-                target_pose_bones[bone.name] = p_bone
-
-            bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
-            scene_layer.objects.active = prev
-            temp_armature.hide_viewport = hidden
-
-            fps = context.scene.render.fps
-            frame_step = context.scene.frame_step
-
-            bone_conut = len(p_bones)
-            init_vector_zeros = [0, 0, 0] * bone_conut
-            init_quaternions = [1, 0, 0, 0] * bone_conut
-            init_vector_ones = [1, 1, 1] * bone_conut
-
-            temp_scene_layer = temp_scene.view_layers[0]
-            temp_scene.collection.objects.link(temp_armature)
-            for bone in p_bones:
-                for contraint in bone.constraints:
-                    if hasattr(contraint, 'target') and temp_scene.collection.objects.find(contraint.target.name) == -1:
-                        temp_scene.collection.objects.link(contraint.target)
-
-            temp_scene.render.fps = fps
-            temp_scene.frame_step = frame_step
-
-            p_bones_foreach_set = p_bones.foreach_set
-            for act in sorted(actions, key=lambda action: action.name):
-                slot = act.slots.get(f'OB{armature.name}', default=act.slots[0])
+            if pending_actions or not has_fix_matrix:
+                # The bake scene is built for this export only and removed below
+                with span('bake scene'):
+                    bake_context.build(context, armature, bone_names)
+                count(bake_scenes=1)
+                temp_scene = bake_context.scene
+                temp_scene.render.fps = fps
+                temp_scene.frame_step = frame_step
+                if bake_workers > 1 and len(pending_actions) > 1:
+                    with span('bake workers'):
+                        worker_tracks = bake_in_workers(scene=temp_scene,
+                                                        armature=bake_context.armature,
+                                                        bone_names=bone_names,
+                                                        actions=pending_actions,
+                                                        slots=slots,
+                                                        step=frame_step,
+                                                        workers=bake_workers)
+                    for name, tracks in worker_tracks.items():
+                        bake_context.put_tracks(keys[name], tracks)
+                    baked_tracks.update(worker_tracks)
+            fix_matrix = bake_context.fix_matrix
+
+            for act in iter_spans('action', sorted_actions, lambda act: act.name):
+                slot = slots[act.name]
                 export_info_log.append(f'Export action {act.name}, slot {slot.name_display}')
                 start, end = act.frame_range
                 animation = AnimationData()
                 animation.name = act.name
                 animation.length = (int(end) - int(start)) / fps
-
-                p_bones_foreach_set('location', init_vector_zeros)
-                p_bones_foreach_set('rotation_quaternion', init_quaternions)
-                p_bones_foreach_set('rotation_euler', init_vector_zeros)
-                p_bones_foreach_set('scale', init_vector_ones)
-                temp_animdata.action = act
-                temp_animdata.action_slot = slot
-                temp_scene_layer.update()
-
-                collect_bake_tracks(scene=temp_scene,
-                                    animation=animation,
-                                    armature=temp_armature,
-                                    pose_bones=target_pose_bones,
-                                    fix_matrix=fix_matrix,
-                                    frame_start=start,
-                                    frame_end=end,
-                                    step=frame_step,
-                                    fps=fps,
-                                    use_scale_keyframe=use_scale_keyframe)
+                count(actions=1, frames=int(end) - int(start) + 1)
+
+                tracks = baked_tracks.get(act.name)
+                if tracks is None:
+                    temp_armature = bake_context.armature
+                    temp_animdata = temp_armature.animation_data
+                    reset_pose(temp_armature)
+                    temp_animdata.action = act
+                    temp_animdata.action_slot = slot
+                    temp_scene.view_layers[0].update()
+                    tracks = collect_bake_tracks(scene=temp_scene,
+                                                 armature=temp_armature,
+                                                 layout=bake_context.layout,
+                                                 frame_start=start,
+                                                 frame_end=end,
+                                                 step=frame_step)
+                    bake_context.put_tracks(keys[act.name], tracks)
+
+                locations, rotations, scales = tracks
+                append_tracks(animation=animation,
+                              bone_names=bone_names,
+                              fix_matrix=fix_matrix,
+                              nd_times=((np.arange(int(start), int(end) + 1, frame_step) - int(start)) / fps).astype(np.float32),
+                              locations=locations,
+                              rotations=rotations,
+                              scales=scales,
+                              use_scale_keyframe=use_scale_keyframe,
+                              reduce_tolerances=(reduce_position_tolerance, reduce_angle_tolerance) if reduce_keyframes else None,
+                              export_info_log=export_info_log)
                 skeleton_data.add_animation(animation)
-
-            p_bones_foreach_set('location', init_vector_zeros)
-            p_bones_foreach_set('rotation_quaternion', init_quaternions)
-            p_bones_foreach_set('rotation_euler', init_vector_zeros)
-            p_bones_foreach_set('scale', init_vector_ones)
         finally:
-            context.blend_data.scenes.remove(temp_scene)
-            bpy.data.objects.remove(temp_armature)
+            bake_context.release()
 
 
 def collect_bake_tracks(
         scene: bpy.types.Scene,
-        animation: AnimationData,
         armature: bpy.types.Object,
-        pose_bones: Dict[str, bpy.types.PoseBone],
-        fix_matrix: Dict[str, Matrix3],
+        layout: BakeLayout,
         frame_start: float,
         frame_end: float,
-        step: int = 1,
-        fps: int = 24,
-        use_scale_keyframe: bool = False):
-    armature_convert_space = armature.convert_space
-    start = int(frame_start)
-    end = int(frame_end) + 1
+        step: int = 1) -> BakedTracks:
+    nd_array = np.arange(int(frame_start), int(frame_end) + 1, step, dtype=np.float64)
+    local_matrices = bake_frames(scene, armature, layout, nd_array)
+    count(pose_captures=len(nd_array), converted_bones=len(layout.converted_bones) * len(nd_array))
 
-    times: List[float] = []
-    times_append = times.append
-    matrix_dict: Dict[str, List[List[float]]] = {name: [] for name in pose_bones.keys()}
-    pose_bones_items = pose_bones.items()
-    scene_frame_set = scene.frame_set
-
-    for frame in range(start, end, step):
-        scene_frame_set(frame)
-        times_append((frame - start) / fps)
-        for name, pbone in pose_bones_items:
-            mat = armature_convert_space(pose_bone=pbone,
-                                         matrix=pbone.matrix,
-                                         from_space='POSE',
-                                         to_space='LOCAL')
-            matrix_dict[name].append([list(row) for row in mat])
-    animation.set_animation_tracks(bone_matrix_map=fix_matrix,
-                                   pose_matrix_map=matrix_dict,
-                                   time_array=times,
-                                   use_scale=use_scale_keyframe)
+    locations, rotations, scales = decompose_matrices(local_matrices.transpose(1, 0, 2, 3))
+    return locations.astype(np.float32), rotations.astype(np.float32), scales.astype(np.float32)
 
 
+def bake_in_workers(
+        scene: bpy.types.Scene,
+        armature: bpy.types.Object,
+        bone_names: List[str],
+        actions: List[bpy.types.Action],
+        slots: Dict[str, bpy.types.ActionSlot],
+        step: int,
+        workers: int) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    # Bake the actions in background Blender processes, each from its own copy of the bake scene.
+    # Returns action name -> (locations, rotations, scales) in the layout collect_bake_tracks produces
+    workers = min(workers, len(actions))
+    shards: List[List[dict]] = [[] for _ in range(workers)]
+    loads = [0] * workers
+    # Longest actions first, each to the worker with the fewest frames so far
+    for index, act in sorted(enumerate(actions), key=lambda item: item[1].frame_range[0] - item[1].frame_range[1]):
+        start, end = act.frame_range
+        worker = loads.index(min(loads))
+        loads[worker] += int(end) - int(start) + 1
+        shards[worker].append({'index': index,
+                               'action': act.name,
+                               'slot': slots[act.name].identifier,
+                               'start': int(start),
+                               'end': int(end) + 1})
+
+    with tempfile.TemporaryDirectory(prefix='kenshi_bake_') as directory:
+        blend_path = os.path.join(directory, 'bake.blend')
+        with span('write blend'):
+            bpy.data.libraries.write(blend_path, {scene, *actions}, fake_user=True)
+
+        command = [bpy.app.binary_path, '--background', '--factory-startup']
+        if bpy.context.preferences.filepaths.use_scripts_auto_execute:
+            command.append('--enable-autoexec')
+        command.extend([blend_path, '--python-exit-code', '1',
+                        '--python', os.path.join(os.path.dirname(os.path.realpath(__file__)), 'bake_worker.py'), '--'])
+
+        processes = []
+        try:
+            for worker, shard in enumerate(shards):
+                job_path = os.path.join(directory, f'job{worker}.json')
+                with open(job_path, 'w', encoding='utf-8') as f:
+                    json.dump({'scene': scene.name,
+                               'armature': armature.name,
+                               'bones': bone_names,
+                               'step': step,
+                               'output': directory,
+                               'actions': shard}, f)
+                log_path = os.path.join(directory, f'job{worker}.log')
+                with open(log_path, 'wb') as log:
+                    processes.append((subprocess.Popen(command + [job_path], stdout=log, stderr=subprocess.STDOUT), log_path))
+            for process, log_path in processes:
+                if process.wait() != 0:
+                    with open(log_path, encoding='utf-8', errors='replace') as f:
+                        raise RuntimeError(f'Bake worker failed with exit code {process.returncode}\n{f.read()[-2000:]}')
+        finally:
+            for process, _ in processes:
+                if process.poll() is None:
+                    process.kill()
+        count(bake_workers=len(processes))
+
+        baked_tracks = {}
+        for index, act in enumerate(actions):
+            with np.load(os.path.join(directory, f'{index}.npz')) as tracks:
+                baked_tracks[act.name] = (tracks['locations'], tracks['rotations'], tracks['scales'])
+    return baked_tracks
+
+
+@profile
 def collect_mesh(
         operator: bpy.types.Operator,
         context: bpy.types.Context,
@@ -319,7 +409,7 @@ def collect_mesh(
         num_fake_pose: int = 0):
 
     submesh_array: List[SubMeshData] = []
-    for submesh_index, ob in enumerate(selected_objects):
+    for submesh_index, ob in iter_spans('submesh', enumerate(selected_objects), lambda item: item[1].name):
         submesh = SubMeshData()
         submesh.index = submesh_index
         submesh.submesh_name = ob.name
@@ -353,6 +443,7 @@ def collect_mesh(
         mesh.loops.foreach_get('index', nd_loop_indices)
 
         vertex_count = len(mesh.vertices)
+        count(objects=1, vertices=vertex_count, loops=loop_count)
 
         nd_positions = np.empty(vertex_count * 3, dtype=np.float32)
         mesh.vertices.foreach_get('co', nd_positions)
@@ -416,18 +507,19 @@ def collect_mesh(
                     nd_alphas = nd_alphas.reshape(-1, 4)
                     break
 
-        out_nd_indices = submesh.set_vertex(nd_vert_indices=nd_vert_indices,
-                                            nd_loop_indices=nd_loop_indices,
-                                            nd_positions=nd_positions,
-                                            nd_normals=nd_normals,
-                                            nd_tangents=nd_tangents,
-                                            nd_bitangent_signs=nd_bitangent_signs,
-                                            nd_bitangents=nd_bitangents,
-                                            nd_texcoords=nd_texcoords,
-                                            nd_colors=nd_colors,
-                                            nd_alphas=nd_alphas,
-                                            tangent_dimensions=tangent_dimensions,
-                                            optimize=optimize)
+        with span('set vertex'):
+            out_nd_indices = submesh.set_vertex(nd_vert_indices=nd_vert_indices,
+                                                nd_loop_indices=nd_loop_indices,
+                                                nd_positions=nd_positions,
+                                                nd_normals=nd_normals,
+                                                nd_tangents=nd_tangents,
+                                                nd_bitangent_signs=nd_bitangent_signs,
+                                                nd_bitangents=nd_bitangents,
+                                                nd_texcoords=nd_texcoords,
+                                                nd_colors=nd_colors,
+                                                nd_alphas=nd_alphas,
+                                                tangent_dimensions=tangent_dimensions,
+                                                optimize=optimize)
 
         if export_poses and mesh.shape_keys and mesh.shape_keys.key_blocks:
             for shape_key in mesh.shape_keys.key_blocks:
@@ -451,18 +543,17 @@ def collect_mesh(
                 for i in range(1, num_fake_pose + 1):
                     submesh.append_shapekey(f'fake_pose{i}', nd_shape_keys, out_nd_indices)
 
-        bone_assignments = [BoneAssignmentData(vert.index,
-                                               mesh_data.get_bone_id(ob.vertex_groups[group.group].name),
-                                               group.weight)
-                                               for vert in mesh.vertices
-                                               for group in vert.groups]
-
-        for ba in bone_assignments:
-            if ba.bone_index >= 65535:
+        with span('bone assignments'):
+            nd_vertices, nd_bones, nd_weights = collect_weights(mesh, ob.vertex_groups, mesh_data)
+            count(bone_assignments=len(nd_weights))
+            if np.any(nd_bones >= 65535):
                 operator.report({'WARNING'}, 'Invalid vertex group detected. Check for bones and OGREID')
-                break
-
-        submesh.set_bone_assignments(bone_assignments, out_nd_indices)
+            if hasattr(submesh, 'set_bone_assignment_arrays'):
+                submesh.set_bone_assignment_arrays(nd_vertices, nd_bones, nd_weights, out_nd_indices)
+            else:
+                bone_assignments = [BoneAssignmentData(vertex, bone, weight)
+                                    for vertex, bone, weight in zip(nd_vertices.tolist(), nd_bones.tolist(), nd_weights.tolist())]
+                submesh.set_bone_assignments(bone_assignments, out_nd_indices)
 
         temp_object.to_mesh_clear()
 
@@ -472,6 +563,23 @@ def collect_mesh(
     mesh_data.set_submeshes(submesh_array)
 
 
+def collect_weights(
+        mesh: bpy.types.Mesh,
+        vertex_groups: bpy.types.VertexGroups,
+        mesh_data: MeshData) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Every vertex group weight as vertex index, bone id and weight arrays.
+    # Groups without a bone, and group indices past the object's groups, get bone id 65535.
+    bone_table = np.array([mesh_data.get_bone_id(vertex_group.name) for vertex_group in vertex_groups] + [65535], dtype=np.int64)
+    # One pass over the group elements, each is read as soon as it is visited
+    nd_elements = np.fromiter(((vert.index, element.group, element.weight)
+                               for vert in mesh.vertices
+                               for element in vert.groups),
+                              dtype=[('vertex', np.int64), ('group', np.int64), ('weight', np.float32)])
+    nd_bones = bone_table[np.minimum(nd_elements['group'], len(bone_table) - 1)]
+    return nd_elements['vertex'], nd_bones, nd_elements['weight']
+
+
+@profile
 def collect_bones(
         export_info_log: List[str],
         mesh_data: MeshData,
@@ -487,9 +595,16 @@ def collect_bones(
         rot = Matrix.Rotation(radians(-90), 4, 'X')    # Rotate to y-up coordinates
         fix = Matrix.Rotation(radians(90), 4, 'Z') @ Matrix.Rotation(radians(180), 4, 'X')    # Fix bone axis
 
-        bone_id_max = max([bone['OGREID'] for bone in data.bones if 'OGREID' in bone])
+        data_bones = data.bones
+        hierarchy = BoneHierarchy.from_armature_bones(data_bones)
+        nd_rests = np.array(rot) @ np.array([bone.matrix_local for bone in data_bones]).reshape(-1, 4, 4) @ np.array(fix @ rot)
+        nd_rests = hierarchy.to_local(nd_rests)
+        nd_locations = nd_rests[:, :3, 3].tolist()
+        nd_rotations = matrix_to_quaternion(nd_rests).tolist()
+
+        bone_id_max = max([bone['OGREID'] for bone in data_bones if 'OGREID' in bone])
         index = 0
-        for bone in data.bones:
+        for bone, (loc_x, loc_y, loc_z), (rot_w, rot_x, rot_y, rot_z) in zip(data_bones, nd_locations, nd_rotations):
             if 'OGREID' in bone:
                 id = bone['OGREID']
             else:
@@ -499,10 +614,6 @@ def collect_bones(
                 else:
                     continue
 
-            rest: Matrix = (bone.parent.matrix_local @ fix @ rot).inverted() @ bone.matrix_local @ fix @ rot if bone.parent else rot @ bone.matrix_local @ fix @ rot
-            loc_x, loc_y, loc_z = rest.to_translation()
-            rot_w, rot_x, rot_y, rot_z = rest.to_quaternion()
-
             old_bone = BoneData(id,
                                 bone.name,
                                 Vector3(loc_x, loc_y, loc_z),
@@ -514,6 +625,7 @@ def collect_bones(
             export_info_log.append(f'Export bone {id} {bone.name}')
             bones.append(old_bone)
 
+        count(bones=len(bones))
         if export_skeleton:
             for i, bone in enumerate(sorted(bones, key=lambda bone: bone.id)): # Renumbering bone ID
                 bone.id = i
@@ -526,7 +638,7 @@ def collect_bones(
             mesh_data.set_linked_skeleton_name(f'{armature.name}.skeleton')
 
 
-@func_timer
+@profile
 def save(
         operator: bpy.types.Operator,
         context: bpy.types.Context,
@@ -543,7 +655,11 @@ def save(
         export_version: str = 'V_1_10',
         is_visual_keying: bool = False,
         use_scale_keyframe: bool = False,
-        num_fake_pose: int = 0):
+        reduce_keyframes: bool = False,
+        reduce_position_tolerance: float = 0.001,
+        reduce_angle_tolerance: float = radians(0.05),
+        num_fake_pose: int = 0,
+        bake_workers: int = 0):
     if export_version == 'V_1_8':
         mesh_version = MeshVersion.V_1_8
         skeleton_version = SkeletonVersion.V_Latest
@@ -617,18 +733,23 @@ def save(
 
         if skeleton_data:
             if export_animation:
-                collect_anim_func = collect_bake_animations if is_visual_keying else collect_animations
+                collect_anim_func = partial(collect_bake_animations, bake_workers=bake_workers) if is_visual_keying else collect_animations
                 collect_anim_func(context=context,
                                   export_info_log=export_info_log,
                                   skeleton_data=skeleton_data,
                                   armature=armature,
-                                  use_scale_keyframe=use_scale_keyframe)
+                                  use_scale_keyframe=use_scale_keyframe,
+                                  reduce_keyframes=reduce_keyframes,
+                                  reduce_position_tolerance=reduce_position_tolerance,
+                                  reduce_angle_tolerance=reduce_angle_tolerance)
             mesh_data.set_linked_skeleton_name(skel_filename)
 
-        serializer.save_mesh(mesh_data, filepath, mesh_version)
+        with span('write mesh'):
+            serializer.save_mesh(mesh_data, filepath, mesh_version)
 
         if skeleton_data:
-            serializer.save_skeleton(skeleton_data, os.path.join(folder, skel_filename), skeleton_version)
+            with span('write skeleton'):
+                serializer.save_skeleton(skeleton_data, os.path.join(folder, skel_filename), skeleton_version)
 
         print('\n'.join(export_info_log))
         print('done.')
@@ -642,7 +763,7 @@ def save(
     return {'FINISHED'}
 
 
-@func_timer
+@profile
 def save_skeleton(
         operator: bpy.types.Operator,
         context: bpy.types.Context,
@@ -652,7 +773,11 @@ def save_skeleton(
         export_all_bones: bool = False,
         export_version: str = 'V_1_10',
         is_visual_keying: bool = False,
-        use_scale_keyframe: bool = False):
+        use_scale_keyframe: bool = False,
+        reduce_keyframes: bool = False,
+        reduce_position_tolerance: float = 0.001,
+        reduce_angle_tolerance: float = radians(0.05),
+        bake_workers: int = 0):
     if export_version == 'V_1_4':
         skeleton_version = SkeletonVersion.V_1_0
     else:
@@ -702,13 +827,17 @@ def save_skeleton(
 
         if armature:
             if export_animation:
-                collect_anim_func = collect_bake_animations if is_visual_keying else collect_animations
+                collect_anim_func = partial(collect_bake_animations, bake_workers=bake_workers) if is_visual_keying else collect_animations
                 collect_anim_func(context=context,
                                   export_info_log=export_info_log,
                                   skeleton_data=skeleton_data,
                                   armature=armature,
-                                  use_scale_keyframe=use_scale_keyframe)
-            serializer.save_skeleton(skeleton_data, filepath, skeleton_version)
+                                  use_scale_keyframe=use_scale_keyframe,
+                                  reduce_keyframes=reduce_keyframes,
+                                  reduce_position_tolerance=reduce_position_tolerance,
+                                  reduce_angle_tolerance=reduce_angle_tolerance)
+            with span('write skeleton'):
+                serializer.save_skeleton(skeleton_data, filepath, skeleton_version)
 
         print('\n'.join(export_info_log))
         print('done.')
@@ -1,105 +1,69 @@
 
+import fnmatch
+import hashlib
+import importlib
+import json
+import multiprocessing
 import os
-from statistics import mean
+import sys
 import traceback
-from typing import List, Dict, Set
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from itertools import chain
+from typing import List, Dict, Set, Tuple
 
 import bpy
-import bmesh
 from bpy.types import (
     Context,
-    Mesh,
     Object,
     Operator,
     )
 from mathutils import Matrix, Vector
 import numpy as np
 
-from .util import func_timer
-from kenshi_blender_tool import *
+from .profiler import count, iter_spans, profile, span
+from .asset_cache import asset_cache, disk_cache, file_hash
+from .bone_math import BoneHierarchy, bone_data_transforms, resample_linear, resample_quaternions, split_keyframes
+from .mesh_math import keep_face_groups, no_weld, weld_vertices
+try:
+    from kenshi_blender_tool import *
+except ImportError:
+    # The native wheel only exists for Windows
+    from .ogre_codec import *
 
 
-def set_bone_head_position(bones: List[BoneData]):
-    for key in bones:
-        thisbone = key
-        head_position = Vector3(key.position.x, key.position.y, key.position.z)
-
-        while len(thisbone.parent_name) != 0:
-            parentbone = [b for b in bones if b.name == thisbone.parent_name]
-            if len(parentbone) == 0:
-                break
-            angle, axis = parentbone[0].rotate.to_angle_axis()
-            ppos = parentbone[0].position
-            protmat = Matrix.Rotation(angle.valueRadians(),
-                                      3,
-                                      Vector([axis.x, axis.y, axis.z])
-                                      ).inverted()
-
-            new_head_position =  protmat.transposed() @ Vector([head_position.x,
-                                                                head_position.y,
-                                                                head_position.z])
-            position = Vector3(ppos.x + new_head_position[0],
-                                ppos.y + new_head_position[1],
-                                ppos.z + new_head_position[2])
-            head_position = position
-            thisbone = parentbone[0]
-
-        key.position_head_as = head_position
-
-
-def set_bone_rotation(context: Context, bones: List[BoneData]):
-    scene_collection = context.scene.collection
-    scene_layer = context.view_layer
-    data_objects = bpy.data.objects
-
-    object_map: Dict[str, Object] = {}
-    for bone in bones:
-        obj = data_objects.new(bone.name, None)
-        object_map[bone.name] = obj
-        scene_collection.objects.link(obj)
-
-    for bone in bones:
-        if bone.parent_name != '':
-            obj = object_map.get(bone.name)
-            Parent = object_map.get(bone.parent_name)
-            obj.parent = Parent
-
-    for bone in bones:
-        obj = object_map.get(bone.name)
-        angle, axis = bone.rotate.to_angle_axis()
-        loc = bone.position
-        euler = Matrix.Rotation(angle.valueRadians(),
-                                3,
-                                Vector([axis.x, -axis.z, axis.y])
-                                ).to_euler()
-        obj.location = [loc.x, -loc.z, loc.y]
-        obj.rotation_euler = [euler[0], euler[1], euler[2]]
-
-    scene_layer.update()
-
-    for bone in bones:
-        obj = object_map.get(bone.name)
-        _, rot, _ = obj.matrix_world.decompose()
-        rotmatAS = rot.to_matrix()
-        bone.rotate_matrix_as = rotmatAS
-
-    for bone in bones:
-        obj = object_map.get(bone.name)
-        scene_collection.objects.unlink(obj)
-        data_objects.remove(obj)
-
-    scene_layer.update()
+def calc_bone_rotations(world_rotations: np.ndarray) -> np.ndarray:
+    # Ogre y-up armature space -> Blender z-up armature space, then swap to Blender's y-along-bone axes
+    axis_conversion = np.array([(1, 0, 0), (0, 0, -1), (0, 1, 0)], dtype=np.float64)
+    bone_axes = np.array([(0, 1, 0), (1, 0, 0), (0, 0, 1)], dtype=np.float64)
+    return axis_conversion @ world_rotations @ axis_conversion.T @ bone_axes
 
 
+@profile
 def create_skeleton(
         context: Context,
         import_info_log: List[str],
         skeleton_data: SkeletonData,
         skeleton_name: str):
     bones = skeleton_data.get_bones(has_helper=True)
+    count(bones=len(bones))
+    hierarchy = BoneHierarchy.from_bone_data(bones)
+    nd_positions, nd_rotations = bone_data_transforms(bones)
+    heads, world_rotations = hierarchy.forward_kinematics(nd_positions, nd_rotations)
+    bone_rotations = calc_bone_rotations(world_rotations)
+
+    # Helper bones still place their children but are not created
+    nd_is_bone = np.array([not bone.name.startswith('Helper') for bone in bones], dtype=bool)
+    parents = hierarchy.nearest_ancestors(nd_is_bone).tolist()
+
+    averageBone = float(nd_positions[:, 0].mean()) if len(bones) > 0 else 0
+    if averageBone == 0:
+        averageBone = 0.2
+    print('Default bone length:', averageBone)
 
-    set_bone_head_position(bones=bones)
-    set_bone_rotation(context=context, bones=bones)
+    has_parent = hierarchy.parents >= 0
+    tails = np.zeros(len(bones), dtype=np.float64)
+    np.maximum.at(tails, hierarchy.parents[has_parent], nd_positions[has_parent, 0])
+    tails[tails == 0] = averageBone
 
     scene_collection = context.scene.collection
     scene_layer = context.view_layer
@@ -111,64 +75,259 @@ def create_skeleton(
     scene_layer.objects.active = rig
     scene_layer.update()
 
-    averageBone = mean([bone.position.x for bone in bones])
-    if averageBone == 0:
-        averageBone = 0.2
-
-    print('Default bone length:', averageBone)
+    bone_map: Dict[int, str] = {}
+    edit_bone_map: Dict[int, bpy.types.EditBone] = {}
     bpy.ops.object.mode_set(mode='EDIT')
-    for bone in bones:
-        boneName = bone.name
-        children = bone.child_names
-        bone_obj = armature.edit_bones.new(boneName)
+    edit_bones_new = armature.edit_bones.new
+    for i in np.flatnonzero(nd_is_bone).tolist():
+        bone = bones[i]
+        headPos = heads[i]
+        bone_obj = edit_bones_new(bone.name)
         bone_obj['OGREID'] = bone.id
-        headPos = bone.position_head_as
-        tailVector = 0
-        if len(children) > 0:
-            for child in children:
-                b = [bone.position.x for bone in bones if bone.name == child]
-                tailVector = max(tailVector, b[0])
+        bone_obj.head = Vector([0, 0, 0])
+        bone_obj.tail = Vector([0, tails[i], 0])
+        bone_obj.transform(Matrix(bone_rotations[i].tolist()))
+        bone_obj.translate(Vector([headPos[0], -headPos[2], headPos[1]]))
+        edit_bone_map[i] = bone_obj
 
-        if tailVector == 0:
-            tailVector = averageBone
+        bone_map[int(bone.id)] = bone_obj.name
+        import_info_log.append(f'Created bone {bone.id} {bone_obj.name}')
 
-        rotmat: Matrix = bone.rotate_matrix_as
-        tmpR = Matrix(((0, 1, 0), (1, 0, 0), (0, 0, 1))) @ rotmat.transposed()
-        boneRotMatrix = Matrix((tmpR.col[0], tmpR.col[1], tmpR.col[2]))
+    for i, bone_obj in edit_bone_map.items():
+        parent = parents[i]
+        if parent >= 0:
+            bone_obj.parent = edit_bone_map[parent]
 
-        bone_obj.head = Vector([0, 0, 0])
-        bone_obj.tail = Vector([0, tailVector, 0])
-        bone_obj.transform(boneRotMatrix)
-        bone_obj.translate(Vector([headPos.x, -headPos.z, headPos.y]))
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return rig, bone_map
 
-    for bone in bones:
-        parent_bone = [b for b in bones if b.name == bone.parent_name]
-        if len(parent_bone) != 0:
-            bone_obj = armature.edit_bones[bone.name]
-            bone_obj.parent = armature.edit_bones[parent_bone[0].name]
 
+def collect_bone_map(armature: Object) -> Dict[int, str]:
     bone_map: Dict[int, str] = {}
-    bpy.ops.object.mode_set(mode='OBJECT')
-    bpy.ops.object.mode_set(mode='EDIT')
-    for bone in armature.bones.keys():
-        if bone.startswith('Helper'):
-            context.object.data.edit_bones.remove(armature.edit_bones[bone])
+    for bone in armature.data.bones:
+        if 'OGREID' in bone:
+            bone_map[int(bone['OGREID'])] = bone.name
+    return bone_map
+
+
+def tag_armature(armature: Object, skeleton_path: str):
+    armature['OGRE_SKELETON'] = skeleton_path
+    armature['OGRE_SKELETON_HASH'] = file_hash(skeleton_path)
+
+
+def find_armature(context: Context, skeleton_path: str) -> Object:
+    # An armature in the scene built from a skeleton file with the same content
+    content_hash = file_hash(skeleton_path)
+    for obj in context.scene.objects:
+        if obj.type == 'ARMATURE' and obj.get('OGRE_SKELETON_HASH') == content_hash:
+            return obj
+    return None
+
+
+# Bump when prepare_submesh changes what it stores
+MESH_CACHE_VERSION = 1
+
+
+def submesh_cache_key(filepath: str,
+                      submesh_index: int,
+                      bone_map: Dict[int, str],
+                      import_normals: bool,
+                      import_shapekeys: bool,
+                      cleanup_vertices: str) -> str:
+    # Same file content, options and bone names give the same prepared arrays
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps([MESH_CACHE_VERSION,
+                              file_hash(filepath),
+                              submesh_index,
+                              sorted((int(bone_id), name) for bone_id, name in bone_map.items()),
+                              import_normals,
+                              import_shapekeys,
+                              cleanup_vertices]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_vertex_groups(submesh: SubMeshData, bone_map: Dict[int, str]) -> List[VertexGroupData]:
+    # The submesh is shared through asset_cache, the bone names of one import must not stay on it
+    submesh.set_bone_mapping(bone_map)
+    try:
+        return submesh.get_vertex_groups()
+    finally:
+        submesh.set_bone_mapping({})
 
-    for bone in armature.edit_bones:
-            if 'OGREID' in bone:
-                bone_map[int(bone['OGREID'])] = bone.name
-                import_info_log.append(f"Created bone {bone['OGREID']} {bone.name}")
 
-    bpy.ops.object.mode_set(mode='OBJECT')
-    return rig, bone_map
+def prepare_submesh(
+        submesh: SubMeshData,
+        bone_map: Dict[int, str],
+        import_normals: bool = True,
+        import_shapekeys: bool = True,
+        cleanup_vertices: str = 'DEFAULT',
+        ) -> Dict[str, np.ndarray]:
+    # Everything create_mesh hands to foreach_set, computed without bpy so it can be cached.
+    # Optional keys are missing when the submesh has no such data.
+    nd_positions = submesh.get_positions().reshape(-1, 3)
+    nd_faces = np.asarray(submesh.faces, dtype=np.int32).reshape(-1, 3)
+    with span('weld', vertices=len(nd_positions), faces=len(nd_faces)):
+        if cleanup_vertices == 'KEEP_FACE':
+            weld = weld_vertices(nd_positions,
+                                 nd_faces,
+                                 threshold=0.0001,
+                                 groups=keep_face_groups(nd_positions, nd_faces))
+        elif cleanup_vertices == 'DEFAULT':
+            weld = weld_vertices(nd_positions, nd_faces, threshold=0.0001)
+        else:
+            weld = no_weld(len(nd_positions), nd_faces)
+
+    arrays = {'positions': np.ascontiguousarray(nd_positions[weld.vertex_indices], dtype=np.float32),
+              'faces': np.ascontiguousarray(weld.faces, dtype=np.int32)}
+
+    if submesh.geometry.has_texture_coord:
+        nd_texcoords = submesh.get_texcoords()
+        arrays['texcoords'] = np.stack([nd_texcoords[layer].reshape(-1, 2)[weld.loop_indices]
+                                        for layer in range(nd_texcoords.shape[0])]).astype(np.float32)
+
+    if submesh.geometry.has_colors:
+        nd_colors, nd_alphas = submesh.get_colors()
+        arrays['colors'] = nd_colors.reshape(-1, 4)[weld.loop_indices].astype(np.float32)
+        arrays['alphas'] = nd_alphas.reshape(-1, 4)[weld.loop_indices].astype(np.float32)
+
+    if bone_map:
+        with span('vertex groups'):
+            # Merged vertices keep the weights of the vertex that stays, as remove_doubles did.
+            # Entries of one group and weight stay together so each run is a single add call.
+            nd_is_kept = np.zeros(len(nd_positions), dtype=bool)
+            nd_is_kept[weld.vertex_indices] = True
+            group_names = []
+            weight_groups = []
+            weight_vertices = []
+            weights = []
+            for group_index, vg in enumerate(get_vertex_groups(submesh, bone_map)):
+                group_names.append(vg.name)
+                for v, w in vg.group:
+                    nd_v = np.asarray(v, dtype=np.int64)
+                    nd_v = nd_v[nd_is_kept[nd_v]]
+                    weight_groups.append(np.full(len(nd_v), group_index, dtype=np.int32))
+                    weight_vertices.append(weld.vertex_map[nd_v])
+                    weights.append(np.full(len(nd_v), w, dtype=np.float32))
+            arrays['group_names'] = np.array(group_names, dtype=str)
+            arrays['weight_groups'] = np.concatenate(weight_groups) if weight_groups else np.empty(0, dtype=np.int32)
+            arrays['weight_vertices'] = np.concatenate(weight_vertices).astype(np.int32) if weight_vertices else np.empty(0, dtype=np.int32)
+            arrays['weights'] = np.concatenate(weights) if weights else np.empty(0, dtype=np.float32)
+
+    if import_shapekeys:
+        with span('shape keys'):
+            shape_keys = [(name, pose) for name, pose in submesh.get_shapekeys() if not name.startswith('fake_pose')]
+            if shape_keys:
+                arrays['shape_names'] = np.array([name for name, _ in shape_keys], dtype=str)
+                arrays['shapes'] = np.stack([pose.reshape(-1, 3)[weld.vertex_indices] for _, pose in shape_keys]).astype(np.float32)
+
+    if import_normals and submesh.geometry.has_normals:
+        nd_normals = np.asarray(submesh.get_normals(), dtype=np.float32).reshape(-1, 3)
+        if len(nd_normals) != len(nd_faces) * 3:
+            # Per vertex normals, spread them over the loops
+            nd_normals = nd_normals[nd_faces.ravel()]
+        arrays['normals'] = np.ascontiguousarray(nd_normals[weld.loop_indices])
+    return arrays
+
+
+def build_submesh(
+        context: Context,
+        import_info_log: List[str],
+        arrays: Dict[str, np.ndarray],
+        submesh_name: str,
+        material_name: str,
+        submesh_index: int,
+        armature: Object,
+        create_materials: bool = True,
+        ) -> Object:
+    me = bpy.data.meshes.new(submesh_name)
+    ob = bpy.data.objects.new(submesh_name, me)
+    context.scene.collection.objects.link(ob)
+    context.view_layer.objects.active = ob
+
+    nd_positions = arrays['positions']
+    nd_faces = arrays['faces']
+    vertex_count = len(nd_positions)
+    face_count = len(nd_faces)
+    count(submeshes=1, vertices=vertex_count, faces=face_count)
+    me.vertices.add(vertex_count)
+    me.loops.add(face_count * 3)
+    me.polygons.add(face_count)
+    me.vertices.foreach_set('co', nd_positions.ravel())
+    me.loops.foreach_set('vertex_index', nd_faces.ravel())
+    me.polygons.foreach_set('loop_start', np.arange(0, face_count * 3, 3, dtype=np.int32))
+    me.polygons.foreach_set('use_smooth', np.ones(face_count, dtype=bool))
+
+    if create_materials:
+        material_index = bpy.data.materials.find(material_name)
+        material = (bpy.data.materials.new(name=material_name)
+                    if material_index == -1
+                    else bpy.data.materials[material_index])
+        me.materials.append(material=material)
+
+    if 'texcoords' in arrays:
+        for texcorrd_index, nd_texcoords in enumerate(arrays['texcoords']):
+            uv_layer = me.attributes.new(name=f'UVLayer{texcorrd_index}',
+                                         type='FLOAT2',
+                                         domain='CORNER'
+                                         )
+            uv_layer.data.foreach_set('vector', nd_texcoords.ravel())
+
+    if 'colors' in arrays:
+        color_data = me.attributes.new(name=f'Colour{submesh_index}',
+                                       type='BYTE_COLOR',
+                                       domain='CORNER'
+                                       )
+        color_data.data.foreach_set('color_srgb', arrays['colors'].ravel())
+        alpha_data = me.attributes.new(name=f'Alpha{submesh_index}',
+                                       type='BYTE_COLOR',
+                                       domain='CORNER'
+                                       )
+        alpha_data.data.foreach_set('color_srgb', arrays['alphas'].ravel())
+
+    if 'group_names' in arrays:
+        groups = [ob.vertex_groups.new(name=str(name)) for name in arrays['group_names']]
+        weight_groups = arrays['weight_groups']
+        weight_vertices = arrays['weight_vertices']
+        weights = arrays['weights']
+        starts = np.flatnonzero(np.r_[True, (weight_groups[1:] != weight_groups[:-1]) | (weights[1:] != weights[:-1])])
+        for start, end in zip(starts.tolist(), np.r_[starts[1:], len(weights)].tolist()):
+            if start < end:
+                groups[weight_groups[start]].add(weight_vertices[start:end].tolist(), float(weights[start]), 'REPLACE')
 
+    if armature:
+        mod = ob.modifiers.new('OgreSkeleton', 'ARMATURE')
+        mod.object = bpy.data.objects[armature.name]
+        mod.use_bone_envelopes = False
+        mod.use_vertex_groups = True
+
+    if 'shape_names' in arrays:
+        shape_key_add = ob.shape_key_add
+        shape_key_add(name='Basis')
+        for name, pose in zip(arrays['shape_names'].tolist(), arrays['shapes']):
+            import_info_log.append(f'Created pose {name}')
+            shape_key_add(name=name)
+            me.shape_keys.key_blocks[name].data.foreach_set('co', pose.ravel())
+
+    me.update(calc_edges=True)
+    if hasattr(me, 'use_auto_smooth'):
+        me.use_auto_smooth = True
+
+    if 'normals' in arrays:
+        with span('normals'):
+            me.normals_split_custom_set(arrays['normals'])
 
+    import_info_log.append(f'Created mesh {submesh_name}')
+    ob.select_set(False)
+    return ob
+
+
+@profile
 def create_mesh(
         context: Context,
         import_info_log: List[str],
         mesh_data: MeshData,
         armature: Object,
-        bone_map: Dict[str, str],
+        bone_map: Dict[int, str],
         mesh_name: str,
         import_normals: bool = True,
         import_shapekeys: bool = True,
@@ -177,15 +336,15 @@ def create_mesh(
         select_encoding='utf-8',
         cleanup_vertices: str = 'DEFAULT',
         submesh_name_delimiter: str = '',
+        submesh_filter: str = '',
+        filepath: str = '',
         ):
     mesh_objects: List[Object] = []
-    scene_collection = context.scene.collection
-    scene_layer = context.view_layer
 
     submeshes = mesh_data.get_submeshes()
     submesh_count = len(str(len(submeshes)))
 
-    for submesh in submeshes:
+    for submesh in iter_spans('submesh', select_submeshes(submeshes, submesh_filter, select_encoding), lambda submesh: f'submesh {submesh.index}'):
         submesh_index = submesh.index
         submesh_name = (f'{mesh_name}{submesh_name_delimiter}{submesh_index:0{submesh_count}}'
                         if use_filename
@@ -197,152 +356,32 @@ def create_mesh(
                          if create_materials
                          else '')
 
-        me = bpy.data.meshes.new(submesh_name)
-        ob = bpy.data.objects.new(submesh_name, me)
-        scene_collection.objects.link(ob)
-        scene_layer.objects.active = ob
-        scene_layer.update()
-
-        verts = submesh.get_positions()
-        faces = submesh.faces
-
-        me.vertices.add(submesh.geometry.vertex_count)
-        me.loops.add(submesh.face_count * 3)
-        me.polygons.add(submesh.face_count)
-        me.vertices.foreach_set('co', verts)
-        me.loops.foreach_set('vertex_index', faces)
-        me.polygons.foreach_set('loop_start', [i * 3 for i in range(submesh.face_count)])
-        me.polygons.foreach_set('use_smooth', [True] * submesh.face_count)
-
-        if create_materials:
-            material_index = bpy.data.materials.find(material_name)
-            material = (bpy.data.materials.new(name=material_name)
-                        if material_index == -1
-                        else bpy.data.materials[material_index])
-            me.materials.append(material=material)
-
-        if submesh.geometry.has_texture_coord:
-            nd_texcoords = submesh.get_texcoords()
-            for texcorrd_index in range(nd_texcoords.shape[0]):
-                uv_layer = me.attributes.new(name=f'UVLayer{texcorrd_index}',
-                                             type='FLOAT2',
-                                             domain='CORNER'
-                                             )
-                uv_layer.data.foreach_set('vector', nd_texcoords[texcorrd_index])
-
-        if submesh.geometry.has_colors:
-            nd_colors, nd_alphas = submesh.get_colors()
-            color_data = me.attributes.new(name=f'Colour{submesh_index}',
-                                           type='BYTE_COLOR',
-                                           domain='CORNER'
-                                           )
-            color_data.data.foreach_set('color_srgb', nd_colors)
-            alpha_data = me.attributes.new(name=f'Alpha{submesh_index}',
-                                           type='BYTE_COLOR',
-                                           domain='CORNER'
-                                           )
-            alpha_data.data.foreach_set('color_srgb', nd_alphas)
-
-        if bone_map:
-            submesh.set_bone_mapping(bone_map)
-            for vg in submesh.get_vertex_groups():
-                grp = ob.vertex_groups.new(name=vg.name)
-                for v, w in vg.group:
-                    grp.add(v, w, 'REPLACE')
-
-        if armature:
-            mod = ob.modifiers.new('OgreSkeleton', 'ARMATURE')
-            mod.object = bpy.data.objects[armature.name]
-            mod.use_bone_envelopes = False
-            mod.use_vertex_groups = True
-
-        if import_shapekeys:
-            shape_keys = submesh.get_shapekeys()
-            shape_key_add = ob.shape_key_add
-            if len(shape_keys) > 0:
-                shape_key_add(name='Basis')
-                for name, pose in shape_keys:
-                    if name.startswith('fake_pose'):
-                        continue
-                    import_info_log.append(f'Created pose {name}')
-                    shape_key_add(name=name)
-                    me.shape_keys.key_blocks[name].data.foreach_set('co', pose.ravel())
-
-        me.update(calc_edges=True)
-        if hasattr(me, 'use_auto_smooth'):
-            me.use_auto_smooth = True
-
-        if cleanup_vertices == 'KEEP_FACE':
-            bpy.ops.object.mode_set(mode='OBJECT')
-            bpy.ops.object.mode_set(mode='EDIT')
-            bm = bmesh.from_edit_mesh(me)
-            face_dict: Dict[Vector, int] = {}
-            dupulicate_faces: List[int] = []
-
-            bm.faces.ensure_lookup_table()
-            for face in me.polygons:
-                v = Vector(
-                    (
-                        round(face.center.x, 2),
-                        round(face.center.y, 2),
-                        round(face.center.z, 2)
-                    )
-                ).freeze()
-
-                i = face_dict.get(v, -1)
-                if i < 0:
-                    face_dict[v] = face.index
-                    bm.faces[face.index].select = True
-                else:
-                    dupulicate_faces.append(face.index)
-                    bm.faces[face.index].select = False
-
-            bmesh.update_edit_mesh(me)
-            bpy.ops.mesh.remove_doubles(threshold=0.0001)
-            if len(dupulicate_faces) > 0:
-                bpy.ops.mesh.select_all(action = 'INVERT')
-                bpy.ops.mesh.remove_doubles(threshold=0.0001)
-            bm.free()
-            bpy.ops.mesh.select_all(action = 'SELECT')
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        elif cleanup_vertices == 'DEFAULT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-            bpy.ops.object.mode_set(mode='EDIT')
-            bpy.ops.mesh.remove_doubles(threshold=0.0001)
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        if import_normals and submesh.geometry.has_normals:
-            normals = submesh.get_normals()
+        # A cache hit skips decoding the submesh, only its header is read
+        key = ''
+        arrays = None
+        if disk_cache.enabled and filepath:
+            key = submesh_cache_key(filepath, submesh_index, bone_map, import_normals, import_shapekeys, cleanup_vertices)
+            arrays = disk_cache.load(key)
+        if arrays is None:
+            arrays = prepare_submesh(submesh,
+                                     bone_map,
+                                     import_normals=import_normals,
+                                     import_shapekeys=import_shapekeys,
+                                     cleanup_vertices=cleanup_vertices)
+            if key:
+                with span('write cache'):
+                    disk_cache.save(key, arrays)
+        else:
+            count(cached_submeshes=1)
 
-            noChange = len(me.loops) == (submesh.face_count * 3)
-            if noChange:
-                me.normals_split_custom_set(normals)
-            else:
-                print('Removed',
-                      submesh.face_count - len(me.loops) / 3,
-                      'faces')
-                vertices = verts.reshape(-1, 3).tolist()
-                face_array = [faces[i:i + 3] for i in range(0, submesh.face_count * 3, 3)]
-                split = []
-                split_append = split.append
-                polyIndex = 0
-                for face in face_array:
-                    if match_face(face, vertices, me, polyIndex):
-                        polyIndex += 1
-                        for vx in face:
-                            split_append(normals[vx])
-
-                if len(split) == len(me.loops):
-                    me.normals_split_custom_set(split)
-                else:
-                    print('Warning: Failed to import mesh normals',
-                          polyIndex,
-                          '/',
-                          len(me.polygons))
-        import_info_log.append(f'Created mesh {submesh_name}')
-        ob.select_set(False)
-        mesh_objects.append(ob)
+        mesh_objects.append(build_submesh(context=context,
+                                          import_info_log=import_info_log,
+                                          arrays=arrays,
+                                          submesh_name=submesh_name,
+                                          material_name=material_name,
+                                          submesh_index=submesh_index,
+                                          armature=armature,
+                                          create_materials=create_materials))
 
     if armature:
         for mesh_object in mesh_objects:
@@ -356,30 +395,31 @@ def create_mesh(
         mesh_object.select_set(True)
 
 
-def match_face(
-        face: List[int],
-        vertices: List[int],
-        mesh: Mesh,
-        index: int) -> bool:
-    if index >= len(mesh.polygons):
-        return False
-
-    loop = mesh.polygons[index].loop_start
-    for v in face:
-        vi = mesh.loops[loop].vertex_index
-        vx = mesh.vertices[vi].co
-        if (vx - Vector(vertices[v])).length_squared > 1e-6:
-            return False
-        loop += 1
-    return True
-
-
+def add_fcurves(
+        channelbag: bpy.types.ActionChannelbag,
+        group: bpy.types.ActionGroup,
+        data_path: str,
+        frames: np.ndarray,
+        values: np.ndarray):
+    co = np.empty((len(frames), 2), dtype=np.float32)
+    co[:, 0] = frames
+    for i, channel in enumerate(values):
+        curve = channelbag.fcurves.new(data_path, index=i)
+        curve.group = group
+        curve.keyframe_points.add(len(frames))
+        co[:, 1] = channel
+        curve.keyframe_points.foreach_set('co', co.ravel())
+        curve.update()
+
+
+@profile
 def create_animation(
         animations: List[AnimationData],
         import_info_log: List[str],
         armature: Object,
         fps: float = 24.0,
-        round_frames: bool = False):
+        round_frames: bool = False) -> Dict[str, int]:
+    track_counts: Dict[str, int] = {}
     if len(animations) > 0:
         armature.animation_data_create()
         pose_bones = armature.pose.bones
@@ -396,7 +436,7 @@ def create_animation(
 
         actions = bpy.data.actions
         tracks_new = armature.animation_data.nla_tracks.new
-        for animation in animations:
+        for animation in iter_spans('action', animations, lambda animation: animation.name):
             action = actions.get(animation.name)
             layer: bpy.types.ActionLayer = None
             strip: bpy.types.ActionKeyframeStrip = None
@@ -413,6 +453,8 @@ def create_animation(
             slot = action.slots.get(f'OB{armature.name}')
             if slot:
                 import_info_log.append(f'Already created {animation.name}')
+                channelbag = strip.channelbag(slot)
+                track_counts[animation.name] = len(channelbag.groups) if channelbag else 0
                 continue
 
             slot = action.slots.new(id_type='OBJECT', name=armature.name)
@@ -421,6 +463,7 @@ def create_animation(
 
             channelbag = strip.channelbag(slot, ensure=True)
 
+            track_count = 0
             for track_data in animation.get_animations(bone_matrix_map=mat, fps=fps, round_frame=round_frames):
                 bone = pose_bones[track_data.name]
                 if not bone:
@@ -428,48 +471,383 @@ def create_animation(
 
                 bone.rotation_mode = 'QUATERNION'
                 group = channelbag.groups.new(bone.name)
-
-                nd_locations = track_data.nd_locations
-                length = int(nd_locations.shape[1] / 2)
-                for i in range(nd_locations.shape[0]):
-                    curve = channelbag.fcurves.new(bone.path_from_id('location'), index=i)
-                    curve.group = group
-                    curve.keyframe_points.add(length)
-                    curve.keyframe_points.foreach_set("co", nd_locations[i])
-                    curve.update()
-                    if not round_frames:
-                        curve.bake(0, frame_end, remove='ALL')
-
-                nd_rotations = track_data.nd_rotations
-                # length = nd_rotations.shape[1] / 2
-                for i in range(nd_rotations.shape[0]):
-                    curve = channelbag.fcurves.new(bone.path_from_id('rotation_quaternion'), index=i)
-                    curve.group = group
-                    curve.keyframe_points.add(length)
-                    curve.keyframe_points.foreach_set("co", nd_rotations[i])
-                    curve.update()
-                    if not round_frames:
-                        curve.bake(0, frame_end, remove='ALL')
-
-                if track_data.has_scale:
-                    nd_scales = track_data.nd_scales
-                    # length = nd_scales.shape[1] / 2
-                    for i in range(nd_scales.shape[0]):
-                        curve = channelbag.fcurves.new(bone.path_from_id('scale'), index=i)
-                        curve.group = group
-                        curve.keyframe_points.add(length)
-                        curve.keyframe_points.foreach_set("co", nd_scales[i])
-                        curve.update()
-                        if not round_frames:
-                            curve.bake(0, frame_end, remove='ALL')
+                track_count += 1
+                count(tracks=1)
+
+                frames, nd_locations = split_keyframes(track_data.nd_locations)
+                _, nd_rotations = split_keyframes(track_data.nd_rotations)
+                nd_scales = split_keyframes(track_data.nd_scales)[1] if track_data.has_scale else None
+                if not round_frames:
+                    grid = np.arange(frame_end + 1, dtype=np.float64)
+                    nd_locations = resample_linear(frames, nd_locations, grid)
+                    nd_rotations = resample_quaternions(frames, nd_rotations, grid)
+                    if nd_scales is not None:
+                        nd_scales = resample_linear(frames, nd_scales, grid)
+                    frames = grid
+                count(keyframes=len(frames))
+
+                add_fcurves(channelbag, group, bone.path_from_id('location'), frames, nd_locations)
+                add_fcurves(channelbag, group, bone.path_from_id('rotation_quaternion'), frames, nd_rotations)
+                if nd_scales is not None:
+                    add_fcurves(channelbag, group, bone.path_from_id('scale'), frames, nd_scales)
 
             track = tracks_new()
             track.name = animation.name
             track.mute = True
             track.strips.new(animation.name, 0, action)
+            track_counts[animation.name] = track_count
+
+    return track_counts
+
+
+def update_animation_catalog(
+        animations: List[AnimationData],
+        armature: Object,
+        filepath: str,
+        track_counts: Dict[str, int] = None):
+    # Only names and lengths are stored, actions are created later by load_catalog_animations
+    catalog = armature.kenshi_animations
+    track_counts = track_counts or {}
+    for animation in animations:
+        index = catalog.animations.find(animation.name)
+        if index < 0:
+            item = catalog.animations.add()
+            item.name = animation.name
+        else:
+            item = catalog.animations[index]
+        item.filepath = filepath
+        item.length = animation.length
+        if animation.name in track_counts:
+            item.track_count = track_counts[animation.name]
+            item.is_loaded = True
+
+
+def select_submeshes(submeshes: List[SubMeshData], submesh_filter: str = '', select_encoding: str = 'utf-8') -> List[SubMeshData]:
+    # Comma separated name patterns, matched without case. Empty keeps every submesh
+    patterns = [pattern.strip().lower() for pattern in submesh_filter.split(',') if pattern.strip()]
+    if not patterns:
+        return submeshes
+    return [submesh for submesh in submeshes
+            if any(fnmatch.fnmatchcase(submesh.encorded_name.decode(select_encoding, errors='replace').lower(), pattern)
+                   for pattern in patterns)]
+
+
+def new_serializer(folder: str) -> KenshiObjectSerializer:
+    log_file = os.path.join(os.path.dirname(os.path.realpath( __file__ )),
+                            'log',
+                            'kenshi_io_OGRE.log')
+    serializer = KenshiObjectSerializer(logfile=log_file)
+    serializer.add_resource_location(folder)
+    return serializer
+
+
+def parse_mesh(filepath: str) -> Tuple[KenshiObjectSerializer, MeshData]:
+    folder, mesh_file = os.path.split(filepath)
+    with span('parse mesh', bytes=os.path.getsize(filepath)):
+        serializer = new_serializer(folder)
+        return serializer, serializer.load_mesh(mesh_file)
+
+
+def parse_skeleton(filepath: str) -> Tuple[KenshiObjectSerializer, SkeletonData]:
+    with span('parse skeleton', bytes=os.path.getsize(filepath)):
+        serializer = new_serializer(os.path.dirname(filepath))
+        return serializer, serializer.load_skeleton(filepath)
+
+
+def get_mesh_data(filepath: str) -> MeshData:
+    # The serializer is cached alongside the data it created
+    return asset_cache.get(filepath, parse_mesh)[1]
+
+
+def get_skeleton_data(filepath: str) -> SkeletonData:
+    return asset_cache.get(filepath, parse_skeleton)[1]
+
+
+def get_linked_skeleton_data(filepath: str, mesh_data: MeshData) -> Tuple[str, SkeletonData]:
+    # Path of the linked skeleton file and its data.
+    # Falls back to the mesh path when the skeleton is not next to the mesh.
+    skeleton_path = os.path.join(os.path.dirname(filepath), mesh_data.get_linked_skeleton_name())
+    if os.path.isfile(skeleton_path):
+        return skeleton_path, get_skeleton_data(skeleton_path)
+    return filepath, mesh_data.get_linked_skeleton()
+
+
+def read_skeleton_data(filepath: str) -> SkeletonData:
+    if filepath.lower().endswith('.mesh'):
+        return get_linked_skeleton_data(filepath, get_mesh_data(filepath))[1]
+    return get_skeleton_data(filepath)
+
+
+def import_animations_from(
+        skeleton_data: SkeletonData,
+        import_info_log: List[str],
+        armature: Object,
+        filepath: str,
+        fps: float,
+        round_frames: bool,
+        load_on_demand: bool):
+    catalog = armature.kenshi_animations
+    catalog.fps = fps
+    catalog.round_frames = round_frames
+    animations = skeleton_data.get_animations()
+    track_counts = {}
+    if not load_on_demand:
+        track_counts = create_animation(animations=animations,
+                                        import_info_log=import_info_log,
+                                        armature=armature,
+                                        fps=fps,
+                                        round_frames=round_frames)
+    update_animation_catalog(animations=animations,
+                             armature=armature,
+                             filepath=filepath,
+                             track_counts=track_counts)
+    import_info_log.append(f'Listed {len(animations)} animations')
+
+
+@profile
+def load_catalog_animations(operator: Operator,
+                            context: Context,
+                            armature: Object,
+                            names: List[str],
+                            cache_size: int = 512) -> Set[str]:
+    catalog = armature.kenshi_animations
+    files: Dict[str, Set[str]] = {}
+    for name in names:
+        index = catalog.animations.find(name)
+        if index >= 0:
+            files.setdefault(catalog.animations[index].filepath, set()).add(name)
+
+    try:
+        asset_cache.set_limit(cache_size * 1024 * 1024)
+        import_info_log = []
+        for filepath, file_names in files.items():
+            if not os.path.isfile(filepath):
+                operator.report({'WARNING'}, 'Selected file is not exist')
+                continue
+
+            skeleton_data = read_skeleton_data(filepath)
+            if not skeleton_data:
+                operator.report({'WARNING'}, 'Failed to load linked skeleton')
+                continue
+
+            animations = [animation for animation in skeleton_data.get_animations() if animation.name in file_names]
+            track_counts = create_animation(animations=animations,
+                                            import_info_log=import_info_log,
+                                            armature=armature,
+                                            fps=catalog.fps,
+                                            round_frames=catalog.round_frames)
+            update_animation_catalog(animations=animations,
+                                     armature=armature,
+                                     filepath=filepath,
+                                     track_counts=track_counts)
+
+        print('\n'.join(import_info_log))
+        operator.report({'INFO'}, 'Import successful')
+
+    except:
+        err_mes = traceback.format_exc()
+        print(err_mes)
+        operator.report({'ERROR'}, f'Import error!\n{err_mes}')
+
+    return {'FINISHED'}
+
+
+def get_selected_armature(context: Context, use_selected_skeleton: bool) -> Object:
+    active_object = context.active_object
+    if use_selected_skeleton and active_object and active_object.type == 'ARMATURE':
+        return active_object
+    return None
+
+
+def import_mesh_file(
+        operator: Operator,
+        context: Context,
+        import_info_log: List[str],
+        filepath: str,
+        mesh_data: MeshData,
+        linked_skeleton: Tuple[str, SkeletonData] = None,
+        import_normals: bool = True,
+        import_shapekeys: bool = True,
+        import_animations: bool = False,
+        round_frames: bool = False,
+        selected_armature: Object = None,
+        create_materials: bool = True,
+        use_filename: bool = False,
+        select_encoding: str = 'utf-8',
+        cleanup_vertices: str = 'DEFAULT',
+        load_on_demand: bool = True,
+        reuse_armature: bool = True,
+        submesh_name_delimiter: str = '',
+        submesh_filter: str = ''):
+    selected_skeleton = selected_armature
+    objs = context.selected_objects
+    for obj in objs:
+        if obj.type == 'MESH':
+            obj.select_set(False)
+
+    skeleton_data = None
+    skeleton_path = filepath
+    bone_map: Dict[int, str] = {}
+    if selected_skeleton:
+        bone_map = collect_bone_map(selected_skeleton)
+        if not bone_map:
+            operator.report({'WARNING'}, 'Selected armature has no OGRE data')
+    else:
+        skeleton_filename = mesh_data.get_linked_skeleton_name()
+        if len(skeleton_filename) != 0:
+            skeleton_path, skeleton_data = linked_skeleton or get_linked_skeleton_data(filepath, mesh_data)
+            has_skeleton_file = skeleton_path != filepath
+            if skeleton_data and reuse_armature and has_skeleton_file:
+                selected_skeleton = find_armature(context, skeleton_path)
+
+            if selected_skeleton:
+                bone_map = collect_bone_map(selected_skeleton)
+                import_info_log.append(f'Reused armature {selected_skeleton.name}')
+            elif skeleton_data:
+                skeleton_name = os.path.splitext(skeleton_filename)[0]
+
+                selected_skeleton, bone_map = create_skeleton(context=context,
+                                                              import_info_log=import_info_log,
+                                                              skeleton_data=skeleton_data,
+                                                              skeleton_name=skeleton_name)
+                if has_skeleton_file:
+                    tag_armature(selected_skeleton, skeleton_path)
+            else:
+                operator.report({'WARNING'}, 'Failed to load linked skeleton')
+
+    create_mesh(context=context,
+                import_info_log=import_info_log,
+                mesh_data=mesh_data,
+                armature=selected_skeleton,
+                bone_map=bone_map,
+                mesh_name=os.path.splitext(os.path.basename(filepath))[0],
+                import_normals=import_normals,
+                import_shapekeys=import_shapekeys,
+                select_encoding=select_encoding,
+                create_materials=create_materials,
+                use_filename=use_filename,
+                cleanup_vertices=cleanup_vertices,
+                submesh_name_delimiter=submesh_name_delimiter,
+                submesh_filter=submesh_filter,
+                filepath=filepath,
+                )
+
+    if import_animations and skeleton_data:
+        render = context.scene.render
+        if round_frames:
+            fps = int(round(skeleton_data.calc_animation_fps()))
+            print('Setting FPS to', fps)
+            render.fps = fps
+        import_animations_from(skeleton_data=skeleton_data,
+                               import_info_log=import_info_log,
+                               armature=selected_skeleton,
+                               filepath=skeleton_path,
+                               fps=render.fps,
+                               round_frames=round_frames,
+                               load_on_demand=load_on_demand)
+
+    for obj in objs:
+        if obj.type == 'MESH':
+            obj.select_set(True)
+
+
+def new_decode_pool(workers: int) -> ProcessPoolExecutor:
+    # Decode processes are plain Python without the add-on package, they import the worker by its file name.
+    # Native objects cannot be pickled, so the processes always decode with ogre_codec.
+    addon_directory = os.path.dirname(os.path.abspath(__file__))
+    if addon_directory not in sys.path:
+        sys.path.append(addon_directory)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def cache_decoded(future: Future):
+    # A file the decode process failed on is decoded here instead, so its error is reported as usual
+    try:
+        entries = future.result()
+    except Exception:
+        traceback.print_exc()
+        return
+    for filepath, entry in entries.items():
+        asset_cache.put(filepath, entry)
+
+
+def find_mesh_files(directory: str, search_subfolders: bool = False) -> List[str]:
+    filepaths = []
+    for root, dirs, files in os.walk(directory):
+        filepaths.extend(os.path.join(root, file) for file in sorted(files) if file.lower().endswith('.mesh'))
+        if not search_subfolders:
+            break
+        dirs.sort()
+    return filepaths
+
+
+@profile
+def load_files(operator: Operator,
+               context: Context,
+               filepaths: List[str],
+               import_workers: int = 0,
+               cache_size: int = 512,
+               disk_cache_directory: str = '',
+               disk_cache_size: int = 2048,
+               use_selected_skeleton: bool = False,
+               **import_options) -> Set[str]:
+    filepaths = [filepath for filepath in filepaths if os.path.isfile(filepath) and filepath.lower().endswith('.mesh')]
+    if not filepaths:
+        operator.report({'WARNING'}, 'Selected file is not exist')
+        return {'CANCELLED'}
 
+    asset_cache.set_limit(cache_size * 1024 * 1024)
+    disk_cache.configure(disk_cache_directory, disk_cache_size * 1024 * 1024)
+    import_info_log = []
+    failed = 0
+    # Importing a mesh makes it the active object, so the armature is taken before the first file
+    import_options['selected_armature'] = get_selected_armature(context, use_selected_skeleton)
+    # Files not in asset_cache are decoded in separate processes, datablocks are created here as results arrive
+    pending = [filepath for filepath in filepaths if filepath not in asset_cache]
+    workers = min(import_workers or os.cpu_count(), len(pending))
+    executor = new_decode_pool(workers) if workers > 1 else None
+    try:
+        futures = {}
+        if executor is not None:
+            decode_mesh_file = importlib.import_module('decode_worker').decode_mesh_file
+            futures = {executor.submit(decode_mesh_file, filepath): filepath for filepath in pending}
+        decoding = set(futures.values())
+        cached = [filepath for filepath in filepaths if filepath not in decoding]
+        results = chain(((filepath, None) for filepath in cached),
+                        ((futures[future], future) for future in as_completed(futures)))
+        for filepath, future in results:
+            print('loading', filepath)
+            try:
+                if future is not None:
+                    cache_decoded(future)
+                mesh_data = get_mesh_data(filepath)
+                linked_skeleton = None
+                if len(mesh_data.get_linked_skeleton_name()) != 0:
+                    linked_skeleton = get_linked_skeleton_data(filepath, mesh_data)
+                import_mesh_file(operator=operator,
+                                 context=context,
+                                 import_info_log=import_info_log,
+                                 filepath=filepath,
+                                 mesh_data=mesh_data,
+                                 linked_skeleton=linked_skeleton,
+                                 **import_options)
+            except:
+                failed += 1
+                err_mes = traceback.format_exc()
+                print(err_mes)
+                operator.report({'ERROR'}, f'Import error!\n{filepath}\n{err_mes}')
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    print('\n'.join(import_info_log))
+    print('done.')
+    if failed == 0:
+        operator.report({'INFO'}, 'Import successful')
+    return {'FINISHED'}
 
-@func_timer
+
+@profile
 def load(operator: Operator,
          context: Context,
          filepath: str,
@@ -482,7 +860,13 @@ def load(operator: Operator,
          use_filename: bool = False,
          select_encoding: str = 'utf-8',
          cleanup_vertices: str = 'DEFAULT',
+         load_on_demand: bool = True,
+         reuse_armature: bool = True,
          submesh_name_delimiter: str = '',
+         submesh_filter: str = '',
+         cache_size: int = 512,
+         disk_cache_directory: str = '',
+         disk_cache_size: int = 2048,
          ) -> Set[str]:
     if not os.path.isfile(filepath):
         operator.report({'WARNING'}, 'Selected file is not exist')
@@ -496,73 +880,26 @@ def load(operator: Operator,
     try:
         import_info_log = []
 
-        folder, mesh_file = os.path.split(filepath)
-        log_file = os.path.join(os.path.dirname(os.path.realpath( __file__ )),
-                                'log',
-                                'kenshi_io_OGRE.log')
-        serializer = KenshiObjectSerializer(logfile=log_file)
-        serializer.add_resource_location(folder)
-        mesh_data = serializer.load_mesh(mesh_file)
-
-        selected_skeleton = context.active_object if use_selected_skeleton and context.active_object and context.active_object.type == 'ARMATURE' else None
-        objs = context.selected_objects
-        for obj in objs:
-            if obj.type == 'MESH':
-                obj.select_set(False)
-
-        skeleton_data = None
-        bone_map: Dict[int, str] = {}
-        if selected_skeleton:
-            for bone in selected_skeleton.data.bones:
-                if 'OGREID' in bone:
-                    bone_map[int(bone['OGREID'])] = bone.name
-
-            if not bone_map:
-                operator.report({'WARNING'}, 'Selected armature has no OGRE data')
-        else:
-            skeleton_filename = mesh_data.get_linked_skeleton_name()
-            if len(skeleton_filename) != 0:
-                skeleton_data = mesh_data.get_linked_skeleton()
-                if skeleton_data:
-                    skeleton_name = os.path.splitext(skeleton_filename)[0]
-
-                    selected_skeleton, bone_map = create_skeleton(context=context,
-                                                                  import_info_log=import_info_log,
-                                                                  skeleton_data=skeleton_data,
-                                                                  skeleton_name=skeleton_name)
-                else:
-                    operator.report({'WARNING'}, 'Failed to load linked skeleton')
-
-        create_mesh(context=context,
-                    import_info_log=import_info_log,
-                    mesh_data=mesh_data,
-                    armature=selected_skeleton,
-                    bone_map=bone_map,
-                    mesh_name=os.path.splitext(mesh_file)[0],
-                    import_normals=import_normals,
-                    import_shapekeys=import_shapekeys,
-                    select_encoding=select_encoding,
-                    create_materials=create_materials,
-                    use_filename=use_filename,
-                    cleanup_vertices=cleanup_vertices,
-                    submesh_name_delimiter=submesh_name_delimiter,
-                    )
-
-        if import_animations and skeleton_data:
-            render = context.scene.render
-            if round_frames:
-                fps = int(round(skeleton_data.calc_animation_fps()))
-                print('Setting FPS to', fps)
-                render.fps = fps
-            create_animation(animations=skeleton_data.get_animations(),
-                             import_info_log=import_info_log,
-                             armature=selected_skeleton,
-                             fps=render.fps,
-                             round_frames=round_frames)
-
-        for obj in objs:
-            if obj.type == 'MESH':
-                obj.select_set(True)
+        asset_cache.set_limit(cache_size * 1024 * 1024)
+        disk_cache.configure(disk_cache_directory, disk_cache_size * 1024 * 1024)
+        import_mesh_file(operator=operator,
+                         context=context,
+                         import_info_log=import_info_log,
+                         filepath=filepath,
+                         mesh_data=get_mesh_data(filepath),
+                         import_normals=import_normals,
+                         import_shapekeys=import_shapekeys,
+                         import_animations=import_animations,
+                         round_frames=round_frames,
+                         selected_armature=get_selected_armature(context, use_selected_skeleton),
+                         create_materials=create_materials,
+                         use_filename=use_filename,
+                         select_encoding=select_encoding,
+                         cleanup_vertices=cleanup_vertices,
+                         load_on_demand=load_on_demand,
+                         reuse_armature=reuse_armature,
+                         submesh_name_delimiter=submesh_name_delimiter,
+                         submesh_filter=submesh_filter)
 
         print('\n'.join(import_info_log))
         print('done.')
@@ -576,13 +913,15 @@ def load(operator: Operator,
     return {'FINISHED'}
 
 
-@func_timer
+@profile
 def load_skeleton(operator: Operator,
                   context: Context,
                   filepath: str,
                   import_animations: bool = False,
                   round_frames: bool = False,
-                  use_selected_skeleton: bool = False) -> Set[str]:
+                  use_selected_skeleton: bool = False,
+                  load_on_demand: bool = True,
+                  cache_size: int = 512) -> Set[str]:
     if not os.path.isfile(filepath):
         operator.report({'WARNING'}, 'Selected file is not exist')
         return {'CANCELLED'}
@@ -592,7 +931,7 @@ def load_skeleton(operator: Operator,
     if not filepath.lower().endswith('.skeleton'):
         return {'CANCELLED'}
 
-    selected_skeleton = context.active_object if use_selected_skeleton and context.active_object and context.active_object.type == 'ARMATURE' else None
+    selected_skeleton = get_selected_armature(context, use_selected_skeleton)
     if selected_skeleton and not import_animations:
         operator.report({'WARNING'}, "Canceled because 'use selected armature' A is enabled and 'Import animation' is disabled")
         return {'CANCELLED'}
@@ -600,13 +939,9 @@ def load_skeleton(operator: Operator,
     try:
         import_info_log = []
 
-        folder, skeleton_filename = os.path.split(filepath)
-        log_file = os.path.join(os.path.dirname(os.path.realpath( __file__ )),
-                                'log',
-                                'kenshi_io_OGRE.log')
-        serializer = KenshiObjectSerializer(logfile=log_file)
-        serializer.add_resource_location(folder)
-        skeleton_data = serializer.load_skeleton(filepath)
+        asset_cache.set_limit(cache_size * 1024 * 1024)
+        skeleton_filename = os.path.basename(filepath)
+        skeleton_data = get_skeleton_data(filepath)
 
         if not selected_skeleton:
             skeleton_name = os.path.splitext(skeleton_filename)[0]
@@ -614,6 +949,7 @@ def load_skeleton(operator: Operator,
                                                    import_info_log=import_info_log,
                                                    skeleton_data=skeleton_data,
                                                    skeleton_name=skeleton_name)
+            tag_armature(selected_skeleton, filepath)
 
         if import_animations:
             render = context.scene.render
@@ -621,11 +957,13 @@ def load_skeleton(operator: Operator,
                 fps = int(round(skeleton_data.calc_animation_fps()))
                 print('Setting FPS to', fps)
                 render.fps = fps
-            create_animation(animations=skeleton_data.get_animations(),
-                             import_info_log=import_info_log,
-                             armature=selected_skeleton,
-                             fps=render.fps,
-                             round_frames=round_frames)
+            import_animations_from(skeleton_data=skeleton_data,
+                                   import_info_log=import_info_log,
+                                   armature=selected_skeleton,
+                                   filepath=filepath,
+                                   fps=render.fps,
+                                   round_frames=round_frames,
+                                   load_on_demand=load_on_demand)
 
         selected_skeleton.select_set(True)
 
@@ -8,7 +8,7 @@ import bpy
 import bmesh
 from mathutils import Matrix
 
-from .util import func_timer
+from .profiler import count, profile, span
 from kenshi_blender_tool import KenshiPhysXSerializer
 
 
@@ -294,7 +294,7 @@ def commonParent(a: bpy.types.Object, b: bpy.types.Object):
     return a
 
 
-@func_timer
+@profile
 def save(
         operator: bpy.types.Operator,
         context: bpy.types.Context,
@@ -387,11 +387,14 @@ def save(
             parent_matrix = root
             if transform == 'OWN_PARENT' and body.parent is not None:
                 parent_matrix = body.parent.matrix_world
-            saveShape(physics_collection, actor_desc, body, parent_matrix, physx)
-
-        tree = ET.ElementTree(xRoot)
-        ET.indent(tree, space='    ')
-        tree.write(filepath, encoding='UTF-8', xml_declaration=True)
+            with span('save shape'):
+                saveShape(physics_collection, actor_desc, body, parent_matrix, physx)
+            count(bodies=1)
+
+        with span('write xml'):
+            tree = ET.ElementTree(xRoot)
+            ET.indent(tree, space='    ')
+            tree.write(filepath, encoding='UTF-8', xml_declaration=True)
         operator.report({'INFO'}, 'Export successful')
 
     except:
@@ -7,7 +7,7 @@ from typing import List, Tuple, Dict
 import bpy
 from mathutils import Matrix
 
-from .util import func_timer
+from .profiler import count, profile, span
 from kenshi_blender_tool import KenshiPhysXSerializer, CollisionMesh
 
 
@@ -456,7 +456,7 @@ def create_triangle_mesh_shape(
                             collision_shape='MESH')
 
 
-@func_timer
+@profile
 def load(
         operator: bpy.types.Operator,
         context: bpy.types.Context,
@@ -471,7 +471,8 @@ def load(
 
         physx = KenshiPhysXSerializer()
 
-        nxustream2 = open_file(filepath, encoding=select_encoding)
+        with span('parse xml'):
+            nxustream2 = open_file(filepath, encoding=select_encoding)
 
         if nxustream2 is None:
             return {'CANCELLED'}
@@ -485,6 +486,7 @@ def load(
 
         if physics_collection is not None and sence_desc is not None:
             for actor_desc in sence_desc.findall('NxActorDesc'):
+                count(actors=1)
                 if actor_desc.find('NxBoxShapeDesc') is not None:
                     create_box_shape(actor_desc, physics_collection, parent_objects)
 
@@ -0,0 +1,236 @@
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+
+class Span:
+    __slots__ = ('name', 'label', 'start_ns', 'end_ns', 'children', 'counts', 'thread_id')
+
+    def __init__(self, name: str, label: str = ''):
+        # Spans are grouped by name in the summary, the label only shows in traces
+        self.name = name
+        self.label = label
+        self.start_ns = 0
+        self.end_ns = 0
+        self.children: List['Span'] = []
+        self.counts: Dict[str, int] = {}
+        self.thread_id = threading.get_ident()
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+    def add(self, **counts: int):
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + int(value)
+
+
+_local = threading.local()
+_lock = threading.Lock()
+# Root of the operation in progress. Spans opened on worker threads are attached to it.
+_active_root: Optional[Span] = None
+
+
+def _stack() -> List[Span]:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_span() -> Optional[Span]:
+    stack = _stack()
+    return stack[-1] if stack else _active_root
+
+
+@contextmanager
+def span(name: str, label: str = '', **counts: int) -> Iterator[Span]:
+    stack = _stack()
+    item = Span(name, label)
+    item.add(**counts)
+    parent = current_span()
+    if parent is not None:
+        with _lock:
+            parent.children.append(item)
+    stack.append(item)
+    item.start_ns = time.perf_counter_ns()
+    try:
+        yield item
+    finally:
+        item.end_ns = time.perf_counter_ns()
+        stack.pop()
+
+
+T = TypeVar('T')
+
+
+def iter_spans(name: str, items: Iterable[T], label: Callable[[T], str] = lambda item: '') -> Iterator[T]:
+    # Times each loop iteration as its own span, the loop body runs while the item is yielded
+    for item in items:
+        with span(name, label=label(item)):
+            yield item
+
+
+def count(**counts: int):
+    target = current_span()
+    if target is not None:
+        with _lock:
+            target.add(**counts)
+
+
+def _preference(name: str, default):
+    try:
+        import bpy
+        return getattr(bpy.context.preferences.addons[__package__].preferences, name)
+    except (ImportError, AttributeError, KeyError):
+        return default
+
+
+def trace_directory() -> str:
+    # KENSHI_IO_TRACE wins over the add-on preference, empty means tracing is off
+    directory = os.environ.get('KENSHI_IO_TRACE', '')
+    if directory:
+        return directory
+    directory = _preference('trace_directory', '')
+    if directory:
+        import bpy
+        return bpy.path.abspath(directory)
+    return ''
+
+
+def print_profile() -> bool:
+    return bool(_preference('print_profile', False))
+
+
+def trace_events(root: Span) -> List[dict]:
+    pid = os.getpid()
+    origin_ns = root.start_ns
+    events = []
+
+    def visit(item: Span):
+        events.append({'name': item.label or item.name,
+                       'cat': 'kenshi_io',
+                       'ph': 'X',
+                       'ts': (item.start_ns - origin_ns) / 1000,
+                       'dur': item.duration_ns / 1000,
+                       'pid': pid,
+                       'tid': item.thread_id,
+                       'args': item.counts})
+        for child in item.children:
+            visit(child)
+
+    visit(root)
+    return events
+
+
+def write_trace(root: Span, directory: str, peak_memory: int) -> str:
+    # Chrome trace event format, open with chrome://tracing or ui.perfetto.dev
+    events = trace_events(root)
+    events.append({'name': 'tracemalloc',
+                   'ph': 'C',
+                   'ts': root.duration_ns / 1000,
+                   'pid': os.getpid(),
+                   'tid': root.thread_id,
+                   'args': {'peak_bytes': peak_memory}})
+    os.makedirs(directory, exist_ok=True)
+    filepath = os.path.join(directory, f'{root.name}_{time.strftime("%Y%m%d_%H%M%S")}_{os.getpid()}.json')
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events,
+                   'displayTimeUnit': 'ms',
+                   'otherData': {'operation': root.name, 'peak_memory_bytes': peak_memory}}, f)
+    return filepath
+
+
+def profile(func):
+    # Times the call as a span. The outermost one reports a one-line summary to the operator,
+    # and prints a phase table when enabled in the preferences.
+    @wraps(func)
+    def new_function(*args, **kwargs):
+        global _active_root
+        is_root = _active_root is None and not _stack()
+        directory = trace_directory() if is_root else ''
+        started_tracemalloc = False
+        if directory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracemalloc = True
+            tracemalloc.reset_peak()
+
+        with span(func.__name__) as root:
+            if is_root:
+                _active_root = root
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                if is_root:
+                    _active_root = None
+
+        if directory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            if started_tracemalloc:
+                tracemalloc.stop()
+            print('Trace written to', write_trace(root, directory, peak_memory))
+
+        if is_root:
+            operator = kwargs.get('operator', args[0] if args else None)
+            if hasattr(operator, 'report'):
+                operator.report({'INFO'}, format_headline(root))
+            if print_profile():
+                print('\n'.join(format_summary(root)))
+        return result
+    return new_function
+
+
+def _merge(spans: List[Span]) -> List[List[Span]]:
+    # Group sibling spans by name, keeping the order they first appeared in
+    groups: Dict[str, List[Span]] = {}
+    for item in spans:
+        groups.setdefault(item.name, []).append(item)
+    return list(groups.values())
+
+
+def format_headline(root: Span, top: int = 3) -> str:
+    # Total time, the phases that took longest by their own time, and every counter
+    own_ns: Dict[str, int] = {}
+    counts: Dict[str, int] = {}
+
+    def visit(item: Span):
+        own_ns[item.name] = own_ns.get(item.name, 0) + max(item.duration_ns - sum(child.duration_ns for child in item.children), 0)
+        for key, value in item.counts.items():
+            counts[key] = counts.get(key, 0) + value
+        for child in item.children:
+            visit(child)
+
+    visit(root)
+    total_ns = max(root.duration_ns, 1)
+    phases = sorted(own_ns.items(), key=lambda item: item[1], reverse=True)[:top]
+    line = f'{root.name} {root.duration_ns / 1e6:.0f} ms: ' + ', '.join(f'{name} {100 * duration_ns / total_ns:.0f}%' for name, duration_ns in phases)
+    if counts:
+        line += ' | ' + ' '.join(f'{key}={value}' for key, value in counts.items())
+    return line
+
+
+def format_summary(root: Span) -> List[str]:
+    total_ns = max(root.duration_ns, 1)
+    lines = [f'{"phase":<36}{"calls":>7}{"ms":>11}{"%":>7}  counts']
+
+    def visit(group: List[Span], depth: int):
+        duration_ns = sum(item.duration_ns for item in group)
+        counts: Dict[str, int] = {}
+        for item in group:
+            for key, value in item.counts.items():
+                counts[key] = counts.get(key, 0) + value
+        name = '  ' * depth + group[0].name
+        count_text = ' '.join(f'{key}={value}' for key, value in counts.items())
+        lines.append(f'{name:<36}{len(group):>7}{duration_ns / 1e6:>11.2f}{100 * duration_ns / total_ns:>7.1f}  {count_text}'.rstrip())
+        for child_group in _merge([child for item in group for child in item.children]):
+            visit(child_group, depth + 1)
+
+    visit([root], 0)
+    return lines
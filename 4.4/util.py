@@ -1,28 +1,7 @@
 
-import time
-from datetime import datetime
-from functools import wraps
 from typing import Dict, Tuple
 
 
-def func_timer(func):
-    @wraps(func)
-    def new_function(*args, **kwargs):
-        start_at = time.time()
-        # start_str = datetime.fromtimestamp(start_at).strftime('%Y-%m-%d %H:%I:%S')
-
-        result = func(*args, **kwargs)
-
-        end_at = time.time()
-        # end_str = datetime.fromtimestamp(end_at).strftime('%Y-%m-%d %H:%I:%S')
-        time_taken = end_at - start_at
-
-        print('func:', func.__name__, 'took', '{:.3f}'.format(time_taken))
-
-        return result
-    return new_function
-
-
 def code_page_list() :
     cp_list = [
         ('utf-8', 'utf-8', ''),
@@ -143,6 +122,38 @@ so it's a good idea to pre-bake the animation and uncheck this option''',
             ('*', 'Keep the face as much as possible') : 'Keep the face as much as possible',
             ('*', 'Merges vertices as much as possible, but double-sided polygons become single-sided') : 'Merges vertices as much as possible, but double-sided polygons become single-sided',
             ('*', 'Keeps all vertices but separates faces') : 'Keeps all vertices but separates faces',
+            ('*', 'Load animations on demand') : 'Load animations on demand',
+            ('*', 'Only list the animations on the armature.\nActions are created when picked from the Kenshi Animations panel') : 'Only list the animations on the armature.\nActions are created when picked from the Kenshi Animations panel',
+            ('*', 'Kenshi Animations') : 'Kenshi Animations',
+            ('*', 'Load animation') : 'Load animation',
+            ('*', 'Load all') : 'Load all',
+            ('*', 'No animation selected') : 'No animation selected',
+            ('*', 'cache size (MB)') : 'cache size (MB)',
+            ('*', 'Parsed mesh and skeleton files are kept in memory up to this size.\nFiles are parsed again when they change on disk') : 'Parsed mesh and skeleton files are kept in memory up to this size.\nFiles are parsed again when they change on disk',
+            ('*', 'Reuse imported armature') : 'Reuse imported armature',
+            ('*', 'Link with an armature in the scene that was imported from the same skeleton file instead of creating a new one') : 'Link with an armature in the scene that was imported from the same skeleton file instead of creating a new one',
+            ('*', 'Search subfolders') : 'Search subfolders',
+            ('*', 'When a folder is selected, also import meshes in its subfolders') : 'When a folder is selected, also import meshes in its subfolders',
+            ('*', 'import processes') : 'import processes',
+            ('*', 'Number of processes that decode files when importing several meshes at once.\n0 uses every CPU core, 1 decodes in this Blender') : 'Number of processes that decode files when importing several meshes at once.\n0 uses every CPU core, 1 decodes in this Blender',
+            ('*', 'Submeshes') : 'Submeshes',
+            ('*', 'Only import submeshes whose name matches one of these comma separated patterns, e.g. body*, head.\nLeave empty to import all submeshes') : 'Only import submeshes whose name matches one of these comma separated patterns, e.g. body*, head.\nLeave empty to import all submeshes',
+            ('*', 'mesh cache folder') : 'mesh cache folder',
+            ('*', 'Keep imported meshes ready to use in this folder, so importing the same file with the same options again skips decoding it.\nLeave empty to disable') : 'Keep imported meshes ready to use in this folder, so importing the same file with the same options again skips decoding it.\nLeave empty to disable',
+            ('*', 'mesh cache size (MB)') : 'mesh cache size (MB)',
+            ('*', 'The least recently used meshes are deleted from the mesh cache folder above this size') : 'The least recently used meshes are deleted from the mesh cache folder above this size',
+            ('*', 'trace output folder') : 'trace output folder',
+            ('*', 'Write a Chrome trace (JSON) of every import and export to this folder.\nLeave empty to disable. The KENSHI_IO_TRACE environment variable takes priority') : 'Write a Chrome trace (JSON) of every import and export to this folder.\nLeave empty to disable. The KENSHI_IO_TRACE environment variable takes priority',
+            ('*', 'print timing table') : 'print timing table',
+            ('*', 'Print the time spent in each phase of every import and export to the system console') : 'Print the time spent in each phase of every import and export to the system console',
+            ('*', 'Reduce keyframes') : 'Reduce keyframes',
+            ('*', 'Remove keyframes that interpolation rebuilds within the tolerances below.\nTracks that stay at the rest pose are not exported') : 'Remove keyframes that interpolation rebuilds within the tolerances below.\nTracks that stay at the rest pose are not exported',
+            ('*', 'Position tolerance') : 'Position tolerance',
+            ('*', 'Largest position error allowed for a removed keyframe.\nAlso used for scale when scale keyframes are exported') : 'Largest position error allowed for a removed keyframe.\nAlso used for scale when scale keyframes are exported',
+            ('*', 'Angle tolerance') : 'Angle tolerance',
+            ('*', 'Largest rotation error allowed for a removed keyframe') : 'Largest rotation error allowed for a removed keyframe',
+            ('*', 'bake processes') : 'bake processes',
+            ('*', 'Number of background Blender processes that bake actions when exporting with visual keying.\n0 or 1 bakes in this Blender') : 'Number of background Blender processes that bake actions when exporting with visual keying.\n0 or 1 bakes in this Blender',
         },
         'ja_JP' : {
             ('*', 'Import Normals') : '法線をインポート',
@@ -249,6 +260,38 @@ so it's a good idea to pre-bake the animation and uncheck this option''')
             ('*', 'Keep the face as much as possible') : '面をできる限り保持します',
             ('*', 'Merges vertices as much as possible, but double-sided polygons become single-sided') : '頂点をできる限り結合しますが、両面ポリゴンが片面になります',
             ('*', 'Keeps all vertices but separates faces') : '頂点を全て保持しますが、面が分離します',
+            ('*', 'Load animations on demand') : 'アニメーションを必要な時に読み込む',
+            ('*', 'Only list the animations on the armature.\nActions are created when picked from the Kenshi Animations panel') : 'アニメーションの一覧だけをアーマチュアに記録します\nKenshi Animationsパネルで選んだ時にアクションを作成します',
+            ('*', 'Kenshi Animations') : 'Kenshiアニメーション',
+            ('*', 'Load animation') : 'アニメーションを読み込む',
+            ('*', 'Load all') : '全て読み込む',
+            ('*', 'No animation selected') : 'アニメーションが選択されていません',
+            ('*', 'cache size (MB)') : 'キャッシュサイズ (MB)',
+            ('*', 'Parsed mesh and skeleton files are kept in memory up to this size.\nFiles are parsed again when they change on disk') : '読み込んだメッシュとスケルトンをこのサイズまでメモリに保持します\nファイルが変更されると再度読み込みます',
+            ('*', 'Reuse imported armature') : 'インポート済みのアーマチュアを再利用',
+            ('*', 'Link with an armature in the scene that was imported from the same skeleton file instead of creating a new one') : '新しく作成せずに、同じスケルトンファイルからインポートされたシーン内のアーマチュアとリンクします',
+            ('*', 'Search subfolders') : 'サブフォルダを検索',
+            ('*', 'When a folder is selected, also import meshes in its subfolders') : 'フォルダを選択した時、サブフォルダ内のメッシュもインポートします',
+            ('*', 'import processes') : 'インポートプロセス数',
+            ('*', 'Number of processes that decode files when importing several meshes at once.\n0 uses every CPU core, 1 decodes in this Blender') : '複数のメッシュを一度にインポートする時にファイルを読み込むプロセス数です\n0で全てのCPUコアを使用し、1でこのBlender内で読み込みます',
+            ('*', 'Submeshes') : 'サブメッシュ',
+            ('*', 'Only import submeshes whose name matches one of these comma separated patterns, e.g. body*, head.\nLeave empty to import all submeshes') : 'カンマ区切りのパターンのいずれかに名前が一致するサブメッシュだけをインポートします 例: body*, head\n空欄で全てのサブメッシュをインポートします',
+            ('*', 'mesh cache folder') : 'メッシュキャッシュフォルダ',
+            ('*', 'Keep imported meshes ready to use in this folder, so importing the same file with the same options again skips decoding it.\nLeave empty to disable') : 'インポートしたメッシュをこのフォルダに保存し、同じファイルを同じオプションで再度インポートする時は読み込みを省略します\n空欄で無効になります',
+            ('*', 'mesh cache size (MB)') : 'メッシュキャッシュサイズ (MB)',
+            ('*', 'The least recently used meshes are deleted from the mesh cache folder above this size') : 'メッシュキャッシュフォルダがこのサイズを超えると、最も長く使われていないメッシュから削除します',
+            ('*', 'trace output folder') : 'トレース出力フォルダ',
+            ('*', 'Write a Chrome trace (JSON) of every import and export to this folder.\nLeave empty to disable. The KENSHI_IO_TRACE environment variable takes priority') : 'インポートとエクスポートごとにChromeトレース(JSON)をこのフォルダに書き出します\n空欄で無効になります。環境変数KENSHI_IO_TRACEが優先されます',
+            ('*', 'print timing table') : '処理時間の表を出力',
+            ('*', 'Print the time spent in each phase of every import and export to the system console') : 'インポートとエクスポートごとに各処理にかかった時間をシステムコンソールに出力します',
+            ('*', 'Reduce keyframes') : 'キーフレームを削減',
+            ('*', 'Remove keyframes that interpolation rebuilds within the tolerances below.\nTracks that stay at the rest pose are not exported') : '補間で下記の許容誤差内に再現できるキーフレームを削除します\nレストポーズのままのトラックはエクスポートしません',
+            ('*', 'Position tolerance') : '位置の許容誤差',
+            ('*', 'Largest position error allowed for a removed keyframe.\nAlso used for scale when scale keyframes are exported') : '削除するキーフレームに許容する位置の最大誤差です\nスケールのキーフレームをエクスポートする時はスケールにも使用します',
+            ('*', 'Angle tolerance') : '角度の許容誤差',
+            ('*', 'Largest rotation error allowed for a removed keyframe') : '削除するキーフレームに許容する回転の最大誤差です',
+            ('*', 'bake processes') : 'ベイクプロセス数',
+            ('*', 'Number of background Blender processes that bake actions when exporting with visual keying.\n0 or 1 bakes in this Blender') : 'ビジュアルキーイングでエクスポートする時にアクションをベイクするバックグラウンドのBlenderプロセス数です\n0か1でこのBlender内でベイクします',
         }
     }
 
@@ -0,0 +1,12 @@
+import os
+import sys
+import types
+
+# The add-on folder is named after the Blender version, so it is imported as a package under another name.
+# Only the modules that do not need bpy are tested.
+ADDON_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '4.4')
+
+if 'kenshi_io' not in sys.modules:
+    package = types.ModuleType('kenshi_io')
+    package.__path__ = [ADDON_DIRECTORY]
+    sys.modules['kenshi_io'] = package
@@ -0,0 +1,88 @@
+import numpy as np
+
+from kenshi_io.bone_math import nlerp, rotation_angles, select_keyframes
+
+
+def random_tracks(bone_count=4, frame_count=120, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.arange(frame_count) / 30.0
+    phases = rng.uniform(0, np.pi, (bone_count, 1, 1))
+    speeds = rng.uniform(0.5, 3.0, (bone_count, 1, 1))
+    t = times[np.newaxis, :, np.newaxis]
+    locations = np.sin(speeds * t + phases) * rng.uniform(0.01, 0.5, (bone_count, 1, 3))
+    angles = np.sin(speeds[..., 0] * times + phases[..., 0]) * rng.uniform(0.1, 1.5, (bone_count, 1))
+    axes = rng.normal(size=(bone_count, 1, 3))
+    axes /= np.linalg.norm(axes, axis=-1, keepdims=True)
+    rotations = np.concatenate([np.cos(angles / 2)[..., np.newaxis], np.sin(angles / 2)[..., np.newaxis] * axes], axis=-1)
+    scales = 1.0 + 0.1 * np.sin(speeds * t * 0.5 + phases)
+    # A bone that holds still and one that jumps
+    locations[0] = 0.25
+    rotations[0] = (1, 0, 0, 0)
+    scales[0] = 1
+    locations[1, frame_count // 2:] += 1.0
+    return times, locations, rotations, np.broadcast_to(scales, locations.shape).copy()
+
+
+def rebuild(times, values, keep, interpolate):
+    # Values at every key from the kept keys only, as OGRE plays the track back
+    rebuilt = np.empty_like(values)
+    for bone in range(len(values)):
+        kept = np.flatnonzero(keep[bone])
+        following = np.clip(np.searchsorted(kept, np.arange(len(times)), side='left'), 1, len(kept) - 1)
+        start, end = kept[following - 1], kept[following]
+        t = (times - times[start]) / (times[end] - times[start])
+        rebuilt[bone] = interpolate(values[bone, start], values[bone, end], t)
+    return rebuilt
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t[:, np.newaxis]
+
+
+def test_select_keyframes_stays_within_tolerance():
+    times, locations, rotations, scales = random_tracks()
+    position_tolerance = 0.001
+    angle_tolerance = np.radians(0.05)
+    scale_tolerance = 0.001
+    keep = select_keyframes(times, locations, rotations, scales, position_tolerance, angle_tolerance, scale_tolerance)
+
+    assert keep[:, 0].all() and keep[:, -1].all()
+    assert keep.sum() < keep.size
+    # The still bone only needs its end keys
+    assert keep[0].sum() == 2
+
+    position_error = np.linalg.norm(rebuild(times, locations, keep, lerp) - locations, axis=-1)
+    angle_error = rotation_angles(rebuild(times, rotations, keep, nlerp), rotations)
+    scale_error = np.abs(rebuild(times, scales, keep, lerp) - scales).max(axis=-1)
+    assert position_error.max() <= position_tolerance
+    assert angle_error.max() <= angle_tolerance + 1e-9
+    assert scale_error.max() <= scale_tolerance
+
+
+def test_select_keyframes_checks_rotations_as_nlerp():
+    # Constant angular velocity is exact under slerp, but nlerp runs ahead and behind in between
+    times = np.arange(600) / 30.0
+    angles = np.radians(114) * np.arange(600) / 599
+    rotations = np.stack([np.cos(angles / 2), np.zeros(600), np.zeros(600), np.sin(angles / 2)], axis=-1)[np.newaxis]
+    locations = np.zeros((1, 600, 3))
+    scales = np.ones((1, 600, 3))
+    angle_tolerance = np.radians(0.05)
+    keep = select_keyframes(times, locations, rotations, scales, 0.001, angle_tolerance, 0.001)
+
+    assert 2 < keep.sum() < 600
+    angle_error = rotation_angles(rebuild(times, rotations, keep, nlerp), rotations)
+    assert angle_error.max() <= angle_tolerance + 1e-9
+
+
+def test_select_keyframes_keeps_short_tracks():
+    times, locations, rotations, scales = random_tracks(frame_count=2)
+    assert select_keyframes(times, locations, rotations, scales, 1.0, 1.0, 1.0).all()
+
+
+def test_select_keyframes_zero_tolerance_drops_only_exact_keys():
+    times = np.arange(5, dtype=np.float64)
+    locations = np.array([[[0, 0, 0], [1, 0, 0], [2, 0, 0], [2, 1, 0], [2, 2, 0]]], dtype=np.float64)
+    rotations = np.tile([1.0, 0, 0, 0], (1, 5, 1))
+    scales = np.ones((1, 5, 3))
+    keep = select_keyframes(times, locations, rotations, scales, 0.0, 0.0, 0.0)
+    np.testing.assert_array_equal(keep, [[True, False, True, False, True]])
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from kenshi_io.fcurve_math import BEZIER, CONSTANT, LINEAR, Cycles, KeyframeCurve, cycle_frames, evaluate_keyframes
+
+
+def make_curve(co, interpolation, handle_left=None, handle_right=None, linear_extrapolation=False, cycles=None):
+    co = np.asarray(co, dtype=np.float64)
+    if handle_left is None:
+        handle_left = co - (1.0, 0.0)
+    if handle_right is None:
+        handle_right = co + (1.0, 0.0)
+    return KeyframeCurve(co=co,
+                         handle_left=np.asarray(handle_left, dtype=np.float64),
+                         handle_right=np.asarray(handle_right, dtype=np.float64),
+                         interpolation=np.full(len(co), interpolation, dtype=np.int32) if np.isscalar(interpolation) else np.asarray(interpolation, dtype=np.int32),
+                         linear_extrapolation=linear_extrapolation,
+                         cycles=cycles)
+
+
+def bezier_reference(p0, p1, p2, p3, frame):
+    # Solve x(u) = frame with numpy's cubic roots, then evaluate y(u)
+    coefficients = [-p0[0] + 3 * p1[0] - 3 * p2[0] + p3[0],
+                    3 * p0[0] - 6 * p1[0] + 3 * p2[0],
+                    -3 * p0[0] + 3 * p1[0],
+                    p0[0] - frame]
+    roots = np.roots(coefficients)
+    u = next(root.real for root in roots if abs(root.imag) < 1e-9 and -1e-9 <= root.real <= 1 + 1e-9)
+    v = 1 - u
+    return v ** 3 * p0[1] + 3 * v * v * u * p1[1] + 3 * v * u * u * p2[1] + u ** 3 * p3[1]
+
+
+def test_linear_segments_and_extrapolation():
+    curve = make_curve([(0, 0), (10, 10), (20, 0)], LINEAR)
+    np.testing.assert_allclose(evaluate_keyframes(curve, [0, 2.5, 10, 15, 20]), [0, 2.5, 10, 5, 0])
+    np.testing.assert_allclose(evaluate_keyframes(curve, [-5, 25]), [0, 0])
+
+    extrapolated = curve._replace(linear_extrapolation=True)
+    np.testing.assert_allclose(evaluate_keyframes(extrapolated, [-5, 25]), [-5, -5])
+
+
+def test_constant_segments_hold_the_first_key():
+    curve = make_curve([(0, 1), (5, 3), (10, 7)], CONSTANT)
+    np.testing.assert_allclose(evaluate_keyframes(curve, [0, 4.99, 5, 9, 10, 12]), [1, 1, 3, 3, 7, 7])
+
+
+def test_bezier_with_straight_handles_is_linear():
+    co = np.array([(0, 0), (30, 30)], dtype=np.float64)
+    curve = make_curve(co, BEZIER, handle_left=co - 10, handle_right=co + 10)
+    frames = np.linspace(0, 30, 31)
+    np.testing.assert_allclose(evaluate_keyframes(curve, frames), frames, atol=1e-9)
+
+
+def test_bezier_matches_cubic_solution():
+    co = [(0, 0), (10, 1), (16, -2)]
+    handle_left = [(-3, 0), (7, 1.5), (14, -2)]
+    handle_right = [(2, 0.5), (12, 0.5), (19, -2)]
+    curve = make_curve(co, BEZIER, handle_left=handle_left, handle_right=handle_right)
+    frames = np.array([0.5, 3, 5, 9.5, 11, 13.3, 15.9])
+    expected = []
+    for frame in frames:
+        segment = 0 if frame < 10 else 1
+        expected.append(bezier_reference(np.array(co[segment]), np.array(handle_right[segment]),
+                                         np.array(handle_left[segment + 1]), np.array(co[segment + 1]), frame))
+    np.testing.assert_allclose(evaluate_keyframes(curve, frames), expected, atol=1e-9)
+
+
+def test_mixed_interpolation_uses_the_first_key_of_each_segment():
+    curve = make_curve([(0, 0), (10, 10), (20, 0), (30, 5)], [LINEAR, CONSTANT, LINEAR, LINEAR])
+    np.testing.assert_allclose(evaluate_keyframes(curve, [5, 15, 25]), [5, 10, 2.5])
+
+
+@pytest.mark.parametrize('mode, frames, expected', [
+    ('REPEAT', [15, 20, -3, 33], [5, 10, 7, 3]),
+    ('REPEAT_OFFSET', [15, 20, -3, 33], [15, 20, -3, 33]),
+    ('MIRROR', [12, 15, -3, 25], [8, 5, 3, 5]),
+])
+def test_cycles(mode, frames, expected):
+    curve = make_curve([(0, 0), (10, 10)], LINEAR, cycles=Cycles(mode, 0, mode, 0))
+    np.testing.assert_allclose(evaluate_keyframes(curve, frames), expected, atol=1e-9)
+
+
+def test_cycle_count_limits_the_mapped_range():
+    curve = make_curve([(0, 0), (10, 10)], LINEAR, cycles=Cycles('NONE', 0, 'REPEAT_OFFSET', 1))
+    frames, offsets = cycle_frames(curve, np.array([-5.0, 5.0, 15.0, 25.0]))
+    np.testing.assert_allclose(frames, [-5, 5, 5, 25])
+    np.testing.assert_allclose(offsets, [0, 0, 10, 0])
+    np.testing.assert_allclose(evaluate_keyframes(curve, [-5, 15, 25]), [0, 15, 10])
@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+
+from kenshi_io.mesh_math import close_pairs, keep_face_groups, no_weld, weld_vertices
+
+
+def greedy_weld(positions, threshold, groups=None):
+    # In index order, each vertex merges into the first kept vertex within the threshold
+    labels = np.arange(len(positions))
+    kept = []
+    for vertex in range(len(positions)):
+        for target in kept:
+            if (np.linalg.norm(positions[vertex] - positions[target]) <= threshold
+                    and (groups is None or groups[vertex] == groups[target])):
+                labels[vertex] = target
+                break
+        else:
+            kept.append(vertex)
+    return labels
+
+
+def test_close_pairs_match_brute_force():
+    rng = np.random.default_rng(0)
+    threshold = 0.0001
+    positions = rng.integers(0, 4, (80, 3)) * 0.00006 + rng.normal(0, 0.00001, (80, 3))
+    first, second = close_pairs(positions, threshold)
+    distances = np.linalg.norm(positions[:, np.newaxis] - positions[np.newaxis], axis=-1)
+    expected = set(zip(*np.nonzero(np.triu(distances <= threshold, 1))))
+    assert set(zip(first.tolist(), second.tolist())) == expected
+
+
+def test_weld_matches_greedy_reference():
+    rng = np.random.default_rng(1)
+    threshold = 0.0001
+    for trial in range(50):
+        count = int(rng.integers(1, 50))
+        positions = rng.integers(0, 4, (count, 3)) * 0.00006 + rng.normal(0, 0.00001, (count, 3))
+        groups = rng.integers(0, 2, count) if trial % 2 else None
+        faces = rng.integers(0, count, (count, 3))
+        weld = weld_vertices(positions, faces, threshold, groups)
+        np.testing.assert_array_equal(weld.vertex_indices[weld.vertex_map], greedy_weld(positions, threshold, groups))
+
+
+def test_weld_duplicates_match_greedy_reference():
+    rng = np.random.default_rng(2)
+    threshold = 0.0001
+    for trial in range(20):
+        distinct = rng.integers(0, 3, (10, 3)) * 0.00007
+        positions = distinct[rng.integers(0, 10, 40)]
+        groups = rng.integers(0, 2, 40) if trial % 2 else None
+        weld = weld_vertices(positions, rng.integers(0, 40, (10, 3)), threshold, groups)
+        np.testing.assert_array_equal(weld.vertex_indices[weld.vertex_map], greedy_weld(positions, threshold, groups))
+
+
+def test_weld_large_clusters_quickly():
+    rng = np.random.default_rng(3)
+    spread = rng.random((20000, 3))
+    coincident = np.full((2000, 3), 2.0)
+    jittered = 3.0 + rng.uniform(-0.00002, 0.00002, (1000, 3))
+    positions = np.concatenate([spread, coincident, jittered])
+    faces = rng.integers(0, len(positions), (len(positions), 3))
+    start = time.perf_counter()
+    weld = weld_vertices(positions, faces, threshold=0.0001)
+    assert time.perf_counter() - start < 5.0
+    labels = weld.vertex_indices[weld.vertex_map]
+    assert (labels[20000:22000] == 20000).all()
+    assert (labels[22000:] == 22000).all()
+
+
+def test_weld_does_not_chain_merges():
+    # Each vertex is within the threshold of the next, but the ends are not
+    positions = np.array([[0, 0, 0], [0.00008, 0, 0], [0.00016, 0, 0]])
+    weld = weld_vertices(positions, np.array([[0, 1, 2]]), threshold=0.0001)
+    np.testing.assert_array_equal(weld.vertex_map, [0, 0, 1])
+
+
+def test_weld_ignores_diagonal_neighbours_past_the_threshold():
+    positions = np.array([[0, 0, 0], [0.00009, 0.00009, 0.00009]])
+    weld = weld_vertices(positions, np.array([[0, 1, 0]]), threshold=0.0001)
+    np.testing.assert_array_equal(weld.vertex_map, [0, 1])
+
+
+def test_weld_drops_degenerate_and_double_faces():
+    positions = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 0], [1, 0, 0], [0, 1, 0], [0.00001, 0, 0]])
+    faces = np.array([[0, 1, 2], [3, 4, 5], [0, 6, 1], [2, 1, 0]])
+    weld = weld_vertices(positions, faces, threshold=0.0001)
+    np.testing.assert_array_equal(weld.vertex_indices, [0, 1, 2])
+    np.testing.assert_array_equal(weld.face_indices, [0])
+    np.testing.assert_array_equal(weld.faces, [[0, 1, 2]])
+    np.testing.assert_array_equal(weld.loop_indices, [0, 1, 2])
+
+
+def test_keep_face_groups_keep_double_sided_faces():
+    positions = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 0], [1, 0, 0], [0, 1, 0]])
+    faces = np.array([[0, 1, 2], [3, 5, 4]])
+    weld = weld_vertices(positions, faces, threshold=0.0001, groups=keep_face_groups(positions, faces))
+    assert len(weld.vertex_indices) == 6
+    np.testing.assert_array_equal(weld.face_indices, [0, 1])
+
+
+def test_weld_far_apart_positions():
+    # Too spread out for a single integer cell key
+    positions = np.array([[0, 0, 0], [1e12, 0, 0], [1e12 + 0.00005, 0, 0], [-1e12, 5e11, 3e11]])
+    weld = weld_vertices(positions, np.array([[0, 1, 3], [0, 2, 3]]), threshold=0.0001)
+    np.testing.assert_array_equal(weld.vertex_map, [0, 1, 1, 2])
+
+
+def test_no_weld_keeps_everything():
+    faces = np.array([[0, 1, 2], [2, 1, 3]])
+    weld = no_weld(4, faces)
+    np.testing.assert_array_equal(weld.vertex_map, np.arange(4))
+    np.testing.assert_array_equal(weld.faces, faces)
+    np.testing.assert_array_equal(weld.loop_indices, np.arange(6))
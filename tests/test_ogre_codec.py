@@ -0,0 +1,149 @@
+import mmap
+import struct
+
+import numpy as np
+import pytest
+
+from kenshi_io.ogre_codec import KenshiObjectSerializer, read_mesh, read_skeleton, write_mesh, write_skeleton
+from kenshi_io.ogre_codec.serializer import read_file
+
+
+def chunk(chunk_id, body):
+    return struct.pack('<HI', chunk_id, len(body) + 6) + body
+
+
+def string(value):
+    return value + b'\n'
+
+
+def geometry(positions, normals, texcoords, colors):
+    # position, normal, texture coordinate and diffuse colour interleaved in one buffer
+    elements = b''.join(chunk(0x5110, struct.pack('<5H', *element))
+                        for element in [(0, 2, 1, 0, 0), (0, 2, 4, 12, 0), (0, 1, 7, 24, 0), (0, 10, 5, 32, 0)])
+    vertex = np.dtype({'names': ['position', 'normal', 'texcoord', 'color'],
+                       'formats': [('<f4', 3), ('<f4', 3), ('<f4', 2), ('u1', 4)],
+                       'offsets': [0, 12, 24, 32],
+                       'itemsize': 36})
+    records = np.zeros(len(positions), dtype=vertex)
+    records['position'] = positions
+    records['normal'] = normals
+    records['texcoord'] = texcoords
+    records['color'] = colors
+    return chunk(0x5000, struct.pack('<I', len(positions))
+                 + chunk(0x5100, elements)
+                 + chunk(0x5200, struct.pack('<HH', 0, vertex.itemsize) + chunk(0x5210, records.tobytes())))
+
+
+@pytest.fixture
+def mesh_bytes():
+    positions = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float32)
+    normals = np.array([[0, 1, 0]] * 4, dtype=np.float32)
+    texcoords = np.array([[0, 0], [1, 0], [0, 1], [1, 1]], dtype=np.float32)
+    colors = np.array([[10, 20, 30, 40]] * 4, dtype=np.uint8)
+    bone_assignments = [(0, 1, 1.0), (1, 1, 0.5), (1, 2, 0.5), (2, 1, 1.0)]
+    # Own geometry with 16 bit indices and bone assignments
+    submesh0 = (string(b'mat0') + b'\x00' + struct.pack('<I', 6) + b'\x00' + struct.pack('<6H', 0, 1, 2, 0, 2, 3)
+                + geometry(positions, normals, texcoords, colors)
+                + chunk(0x4010, struct.pack('<H', 4))
+                + b''.join(chunk(0x4100, struct.pack('<IHf', *assignment)) for assignment in bone_assignments))
+    # Shared geometry with 32 bit indices
+    submesh1 = string(b'mat1') + b'\x01' + struct.pack('<I', 6) + b'\x01' + struct.pack('<6I', 2, 3, 1, 3, 0, 1) + chunk(0x4010, struct.pack('<H', 4))
+    names = chunk(0xA000, chunk(0xA100, struct.pack('<H', 0) + string(b'body')) + chunk(0xA100, struct.pack('<H', 1) + string(b'head')))
+    poses = chunk(0xC000, chunk(0xC100, string(b'smile') + struct.pack('<H', 1) + b'\x00' + chunk(0xC111, struct.pack('<I3f', 1, 0, 0, 1))))
+    mesh = chunk(0x3000, b'\x01'
+                 + geometry(positions, normals, texcoords, colors)
+                 + chunk(0x4000, submesh0)
+                 + chunk(0x4000, submesh1)
+                 + chunk(0x6000, string(b'body.skeleton'))
+                 + chunk(0x7000, struct.pack('<IHf', 3, 7, 1.0))
+                 + names
+                 + poses)
+    return struct.pack('<H', 0x1000) + string(b'[MeshSerializer_v1.100]') + mesh
+
+
+def keyframe(time, rotate, translate, scale=None):
+    # Scale is left out of keys that do not need it
+    return chunk(0x4110, struct.pack('<f4f3f', time, *rotate, *translate) + (struct.pack('<3f', *scale) if scale else b''))
+
+
+@pytest.fixture
+def skeleton_bytes():
+    bones = (chunk(0x2000, string(b'root') + struct.pack('<H3f4f', 0, 0, 1, 0, 0, 0, 0, 1))
+             + chunk(0x2000, string(b'arm') + struct.pack('<H3f4f3f', 1, 0.5, 0, 0, 0, 0.6, 0, 0.8, 2, 2, 2)))
+    tracks = (chunk(0x4100, struct.pack('<H', 0) + keyframe(0, (0, 0, 0, 1), (0, 1, 0)) + keyframe(1, (0, 0, 0, 1), (0, 2, 0)))
+              + chunk(0x4100, struct.pack('<H', 1)
+                      + keyframe(0, (0, 0.6, 0, 0.8), (0.5, 0, 0))
+                      + keyframe(0.5, (0, 0.6, 0, 0.8), (0.5, 0, 0), (1, 2, 1))
+                      + keyframe(1, (0, 0, 0, 1), (0.5, 0, 0))))
+    return (struct.pack('<H', 0x1000) + string(b'[Serializer_v1.80]')
+            + chunk(0x1010, struct.pack('<H', 1))
+            + bones
+            + chunk(0x3000, struct.pack('<HH', 1, 0))
+            + chunk(0x4000, string(b'wave') + struct.pack('<f', 1) + tracks)
+            + chunk(0x5000, string(b'other.skeleton') + struct.pack('<f', 1)))
+
+
+def contents(mesh):
+    result = [mesh.get_linked_skeleton_name()]
+    for submesh in mesh.get_submeshes():
+        submesh.set_bone_mapping({1: 'root', 2: 'arm', 7: 'leg'})
+        result.append((submesh.encorded_name,
+                       submesh.encorded_material,
+                       np.asarray(submesh.faces).tolist(),
+                       submesh.get_positions().tolist(),
+                       np.asarray(submesh.get_normals()).tolist(),
+                       submesh.get_texcoords().tolist(),
+                       [array.tolist() for array in submesh.get_colors()],
+                       [(group.name, group.group) for group in submesh.get_vertex_groups()],
+                       [(name, pose.tolist()) for name, pose in submesh.get_shapekeys()]))
+    return result
+
+
+def test_mesh_round_trip(mesh_bytes):
+    mesh = read_mesh(mesh_bytes)
+    written = write_mesh(mesh)
+    assert contents(read_mesh(written)) == contents(read_mesh(mesh_bytes))
+    # Writing what was read back gives the same bytes
+    assert write_mesh(read_mesh(written)) == written
+
+
+def test_lazy_read_writes_the_same_bytes(mesh_bytes):
+    lazy = read_mesh(mesh_bytes, lazy=True)
+    assert not any(submesh.is_loaded for submesh in lazy.get_submeshes())
+    assert write_mesh(lazy) == write_mesh(read_mesh(mesh_bytes))
+    assert contents(read_mesh(mesh_bytes, lazy=True)) == contents(read_mesh(mesh_bytes))
+
+
+def test_memory_mapped_read(mesh_bytes, tmp_path):
+    (tmp_path / 'body.mesh').write_bytes(mesh_bytes)
+    mapped = read_file(str(tmp_path / 'body.mesh'), mmap_threshold=0)
+    assert isinstance(mapped, mmap.mmap)
+    mapped.close()
+    for lazy in (True, False):
+        serializer = KenshiObjectSerializer(mmap_threshold=0, lazy=lazy)
+        serializer.add_resource_location(str(tmp_path))
+        assert contents(serializer.load_mesh('body.mesh')) == contents(read_mesh(mesh_bytes))
+
+
+def test_mesh_contents(mesh_bytes):
+    mesh = read_mesh(mesh_bytes)
+    assert mesh.get_linked_skeleton_name() == 'body.skeleton'
+    body, head = mesh.get_submeshes()
+    assert body.encorded_name == b'body' and head.encorded_name == b'head'
+    np.testing.assert_array_equal(np.asarray(body.faces).reshape(-1, 3), [[0, 1, 2], [0, 2, 3]])
+    assert body.bone_assignment_array['bone'].tolist() == [1, 1, 2, 1]
+    # The shared geometry's assignments go to the submeshes that use it
+    assert head.bone_assignment_array['bone'].tolist() == [7]
+
+
+def test_skeleton_round_trip(skeleton_bytes):
+    skeleton = read_skeleton(skeleton_bytes)
+    root, arm = skeleton.get_bones()
+    assert (root.name, arm.name, arm.parent_name) == ('root', 'arm', 'root')
+    assert (arm.scale.x, arm.scale.y, arm.scale.z) == (2, 2, 2)
+    keys = skeleton.get_animations()[0].tracks['arm']
+    np.testing.assert_array_equal(keys[:, 0], [0, 0.5, 1])
+    np.testing.assert_array_equal(keys[:, 8:], [[1, 1, 1], [1, 2, 1], [1, 1, 1]])
+    assert skeleton.animation_links == [(b'other.skeleton', 1.0)]
+    # Only the scaled key is written with scale
+    assert write_skeleton(skeleton) == skeleton_bytes